@@ -0,0 +1,41 @@
+# standard library
+import random
+
+# local imports
+from main import Person
+
+
+def generate_roster(
+    size: int,
+    household_size: int = 4,
+    ban_density: float = 0.5,
+    seed: int = 0,
+) -> list[Person]:
+    """
+    Generates `size` synthetic entries in households that share a last name.
+
+    Household sizes vary from 1 to about twice `household_size`, and each entry
+    has a previous giftee in another household with a chance of `ban_density`.
+    """
+    rng = random.Random(seed)
+    entries = []
+    household = 0
+    while len(entries) < size:
+        members = rng.randint(1, max(1, 2 * household_size - 1))
+        for member in range(min(members, size - len(entries))):
+            entry = {
+                "first": f"First{len(entries)}",
+                "last": f"Family{household}",
+                "email": f"person{len(entries)}@example.com",
+                "wishlist": f"https://example.com/list/{len(entries)}",
+                "notes": "Likes board games." if member % 2 else None,
+            }
+            entries.append(Person(entry))
+        household += 1
+
+    for entry in entries:
+        if rng.random() < ban_density:
+            other = rng.choice(entries)
+            if other.last_name != entry.last_name:
+                entry.prev_giftee = other.full_name
+    return entries
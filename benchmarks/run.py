@@ -0,0 +1,168 @@
+"""
+Times each phase of a Secret Santa run on synthetic rosters.
+
+Run with `python -m benchmarks.run` from the project folder. Results are
+written as JSON so they can be compared across commits.
+"""
+
+# standard library
+import argparse, json, platform, statistics, subprocess, sys, time
+
+# local imports
+from benchmarks.rosters import generate_roster
+from main import SecretSanta
+from utils.compatibility import CompatibilityIndex
+from utils.dispatch import dispatch
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+from utils.message import MessageBuilder, plain_text
+from utils.render import CardRenderer, card_context
+
+SIZES = [10, 100, 1_000, 10_000]
+HOUSEHOLD_SIZES = [2, 4]
+BAN_DENSITIES = [0.0, 0.5]
+
+
+def time_phase(func, repeats: int) -> dict:
+    """
+    Times `func` `repeats` times and returns the timing summary.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeats": repeats,
+        "min": min(timings),
+        "median": statistics.median(timings),
+    }
+
+
+def send_all(email: Email, pairs: list, workers: int) -> None:
+    """
+    Renders, builds and sends a card for each of `pairs`.
+    """
+    renderer = CardRenderer()
+    builder = MessageBuilder(email.gmail_username)
+    extra = {"banner_src": builder.banner_src}
+
+    def messages():
+        contexts = [
+            {**card_context(gifter, giftee), **extra} for gifter, giftee in pairs
+        ]
+        rendered = renderer.render_many(contexts)
+        for (gifter, _), data, html in zip(pairs, contexts, rendered):
+            message = builder.build(gifter.email, "Match", html, plain_text(data))
+            yield gifter.full_name, gifter.email, message
+
+    report = dispatch(email, messages(), workers=workers)
+    if report.failed:
+        raise RuntimeError(f"{len(report.failed)} benchmark emails failed")
+
+
+def run_roster(
+    santa: SecretSanta,
+    server: LocalSMTPServer,
+    size: int,
+    household_size: int,
+    ban_density: float,
+    args: argparse.Namespace,
+) -> list[dict]:
+    """
+    Times every phase for one synthetic roster.
+    """
+    entries = generate_roster(size, household_size, ban_density, seed=size)
+    index = CompatibilityIndex(entries)
+    pairs = santa.create_pairs(entries, index=index, seed=1)
+    email = Email("santa@example.com", "pw", server.host, server.port, False)
+    renderer = CardRenderer()
+    context = {"gifter_name": "John Smith", "giftee_name": "Jane Doe"}
+
+    phases = {
+        "compatibility_index": lambda: CompatibilityIndex(entries),
+        "create_pairs_uniform": lambda: santa.create_pairs(
+            entries, index=index, seed=1
+        ),
+        "create_pairs_matching": lambda: santa.create_pairs(
+            entries, strategy="matching", index=index, seed=1
+        ),
+        "create_pairs_cycle": lambda: santa.create_pairs(
+            entries, strategy="cycle", index=index, seed=1
+        ),
+        "get_permutations_count": lambda: santa.get_permutations_count(entries, index),
+        "get_assignment_count": lambda: santa.get_assignment_count(entries, index),
+        "create_html": lambda: [renderer.render(context) for _ in range(size)],
+    }
+    if size <= args.send_limit:
+        phases["send_all"] = lambda: send_all(email, pairs, args.workers)
+        single = pairs[: args.single_sends]
+        phases["send_email_single"] = lambda: [
+            email.send_email("Match", "Body", gifter.email) for gifter, _ in single
+        ]
+
+    results = []
+    for phase, func in phases.items():
+        result = time_phase(func, args.repeats)
+        result.update(
+            phase=phase,
+            size=size,
+            household_size=household_size,
+            ban_density=ban_density,
+        )
+        results.append(result)
+        print(f"{phase} size={size} min={result['min']:.4f}s", file=sys.stderr)
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument(
+        "--household-sizes", type=int, nargs="+", default=HOUSEHOLD_SIZES
+    )
+    parser.add_argument("--ban-densities", type=float, nargs="+", default=BAN_DENSITIES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--send-limit", type=int, default=1_000)
+    parser.add_argument("--single-sends", type=int, default=20)
+    parser.add_argument("--output", help="JSON file to write, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    santa = SecretSanta()
+    results = []
+    with LocalSMTPServer() as server:
+        for size in args.sizes:
+            for household_size in args.household_sizes:
+                for ban_density in args.ban_densities:
+                    results += run_roster(
+                        santa, server, size, household_size, ban_density, args
+                    )
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
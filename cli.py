@@ -0,0 +1,392 @@
+"""
+Runs Secret Santa without any prompts so runs can be scripted.
+
+Each command is run for every config file given, one after another in the
+same process, and prints one JSON object per config on its own line.
+Everything meant for people is written to stderr so stdout stays JSON.
+
+    python cli.py validate config.json
+    python cli.py count config.json other.json
+    python cli.py pair config.json --seed 42 --reveal
+    python cli.py render config.json --seed 42 --output cards
+    python cli.py wishlists config.json
+    python cli.py send config.json --seed 42 --workers 4
+    python cli.py spool config.json --seed 42 --output cards.mbox
+    python cli.py flush config.json --spool cards.mbox --workers 4
+    python cli.py analyze config.json --strategy shuffle --trials 1000000
+    python cli.py send config.json --metrics metrics.prom
+
+The exit code is the highest of the codes for each config.
+"""
+
+# standard library
+from __future__ import annotations
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import TYPE_CHECKING
+import datetime as dt
+import argparse, json, secrets, sys
+
+# local imports
+from main import SecretSanta
+from utils.config import CONFIG
+from utils.metrics import METRICS
+
+if TYPE_CHECKING:
+    from utils.dispatch import DispatchReport
+
+EXIT_OK = 0
+# the roster has problems or no valid pairs exist
+EXIT_INVALID = 1
+# argparse exits with 2 for bad arguments
+EXIT_USAGE = 2
+# some emails could not be sent
+EXIT_UNSENT = 3
+# the config could not be loaded or the command failed
+EXIT_ERROR = 4
+
+STRATEGIES = ["uniform", "matching", "optimal", "cycle"]
+# the analyzer can also measure the retrying shuffle strategy
+FAIRNESS_STRATEGIES = STRATEGIES + ["shuffle"]
+
+
+def prepare(santa: SecretSanta, args: argparse.Namespace):
+    """
+    Loads the entries and history for `santa` and checks the roster.
+    Returns the (entries, index, preflight report).
+    """
+    entries = santa.test_entries if args.test else santa.entries
+    santa.load_history(dt.date.today().year)
+    index = santa.build_index(entries)
+    return entries, index, santa.preflight(entries, index, args.test)
+
+
+def make_pairs(santa: SecretSanta, index, args: argparse.Namespace):
+    """
+    Creates pairs with the seed and strategy in `args`.
+    Returns the (pairs, result), where pairs is None if no pairs exist and
+    result holds the seed and digest or why there are no pairs.
+    """
+    from utils.cycles import NoSingleCycleError
+    from utils.matching import NoValidPairsError
+    from utils.sampling import AttemptLimitError, assignment_digest
+
+    seed = secrets.randbits(64) if args.seed is None else args.seed
+    result = {"seed": seed}
+    try:
+        pairs, optimal = santa.pair_with_settings(index, seed, args.strategy)
+    except NoValidPairsError as error:
+        names = index.roster.full_names
+        result["error"] = "no_valid_pairs"
+        result["gifters"] = [names[i] for i in error.gifters]
+        result["giftees"] = [names[i] for i in error.giftees]
+        return None, result
+    except NoSingleCycleError as error:
+        result["error"] = "no_single_cycle"
+        result["reason"] = error.reason
+        return None, result
+    except AttemptLimitError as error:
+        result["error"] = "attempt_limit"
+        result["attempts"] = error.attempt_limit
+        return None, result
+    names = index.roster.full_names
+    result["digest"] = assignment_digest(names, pairs.giftee_of.tolist())
+    if optimal:
+        result["costs"] = optimal.breakdown
+    return pairs, result
+
+
+def validate(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    _, _, report = prepare(santa, args)
+    return report.to_dict(), EXIT_OK if report.ok else EXIT_INVALID
+
+
+def count(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    from utils.counting import AssignmentEstimate
+
+    entries, index, report = prepare(santa, args)
+    if not report.ok:
+        return {"preflight": report.to_dict()}, EXIT_INVALID
+    total = santa.get_assignment_count(entries, index)
+    if isinstance(total, AssignmentEstimate):
+        result = {
+            "exact": False,
+            "log10": total.log10,
+            "log10_lower": total.lower,
+            "log10_upper": total.upper,
+            "reason": total.reason,
+        }
+    else:
+        # exact counts are strings since they can be too big for JSON readers
+        result = {"exact": True, "count": str(total)}
+    return result, EXIT_OK if total else EXIT_INVALID
+
+
+def pair(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    _, index, report = prepare(santa, args)
+    if not report.ok:
+        return {"preflight": report.to_dict()}, EXIT_INVALID
+    pairs, result = make_pairs(santa, index, args)
+    if pairs is None:
+        return result, EXIT_INVALID
+    if args.reveal:
+        result["pairs"] = pairs.names()
+    return result, EXIT_OK
+
+
+def render(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    from utils.render import card_context
+
+    _, index, report = prepare(santa, args)
+    if not report.ok:
+        return {"preflight": report.to_dict()}, EXIT_INVALID
+    pairs, result = make_pairs(santa, index, args)
+    if pairs is None:
+        return result, EXIT_INVALID
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    links = {}
+    if santa.check_wishlists:
+        links = santa.wishlist_links(giftee for _, giftee in pairs)
+    contexts = (
+        card_context(gifter, giftee, links.get(giftee.wishlist))
+        for gifter, giftee in pairs
+    )
+    width = len(str(len(pairs)))
+    files = {}
+    for (gifter, _), html in zip(pairs, santa.renderer.render_many(contexts)):
+        path = output / f"{len(files):0{width}d}.html"
+        path.write_text(html, encoding="utf-8")
+        files[gifter.full_name] = str(path)
+    result["cards"] = files
+    return result, EXIT_OK
+
+
+def wishlists(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    entries = santa.test_entries if args.test else santa.entries
+    links = santa.wishlist_links(entries)
+    santa.show_wishlist_problems(entries, links)
+    broken = {
+        entry.full_name: links[entry.wishlist].problem
+        for entry in entries
+        if entry.wishlist and not links[entry.wishlist].ok
+    }
+    missing = [entry.full_name for entry in entries if not entry.wishlist]
+    result = {"checked": len(links), "broken": broken, "missing": missing}
+    return result, EXIT_INVALID if broken else EXIT_OK
+
+
+def send(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    from utils.outbox import Outbox
+
+    _, index, report = prepare(santa, args)
+    if not report.ok:
+        return {"preflight": report.to_dict()}, EXIT_INVALID
+    pairs, result = make_pairs(santa, index, args)
+    if pairs is None:
+        return result, EXIT_INVALID
+    options = {"test": args.test, "workers": args.workers, "rate": args.rate}
+    if args.test:
+        sent = santa.send_secret_santa_emails(pairs, **options)
+    else:
+        santa.history.record(dt.date.today().year, pairs.names())
+        with Outbox(santa.outbox_path) as outbox:
+            sent = santa.send_secret_santa_emails(pairs, outbox=outbox, **options)
+    result["sent"] = len(sent.sent)
+    result["retried"] = sent.retried
+    result["failed"] = {name: str(error) for name, error in sent.errors.items()}
+    result["unsaved"] = {name: str(error) for name, error in sent.unsaved.items()}
+    result["deferred"] = sent.deferred
+    return result, send_status(sent)
+
+
+def send_status(sent: DispatchReport) -> int:
+    """
+    Gets the exit status of a send, which fails when an email was not sent
+    or a delivery could not be saved to the outbox, spool or quota.
+    """
+    if sent.failed:
+        return EXIT_UNSENT
+    return EXIT_ERROR if sent.unsaved else EXIT_OK
+
+
+def spool(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    _, index, report = prepare(santa, args)
+    if not report.ok:
+        return {"preflight": report.to_dict()}, EXIT_INVALID
+    pairs, result = make_pairs(santa, index, args)
+    if pairs is None:
+        return result, EXIT_INVALID
+    if not args.test:
+        santa.history.record(dt.date.today().year, pairs.names())
+    written = santa.write_spool(pairs, args.output, test=args.test)
+    result["spooled"] = len(written.sent)
+    result["spool"] = args.output
+    return result, EXIT_OK
+
+
+def flush(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    from utils.spool import spool_size
+
+    sent = santa.flush_spool(args.spool, workers=args.workers, rate=args.rate)
+    result = {
+        "spool": args.spool,
+        "sent": len(sent.sent),
+        "retried": sent.retried,
+        "failed": {name: str(error) for name, error in sent.errors.items()},
+        "unsaved": {name: str(error) for name, error in sent.unsaved.items()},
+        "deferred": sent.deferred,
+        "left": spool_size(args.spool),
+    }
+    return result, send_status(sent)
+
+
+def analyze(santa: SecretSanta, args: argparse.Namespace) -> tuple[dict, int]:
+    from utils.fairness import analyze_fairness
+
+    _, index, report = prepare(santa, args)
+    if not report.ok:
+        return {"preflight": report.to_dict()}, EXIT_INVALID
+    strategy = args.strategy or santa.config.settings.get("strategy", "uniform")
+    fairness = analyze_fairness(
+        index,
+        strategy,
+        trials=args.trials,
+        workers=args.workers,
+        seed=args.seed or 0,
+        ages=santa.recent_ages,
+        weights=santa.weights,
+        noise=santa.noise,
+    )
+    return fairness.to_dict(index.roster.full_names), EXIT_OK
+
+
+COMMANDS = {
+    "validate": validate,
+    "count": count,
+    "pair": pair,
+    "render": render,
+    "wishlists": wishlists,
+    "send": send,
+    "spool": spool,
+    "flush": flush,
+    "analyze": analyze,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Runs Secret Santa without prompts and prints JSON results.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    helps = {
+        "validate": "check the roster for problems",
+        "count": "count the valid sets of pairs",
+        "pair": "create pairs and show their digest",
+        "render": "create pairs and write each card to an html file",
+        "wishlists": "check that every wishlist link opens",
+        "send": "create pairs and email everyone their giftee",
+        "spool": "create pairs and write every email to a Maildir or mbox",
+        "flush": "send the emails in a spool that were not sent yet",
+        "analyze": "measure how far a pairing strategy is from uniform",
+    }
+    for name, text in helps.items():
+        command = commands.add_parser(name, help=text)
+        command.add_argument(
+            "configs",
+            nargs="*",
+            type=Path,
+            default=[CONFIG],
+            help="config files to run one after another",
+        )
+        command.add_argument("--test", action="store_true", help="use the test entries")
+        command.add_argument(
+            "--metrics",
+            type=Path,
+            help="write phase timings and counters to this .json or .prom file",
+        )
+        if name in ("send", "flush"):
+            command.add_argument(
+                "--workers", type=int, default=1, help="connections per account"
+            )
+            command.add_argument(
+                "--rate", type=float, help="most emails per second per account"
+            )
+        if name == "flush":
+            command.add_argument(
+                "--spool", default="spool", help="Maildir folder or .mbox file"
+            )
+        if name in ("validate", "count", "wishlists", "flush"):
+            continue
+        command.add_argument("--seed", type=int, help="seed for the pairs")
+        command.add_argument(
+            "--strategy",
+            choices=FAIRNESS_STRATEGIES if name == "analyze" else STRATEGIES,
+            help="pairing strategy, defaults to the one in the settings",
+        )
+        if name == "analyze":
+            command.add_argument(
+                "--trials", type=int, default=10_000, help="pairings to run"
+            )
+            command.add_argument(
+                "--workers", type=int, help="processes, defaults to the CPU count"
+            )
+        elif name == "pair":
+            command.add_argument(
+                "--reveal", action="store_true", help="include who has who"
+            )
+        elif name == "render":
+            command.add_argument(
+                "--output", default="cards", help="folder for the html files"
+            )
+        elif name == "spool":
+            command.add_argument(
+                "--output",
+                default="spool",
+                help="Maildir folder, or mbox file if it ends in .mbox",
+            )
+    return parser
+
+
+def run(argv: list[str] | None = None, out=None) -> int:
+    """
+    Runs the command in `argv` for each config and writes one JSON line per
+    config to `out`, which defaults to stdout. Returns the exit code.
+    """
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    command = COMMANDS[args.command]
+    code = EXIT_OK
+    METRICS.reset()
+    METRICS.enabled = args.metrics is not None
+    for path in args.configs:
+        result = {"command": args.command, "config": str(path)}
+        santa = SecretSanta(config_path=path)
+        # anything printed for people goes to stderr so stdout stays JSON
+        with redirect_stdout(sys.stderr):
+            try:
+                if not path.exists():
+                    raise FileNotFoundError(f"No config file at {path}")
+                output, status = command(santa, args)
+            except Exception as error:
+                output = {"error": type(error).__name__, "message": str(error)}
+                status = EXIT_ERROR
+            finally:
+                santa.close()
+        result.update(output)
+        result["exit_code"] = status
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        code = max(code, status)
+    if METRICS.enabled:
+        # the metrics cover every config in the batch
+        with redirect_stdout(sys.stderr):
+            santa.show_metrics()
+        METRICS.write(args.metrics)
+        METRICS.enabled = False
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -1,71 +1,292 @@
 # standard library
+from __future__ import annotations
+from functools import cached_property
 from pathlib import Path
+from typing import TYPE_CHECKING
 import datetime as dt
-import random, json
-
-# third-party imports
-from jinja2 import Environment, FileSystemLoader
-from rich.console import Console
-from rich.table import Table
-from rich.theme import Theme
+import math, secrets
 
 # local imports
-from utils.email import Email
-from utils.action_picker import action_picker
-
-
-class Person:
-    def __init__(self, data: dict) -> None:
-        self.first_name = data.get("first", None)
-        self.last_name = data.get("last", None)
-        self.email = data.get("email", None)
-        self.prev_giftee = data.get("prev_giftee", None)
-        self.wishlist = data.get("wishlist", None)
-        self.notes = data.get("wishlist", None)
-
-    def __repr__(self) -> str:
-        return (
-            f"Person(\nfirst_name={self.first_name}, last_name={self.last_name}, "
-            f"email={self.email}, prev_giftee={self.prev_giftee}, "
-            f"wishlist={self.wishlist}, notes={self.notes})"
-        )
+from utils.config import CONFIG, Config
+from utils.metrics import METRICS, Metrics
+from utils.person import Person
 
-    @property
-    def full_name(self) -> str:
-        return f"{self.first_name} {self.last_name}"
+# heavy imports are made by the methods that need them so importing is fast
+if TYPE_CHECKING:
+    from rich.console import Console
+    from utils.compatibility import CompatibilityIndex
+    from utils.counting import AssignmentEstimate
+    from utils.dispatch import Account, DispatchReport
+    from utils.email import Email
+    from utils.history import GiftHistory
+    from utils.matching import NoValidPairsError
+    from utils.message import MessageBuilder
+    from utils.optimize import OptimalAssignment
+    from utils.outbox import Outbox
+    from utils.repair import Repair
+    from utils.preflight import PreflightReport
+    from utils.roster import Pairing, Roster
+    from utils.scheduler import QuotaStore, SendWindow
+    from utils.snapshot import SnapshotCache
+    from utils.spool import Spool
+    from utils.wishlist import WishlistLink
+    from utils.render import CardRenderer
 
 
 class SecretSanta:
-    config = Path("config.json")
-    with open(config) as file:
-        data = json.load(file)
-        gmail = data.get("gmail", False)
+    def __init__(
+        self,
+        config: Config | dict | None = None,
+        config_path: str | Path = CONFIG,
+    ) -> None:
+        """
+        Secret Santa for the entries in `config`.
+        The config is loaded from `config_path` when first used if not given.
+        """
+        if isinstance(config, dict):
+            config = Config(config)
+        if config is not None:
+            self.config = config
+        self.config_path = Path(config_path)
+        # giftees each gifter had within the repeat windows, see `load_history`
+        self.recent_giftees = {}
+        self.recent_ages = {}
+
+    @cached_property
+    def config(self) -> Config:
+        return Config.load(self.config_path)
+
+    @property
+    def entries(self) -> list[Person]:
+        return self.config.entries
+
+    @property
+    def test_entries(self) -> list[Person]:
+        return self.config.test_entries
+
+    # gift history
+    @property
+    def repeat_years(self) -> int:
+        return int(self.config.settings.get("repeat_years", 0))
+
+    @cached_property
+    def history(self) -> GiftHistory:
+        from utils.history import HISTORY, GiftHistory
+
+        return GiftHistory(self.config.settings.get("history", HISTORY))
+
+    @property
+    def soft_repeat_years(self) -> int:
+        return int(self.config.settings.get("soft_repeat_years", 0))
+
+    def load_history(
+        self,
+        year: int,
+        years: int | None = None,
+        soft_years: int | None = None,
+    ) -> None:
+        """
+        Loads the giftees everyone had before `year` with one query.
+        Giftees from the last `years` years are not picked again and giftees
+        from the last `soft_years` years cost more with the `optimal` strategy.
+        Uses the `repeat_years` and `soft_repeat_years` settings by default.
+        """
+        years = self.repeat_years if years is None else years
+        soft_years = self.soft_repeat_years if soft_years is None else soft_years
+        window = max(years, soft_years)
+        with METRICS.span("history.load"):
+            ages = self.history.ages(year, window) if window > 0 else {}
+        self.recent_giftees = {}
+        self.recent_ages = {}
+        for gifter, giftees in ages.items():
+            recent = {giftee for giftee, age in giftees.items() if age <= years}
+            if recent:
+                self.recent_giftees[gifter] = recent
+            soft = {giftee: age for giftee, age in giftees.items() if age <= soft_years}
+            if soft:
+                self.recent_ages[gifter] = soft
+
+    def close(self) -> None:
+        """
+        Closes the history and quota databases if they were opened.
+        """
+        for name in ("history", "quota"):
+            store = self.__dict__.pop(name, None)
+            if store is not None:
+                store.close()
+
+    # run metrics
+    @property
+    def metrics_path(self) -> Path | None:
+        path = self.config.settings.get("metrics")
+        return Path(path) if path else None
+
+    def finish_metrics(self, metrics: Metrics = METRICS) -> None:
+        """
+        Shows the `metrics` of the run and writes them to the `metrics` path
+        from the settings, then clears them for the next run.
+        Does nothing while the metrics are off.
+        """
+        if not metrics.enabled:
+            return
+        self.show_metrics(metrics)
+        if self.metrics_path:
+            metrics.write(self.metrics_path)
+            self.console.print(f"Metrics written to [sec]{self.metrics_path}[/]")
+        metrics.reset()
+
+    def show_metrics(self, metrics: Metrics = METRICS) -> None:
+        """
+        Shows the time spent in each phase of the run and every counter.
+        """
+        from rich.table import Table
+
+        data = metrics.to_dict()
+        table = Table(
+            title="Run Metrics",
+            show_lines=True,
+            title_style="bold",
+            style="theme-green",
+        )
+        table.add_column("Phase", justify="left")
+        table.add_column("Count", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Mean", justify="right")
+        table.add_column("Max", justify="right")
+        for name, timing in data["spans"].items():
+            table.add_row(
+                name,
+                str(timing["count"]),
+                f"{timing['total']:.3f}s",
+                f"{timing['mean'] * 1000:.2f}ms",
+                f"{timing['max'] * 1000:.2f}ms",
+            )
+        for name, value in data["counters"].items():
+            value = f"{value:,.3f}" if isinstance(value, float) else f"{value:,}"
+            table.add_row(name, value, "", "", "")
+        self.console.print(table, new_line_start=True)
 
-        entries = []
-        for person in data.get("entries", []):
-            entries.append(Person(person))
+    @property
+    def outbox_path(self) -> Path:
+        from utils.outbox import OUTBOX
 
-        test_entries = []
-        for test_person in data.get("test_entries", []):
-            test_entries.append(Person(test_person))
+        return Path(self.config.settings.get("outbox", OUTBOX))
 
     # Gmail account details
-    gmail_username = gmail.get("username", False)
-    gmail_password = gmail.get("password", False)
-    test_email = gmail.get("test_email", False)
-    email = Email(gmail_username, gmail_password)
+    @property
+    def gmail_username(self) -> str:
+        return self.config.gmail.get("username", False)
+
+    @property
+    def gmail_password(self) -> str:
+        return self.config.gmail.get("password", False)
+
+    @property
+    def test_email(self) -> str:
+        return self.config.gmail.get("test_email", False)
+
+    @cached_property
+    def email(self) -> Email:
+        from utils.email import Email
+
+        return Email(self.gmail_username, self.gmail_password)
+
+    def sender_accounts(
+        self,
+        workers: int = 1,
+        rate: float | None = None,
+    ) -> list[Account]:
+        """
+        Gets the accounts to send from, from `gmail` `accounts` in the config
+        or else the single `gmail` account.
+        `workers` and `rate` are used for accounts that do not set their own.
+        Limits per minute in the config are turned into `rate` per second.
+        """
+        from utils.dispatch import Account
+        from utils.email import Email
+
+        gmail = self.config.gmail
+        options = gmail.get("accounts")
+        if not options:
+            options = [gmail]
+            emails = [self.email]
+        else:
+            emails = [
+                Email(option["username"], option["password"]) for option in options
+            ]
+        accounts = []
+        for email, option in zip(emails, options):
+            per_minute = option.get("per_minute")
+            accounts.append(
+                Account(
+                    email,
+                    workers=option.get("workers", workers),
+                    rate=per_minute / 60 if per_minute else rate,
+                    daily_limit=option.get("daily_limit"),
+                )
+            )
+        return accounts
+
+    @cached_property
+    def quota(self) -> QuotaStore:
+        from utils.scheduler import QUOTA, QuotaStore
+
+        return QuotaStore(self.config.settings.get("quota", QUOTA))
+
+    @cached_property
+    def snapshots(self) -> SnapshotCache | None:
+        """
+        Cache of built indexes in the folder set by the `snapshots` setting,
+        or None if it is not set.
+        """
+        from utils.snapshot import SnapshotCache
+
+        # indexes can be built without any config, such as in tests
+        if "config" not in self.__dict__ and not self.config_path.exists():
+            return None
+        folder = self.config.settings.get("snapshots")
+        return SnapshotCache(folder) if folder else None
+
+    # christmas card template
+    @cached_property
+    def renderer(self) -> CardRenderer:
+        from utils.render import CardRenderer
+
+        return CardRenderer(Path("christmas_card_template.html"))
+
+    @cached_property
+    def message_builder(self) -> MessageBuilder:
+        from utils.message import MessageBuilder
+
+        return MessageBuilder(self.gmail_username)
 
     # rich console setup
-    custom_theme = Theme(
-        {
-            "prim": "bold deep_sky_blue1",
-            "sec": "bold pale_turquoise1",
-            # christmas colors
-            "theme-red": "bright_red",
-            "theme-green": "bright_green",
-        }
-    )
-    console = Console(theme=custom_theme)
+    @cached_property
+    def console(self) -> Console:
+        from rich.console import Console
+        from rich.theme import Theme
+
+        custom_theme = Theme(
+            {
+                "prim": "bold deep_sky_blue1",
+                "sec": "bold pale_turquoise1",
+                # christmas colors
+                "theme-red": "bright_red",
+                "theme-green": "bright_green",
+            }
+        )
+        return Console(theme=custom_theme)
+
+    def build_index(self, entries: list[Person] | Roster) -> CompatibilityIndex:
+        """
+        Builds the index of every valid pair within `entries`.
+        """
+        from utils.compatibility import CompatibilityIndex
+
+        with METRICS.span("index.build"):
+            if self.snapshots is not None:
+                return self.snapshots.index(entries, self.recent_giftees)
+            return CompatibilityIndex(entries, self.recent_giftees)
 
     def is_valid_pair(
         self,
@@ -81,35 +302,54 @@ class SecretSanta:
         # previous giftee
         if gifter.prev_giftee == giftee.full_name:
             return False
+        # recent giftee
+        if giftee.full_name in self.recent_giftees.get(gifter.full_name, ()):
+            return False
         # same person
         if gifter == giftee:
             return False
         return True
 
-    def validate_pairs(self, pairs: list[list[Person, Person]]) -> bool:
+    def validate_pairs(
+        self,
+        pairs: Pairing | list[list[Person, Person]],
+        index: CompatibilityIndex | None = None,
+    ) -> bool:
         """
-        Determines if the list of `pairs` are all valid.
+        Determines if the `pairs` are all valid.
+        `index` is built from everyone in `pairs` if it is not given.
         """
-        unique_giftee = []
-        for pair in pairs:
-            gifter, giftee = pair[0], pair[1]
-            if not self.is_valid_pair(gifter, giftee):
-                return False
-            if giftee.full_name in unique_giftee:
-                return False
-            unique_giftee.append(giftee.full_name)
-        return True
+        from utils.roster import Pairing
+
+        if isinstance(pairs, Pairing):
+            index = index or self.build_index(pairs.roster)
+            return pairs.is_permutation() and index.allows(pairs.giftee_of)
+        if not pairs:
+            return True
+        if index is None:
+            people = {id(person): person for pair in pairs for person in pair[:2]}
+            index = self.build_index(people.values())
+        gifters = [index.row(pair[0]) for pair in pairs]
+        giftees = [index.row(pair[1]) for pair in pairs]
+        if not index.matrix[gifters, giftees].all():
+            return False
+        # every giftee must be unique
+        giftee_names = index.name_ids[giftees].tolist()
+        return len(set(giftee_names)) == len(giftee_names)
 
     def find_valid_pair(
         self,
         gifter: Person,
         possible_giftees: list[Person],
+        index: CompatibilityIndex | None = None,
     ) -> tuple[Person, Person]:
         """
         Finds a single Secret Santa Pair based on rules determined by `valid_pair` and returns it.
+        Uses `index` for the rules if it is given.
         """
+        is_valid_pair = index.is_valid_pair if index else self.is_valid_pair
         for giftee in possible_giftees:
-            if not self.is_valid_pair(gifter, giftee):
+            if not is_valid_pair(gifter, giftee):
                 continue
             possible_giftees.remove(giftee)
             return (gifter, giftee)
@@ -117,41 +357,273 @@ class SecretSanta:
 
     def create_pairs(
         self,
-        entries: list[Person],
+        entries: list[Person] | Roster,
+        attempt_limit=1_000,
+        strategy: str = "uniform",
+        index: CompatibilityIndex | None = None,
+        seed: int | None = None,
+    ) -> Pairing:
+        """
+        Creates a full set of valid pairs from `entries`.
+        Pairing works over the roster's person ids and the result holds the
+        giftee id of each gifter, see `Pairing`.
+
+        The default `uniform` strategy picks every valid set of pairs with the
+        same odds, or close to it for rosters too large and too tight to count,
+        see `sample_assignment`. It first finds a set of pairs with
+        `find_matrix_assignment`, so like the `matching` strategy, which finds
+        any valid set of pairs with bipartite matching, it finishes in
+        polynomial time. The `optimal` strategy finds the set of pairs with
+        the lowest cost of the soft rules, see `optimal_assignment`. The
+        `cycle` strategy finds pairs that form one gift cycle through everyone
+        and exits with the reason if it cannot. These exit with a report of the
+        blocking entries if no full set of pairs exists.
+        The `shuffle` strategy retries random pairs until the `attempt_limit`
+        is reached and exits if none of them were valid.
+        The same `seed` and `entries` always give the same pairs.
+        `index` is built from `entries` if it is not given.
+        """
+        from utils.cycles import NoSingleCycleError
+        from utils.matching import NoValidPairsError
+        from utils.sampling import AttemptLimitError
+
+        index = index or self.build_index(entries)
+        try:
+            if strategy == "shuffle":
+                return self.shuffle_pairs(entries, attempt_limit, index, seed)
+            return self.assign_pairs(index, strategy, seed)
+        except NoValidPairsError as error:
+            self.show_blocking_entries(index.roster, error)
+            exit()
+        except NoSingleCycleError as error:
+            print(f"No single gift cycle exists: {error.reason}.")
+            exit()
+        except AttemptLimitError:
+            print("Failed to find a full set of valid pairs.")
+            print("More or less particapants may be required.")
+            exit()
+
+    def assign_pairs(
+        self,
+        index: CompatibilityIndex,
+        strategy: str = "uniform",
+        seed: int | None = None,
+    ) -> Pairing:
+        """
+        Creates a full set of valid pairs for the roster of `index` with
+        `strategy`, see `create_pairs`, and raises instead of exiting.
+        Raises `NoValidPairsError` when no full set of pairs exists,
+        `NoSingleCycleError` when the `cycle` strategy finds no single cycle,
+        `AttemptLimitError` when the `shuffle` strategy runs out of attempts
+        and `ValueError` for an unknown strategy.
+        """
+        from utils.roster import Pairing
+
+        if strategy == "shuffle":
+            return self.shuffle_pairs(index.roster, index=index, seed=seed)
+        with METRICS.span("pairing"):
+            if strategy == "uniform":
+                from utils.sampling import sample_assignment
+
+                assignment = sample_assignment(
+                    index.matrix, seed, groups=index.last_ids
+                )
+            elif strategy == "matching":
+                import numpy as np
+                from utils.matching import find_matrix_assignment
+
+                rng = np.random.default_rng(seed)
+                assignment = find_matrix_assignment(index.matrix, rng)
+            elif strategy == "optimal":
+                assignment = self.optimal_assignment(index, seed=seed).giftee_of
+            elif strategy == "cycle":
+                import numpy as np
+                from utils.cycles import single_cycle
+
+                rng = np.random.default_rng(seed)
+                assignment = single_cycle(index.matrix, rng)
+            else:
+                raise ValueError(f"Unknown pairing strategy: {strategy}")
+        return Pairing(index.roster, assignment)
+
+    def pair_with_settings(
+        self,
+        index: CompatibilityIndex,
+        seed: int | None = None,
+        strategy: str | None = None,
+    ) -> tuple[Pairing, OptimalAssignment | None]:
+        """
+        Creates pairs for the roster of `index` with the `strategy` from the
+        settings, or `strategy` if it is given, see `assign_pairs`.
+        The `optimal` strategy uses the `weights` and `noise` from the settings
+        and its `OptimalAssignment` is returned with the pairs.
+        """
+        from utils.roster import Pairing
+
+        strategy = strategy or self.config.settings.get("strategy", "uniform")
+        if strategy != "optimal":
+            return self.assign_pairs(index, strategy, seed), None
+        with METRICS.span("pairing"):
+            result = self.optimal_assignment(index, seed=seed)
+        return Pairing(index.roster, result.giftee_of), result
+
+    @property
+    def weights(self) -> dict[str, float] | None:
+        return self.config.settings.get("weights")
+
+    @property
+    def noise(self) -> float:
+        return float(self.config.settings.get("noise", 0.0))
+
+    def optimal_assignment(
+        self,
+        index: CompatibilityIndex,
+        weights: dict[str, float] | None = None,
+        noise: float | None = None,
+        seed: int | None = None,
+    ) -> OptimalAssignment:
+        """
+        Finds the valid pairs in `index` with the lowest total cost of the
+        weighted soft rules, with the giftees from `load_history` costing more.
+        `weights` and `noise` default to the ones in the settings.
+        See `utils.optimize.optimal_assignment` for the rules and `weights`.
+        """
+        import numpy as np
+        from utils.optimize import optimal_assignment
+
+        weights = self.weights if weights is None else weights
+        noise = self.noise if noise is None else noise
+        rng = np.random.default_rng(seed)
+        return optimal_assignment(index, weights, self.recent_ages, noise, rng)
+
+    def show_cost_breakdown(self, result: OptimalAssignment) -> None:
+        """
+        Shows the total cost of the pairs and the cost of each soft rule.
+        """
+        from rich.table import Table
+
+        table = Table(
+            title="Pairing Costs",
+            show_lines=True,
+            title_style="bold",
+            style="theme-green",
+        )
+        table.add_column("Rule", justify="left")
+        table.add_column("Cost", justify="right")
+        for rule, cost in result.breakdown.items():
+            table.add_row(rule.replace("_", " ").title(), f"{cost:,.2f}")
+        table.add_row("[bold]Total", f"[bold]{result.total:,.2f}")
+        self.console.print(table, new_line_start=True)
+
+    def shuffle_pairs(
+        self,
+        entries: list[Person] | Roster,
         attempt_limit=1_000,
-    ) -> list[tuple[Person, Person]]:
+        index: CompatibilityIndex | None = None,
+        seed: int | None = None,
+    ) -> Pairing:
         """
         Creates pairs from `entries` and checks if they are valid until the a
         valid pair is found or the `attempt_limit` is reached.
+        Each gifter takes the first valid giftee left in a shuffled order.
+
+        Raises `NoValidPairsError` when no full set of pairs exists and
+        `AttemptLimitError` when one exists but none of the attempts found it.
+        """
+        import numpy as np
+        from utils.matching import find_matrix_assignment
+        from utils.roster import Pairing
+        from utils.sampling import AttemptLimitError, shuffle_assignment
+
+        index = index or self.build_index(entries)
+        rng = np.random.default_rng(seed)
+        with METRICS.span("pairing"):
+            giftee_of = shuffle_assignment(index.matrix, rng, attempt_limit)
+        if giftee_of is None:
+            # raises with the blocking entries if no full set of pairs exists
+            find_matrix_assignment(index.matrix, rng)
+            raise AttemptLimitError(attempt_limit)
+        return Pairing(index.roster, giftee_of)
+
+    def show_blocking_entries(
+        self,
+        roster: Roster,
+        error: NoValidPairsError,
+    ) -> None:
         """
-        while True:
-            possible_giftees = entries.copy()
-            random.shuffle(possible_giftees)
+        Shows the entries of `roster` that make a full set of valid pairs impossible.
+        """
+        print("No full set of valid pairs exists.")
+        names = roster.full_names
+        gifters = ", ".join(names[i] for i in error.gifters)
+        giftees = ", ".join(names[i] for i in error.giftees) or "no one"
+        self.console.print(f"\nThese participants: [sec]{gifters}[/]")
+        self.console.print(f"Can only be paired with: [sec]{giftees}[/]")
+        print("More or less particapants may be required.")
 
-            pairs = []
-            for gifter in entries:
-                new_pair = self.find_valid_pair(gifter, possible_giftees)
-                if new_pair:
-                    pairs.append(new_pair)
+    # wishlist links
+    @property
+    def check_wishlists(self) -> bool:
+        return bool(self.config.settings.get("check_wishlists", False))
+
+    def wishlist_links(self, people) -> dict[str, WishlistLink]:
+        """
+        Checks the wishlist link of everyone in `people` at once and gets the
+        result for each link. Results are kept in the `wishlist_cache` file
+        for `wishlist_cache_hours` hours so later runs do not check again.
+        """
+        from utils.wishlist import (
+            TTL,
+            WISHLIST_CACHE,
+            WishlistCache,
+            resolve_wishlists,
+        )
 
-            if self.validate_pairs(pairs) and len(pairs) == len(entries):
-                break
+        settings = self.config.settings
+        hours = settings.get("wishlist_cache_hours")
+        cache = WishlistCache(
+            settings.get("wishlist_cache", WISHLIST_CACHE),
+            TTL if hours is None else float(hours) * 60 * 60,
+        )
+        with METRICS.span("wishlists"):
+            return resolve_wishlists((person.wishlist for person in people), cache)
 
-            attempt_limit -= 1
-            if attempt_limit == 0:
-                print("Failed to find a full set of valid pairs.")
-                print("More or less particapants may be required.")
-                exit()
-        return pairs
+    def show_wishlist_problems(
+        self,
+        people,
+        links: dict[str, WishlistLink],
+    ) -> None:
+        """
+        Shows everyone in `people` whose wishlist link could not be opened.
+        """
+        from rich.table import Table
+
+        broken = [
+            (person, links[person.wishlist])
+            for person in people
+            if person.wishlist in links and not links[person.wishlist].ok
+        ]
+        if not broken:
+            return
+        table = Table(
+            title="Broken Wishlist Links",
+            show_lines=True,
+            title_style="bold",
+            style="theme-green",
+        )
+        table.add_column("Name", justify="left")
+        table.add_column("Link", justify="left")
+        table.add_column("Problem", justify="left")
+        for person, link in broken:
+            table.add_row(person.full_name, link.url, f"[theme-red]{link.problem}")
+        self.console.print(table, new_line_start=True)
 
     def create_html(self, data: str, write_to_file: bool = False) -> None:
         """
         Creates an html file with the given `data`.
         Writes to a file if `write_to_file` is True.
         """
-        env = Environment(loader=FileSystemLoader("."))
-        template = env.get_template("christmas_card_template.html")
-        html_content = template.render(data)
+        html_content = self.renderer.render(data)
         # writes to a file for local testing
         if write_to_file:
             with open("test.html", "w") as file:
@@ -177,6 +649,8 @@ class SecretSanta:
         """
         Shows Entry Data with a table.
         """
+        from rich.table import Table
+
         table = Table(
             title="Secret Santa Entries",
             show_lines=True,
@@ -203,90 +677,430 @@ class SecretSanta:
 
     def send_secret_santa_emails(
         self,
-        pairs: list[list[Person, Person]],
+        pairs: Pairing | list[list[Person, Person]],
         test: bool = False,
-    ) -> None:
+        workers: int = 1,
+        rate: float | None = None,
+        outbox: Outbox | None = None,
+        spool: Spool | None = None,
+    ) -> DispatchReport:
         """
         Sends emails to all entries for Secret Santa.
+        Emails are sent over `workers` connections at once and no faster than
+        `rate` emails per second if it is set.
+        Every card is sealed in `outbox` before sending if it is given, so an
+        interrupted run can be finished with `resume_sending`.
+        Emails are written to `spool` instead of sent if it is given, see
+        `flush_spool`.
         """
-        print("\nPairs:")
+        from utils.render import card_context
+
+        links = {}
+        if self.check_wishlists:
+            links = self.wishlist_links(giftee for _, giftee in pairs)
+        cards = [
+            {
+                "recipient": gifter.full_name,
+                "to_email": gifter.email,
+                "prev_giftee": gifter.prev_giftee,
+                "data": card_context(gifter, giftee, links.get(giftee.wishlist)),
+            }
+            for gifter, giftee in pairs
+        ]
+        if outbox:
+            outbox.seal(cards, test=test)
+        return self.send_cards(cards, test, workers, rate, outbox, spool)
 
-        for gifter, giftee in pairs:
+    def send_cards(
+        self,
+        cards: list[dict],
+        test: bool = False,
+        workers: int = 1,
+        rate: float | None = None,
+        outbox: Outbox | None = None,
+        spool: Spool | None = None,
+    ) -> DispatchReport:
+        """
+        Renders and sends each card in `cards`, made by
+        `send_secret_santa_emails`, and records each result in `outbox`.
+        Cards are written to `spool` instead if it is given.
+        """
+        from utils.dispatch import Account, dispatch_accounts
+        from utils.message import plain_text
 
-            self.console.print(f"\nSending email to [sec]{gifter.full_name}[/]")
+        if spool:
+            accounts, quota, windows = [Account(spool)], None, []
+            order = [0] * len(cards)
+        else:
+            accounts, quota, windows, order = self.plan_sends(len(cards), workers, rate)
+        deferred = cards[len(order) :]
+        cards = cards[: len(order)]
 
-            if test:
-                self.console.print(f"New Giftee [sec]{giftee.full_name}[/]")
+        print("\nPairs:")
 
-                last_giftee = gifter.prev_giftee if gifter.prev_giftee else "Unset"
-                self.console.print(f"Last Giftee: [sec]{last_giftee}[/]")
+        builder = self.message_builder
+        extra = {"banner_src": builder.banner_src}
 
-            # email
-            email_subject = "Secret Santa Match"
-            email_body = self.create_html(
-                {
-                    "gifter_name": gifter.full_name,
-                    "giftee_name": giftee.full_name,
-                    "notes": giftee.notes,
-                    "wishlist_link": giftee.wishlist,
-                }
-            )
+        def messages():
+            contexts = ({**card["data"], **extra} for card in cards)
+            rendered = self.renderer.render_many(contexts)
+            for index, card, email_body in zip(order, cards, rendered):
+                recipient = card["recipient"]
+                self.console.print(f"\nSending email to [sec]{recipient}[/]")
+
+                if test:
+                    giftee = card["data"]["giftee_name"]
+                    self.console.print(f"New Giftee [sec]{giftee}[/]")
+
+                    last_giftee = card["prev_giftee"] or "Unset"
+                    self.console.print(f"Last Giftee: [sec]{last_giftee}[/]")
 
-            try:
-                self.email.send_email(
+                # email
+                email_subject = "Secret Santa Match"
+                message = builder.build(
+                    to_email=card["to_email"],
                     subject=email_subject,
-                    body=email_body,
-                    to_email=gifter.email,
-                    text="html",
+                    html=email_body,
+                    text=plain_text(card["data"]),
+                    sender=accounts[index].name,
                 )
-            except Exception as e:
-                msg = f"Failed to send email to [sec]{gifter.full_name}[/]: {e}"
+                yield index, recipient, card["to_email"], message
+
+        def show_result(name: str, error: Exception | None) -> None:
+            if outbox:
+                outbox.mark(name, error)
+            if error:
+                msg = f"Failed to send email to [sec]{name}[/]: {error}"
                 self.console.print(msg)
 
+        try:
+            with METRICS.span("send"):
+                report = dispatch_accounts(
+                    accounts, messages(), quota=quota, on_result=show_result
+                )
+        finally:
+            if outbox:
+                outbox.sync()
+        report.deferred = [card["recipient"] for card in deferred]
+        self.show_dispatch_report(report)
+        if deferred:
+            self.show_send_windows(accounts, windows[1:], outbox is not None)
+
         print("\nProcess Complete")
+        return report
+
+    def plan_sends(
+        self,
+        count: int,
+        workers: int = 1,
+        rate: float | None = None,
+    ) -> tuple[list[Account], QuotaStore | None, list[SendWindow], list[int]]:
+        """
+        Splits `count` emails between the sender accounts within their daily
+        limits. Gives the accounts, the quota store if any account has a
+        daily limit, the send windows from today on and the account of each
+        email that can go today.
+        """
+        from utils.scheduler import interleave, plan_windows
+
+        accounts = self.sender_accounts(workers, rate)
+        limited = any(account.daily_limit is not None for account in accounts)
+        quota = self.quota if limited else None
+        used = quota.usage() if quota else {}
+        # accounts without a rate limit get as big a share as the fastest one
+        fastest = max((account.rate or 0 for account in accounts), default=0) or 1.0
+        windows = plan_windows(
+            count,
+            [account.daily_limit for account in accounts],
+            [used.get(account.name, 0) for account in accounts],
+            [account.rate or fastest for account in accounts],
+        )
+        order = interleave(windows[0].counts if windows else [])
+        return accounts, quota, windows, order
+
+    def write_spool(
+        self,
+        pairs: Pairing | list[list[Person, Person]],
+        path: str | Path,
+        test: bool = False,
+    ) -> DispatchReport:
+        """
+        Builds the email for every pair in `pairs` and writes them all to the
+        Maildir folder or mbox file at `path` without sending anything.
+        """
+        from utils.spool import Spool
+
+        with Spool(path, self.gmail_username) as spool:
+            return self.send_secret_santa_emails(pairs, test, spool=spool)
+
+    def flush_spool(
+        self,
+        path: str | Path,
+        workers: int = 1,
+        rate: float | None = None,
+    ) -> DispatchReport:
+        """
+        Sends the emails in the spool at `path` that have not been sent yet,
+        within the daily limits of the sender accounts, and marks each
+        email as sent in the spool as soon as it is delivered, see `SentLog`.
+        """
+        from utils.dispatch import dispatch_accounts
+        from utils.spool import SentLog, read_spool, spool_size
+
+        accounts, quota, windows, order = self.plan_sends(
+            spool_size(path), workers, rate
+        )
+        # each email is reported by its address, numbered if it repeats
+        keys = {}
+        deferred = []
+
+        def messages():
+            for position, (key, to_email, message) in enumerate(read_spool(path)):
+                if position >= len(order):
+                    deferred.append(to_email)
+                    continue
+                label, repeat = to_email, 1
+                while label in keys:
+                    repeat += 1
+                    label = f"{to_email} #{repeat}"
+                keys[label] = key
+                yield order[position], label, to_email, message
+
+        def show_result(name: str, error: Exception | None) -> None:
+            if error:
+                msg = f"Failed to send email to [sec]{name}[/]: {error}"
+                self.console.print(msg)
+            else:
+                sent_log.mark(keys[name])
+
+        with METRICS.span("send"), SentLog(path) as sent_log:
+            report = dispatch_accounts(
+                accounts, messages(), quota=quota, on_result=show_result
+            )
+        report.deferred = deferred
+        self.show_dispatch_report(report)
+        if deferred:
+            self.show_send_windows(accounts, windows[1:], False)
+        return report
+
+    def resume_sending(self, run: str | None = None) -> DispatchReport | None:
+        """
+        Sends the cards from the last run in the outbox, or from `run`, that
+        were not delivered, without pairing again.
+        """
+        from utils.outbox import Outbox, read_outbox
+
+        state = read_outbox(self.outbox_path, run)
+        if state.run is None:
+            input("\nThere is no run to resume.")
+            return None
+        counts = state.counts()
+        self.console.print(
+            f"\nRun [sec]{state.run}[/] from {state.details.get('created')}\n"
+            f"Sent: [theme-green]{counts['sent']}[/] "
+            f"Failed: [theme-red]{counts['failed']}[/] "
+            f"Not Sent: [yellow]{counts['pending']}[/]"
+        )
+        pending = state.pending()
+        if not pending:
+            input("\nEvery email in this run was delivered.")
+            return None
+        test = state.details.get("test", False)
+        with Outbox(self.outbox_path) as outbox:
+            outbox.resume(state.run)
+            report = self.send_cards(pending, test=test, outbox=outbox)
+        self.finish_metrics()
+        input()
+        return report
+
+    def show_dispatch_report(self, report: DispatchReport) -> None:
+        """
+        Shows how many emails were sent and who needed retries or failed.
+        """
+        from rich.table import Table
+
+        self.console.print(
+            f"\nSent: [theme-green]{len(report.sent)}[/] "
+            f"Retried: [yellow]{len(report.retried)}[/] "
+            f"Failed: [theme-red]{len(report.failed)}[/]"
+        )
+        if report.deferred:
+            self.console.print(
+                f"Over today's daily limits: [yellow]{len(report.deferred)}[/]"
+            )
+        if not report.retried and not report.failed and not report.unsaved:
+            return
+        table = Table(
+            title="Delivery Problems",
+            show_lines=True,
+            title_style="bold",
+            style="theme-green",
+        )
+        table.add_column("Name", justify="left")
+        table.add_column("Attempts", justify="center")
+        table.add_column("Result", justify="left")
+        for name in report.retried:
+            table.add_row(name, str(report.attempts[name]), "[yellow]Sent")
+        for name, error in report.errors.items():
+            result = f"[theme-red]Failed: {error}"
+            table.add_row(name, str(report.attempts[name]), result)
+        for name, error in report.unsaved.items():
+            result = f"[theme-red]Sent but not saved: {error}"
+            table.add_row(name, str(report.attempts[name]), result)
+        self.console.print(table, new_line_start=True)
 
-    def get_permutations_count(self, entries: list[Person]) -> int:
+    def show_send_windows(
+        self,
+        accounts: list[Account],
+        windows: list[SendWindow],
+        resumable: bool = True,
+    ) -> None:
+        """
+        Shows the later days and accounts planned for the emails that are
+        over today's daily limits.
+        """
+        from rich.table import Table
+
+        table = Table(
+            title="Later Send Windows",
+            show_lines=True,
+            title_style="bold",
+            style="theme-green",
+        )
+        table.add_column("Day", justify="left")
+        for account in accounts:
+            table.add_column(account.name, justify="center")
+        for window in windows:
+            table.add_row(str(window.day), *map(str, window.counts))
+        self.console.print(table, new_line_start=True)
+        if resumable:
+            self.console.print(
+                "Pick [sec]Resume Unsent Emails[/] on each of these days "
+                "to send the rest."
+            )
+
+    def get_permutations_count(
+        self,
+        entries: list[Person] | Roster,
+        index: CompatibilityIndex | None = None,
+    ) -> int:
         """
         Gets the total permutations count for `entries`.
+        This multiplies the valid gifters for each entry so it is only an upper
+        bound on the valid sets of pairs. See `get_assignment_count`.
+        `index` is built from `entries` if it is not given.
         """
-        combos = []
-        for gifter in entries:
-            valid_pairs = 0
-            for giftee in entries:
-                if self.is_valid_pair(giftee, gifter):
-                    valid_pairs += 1
-            combos.append(valid_pairs)
+        index = index or self.build_index(entries)
         # find permutations
-        permutations = 1
-        for n in combos:
-            permutations = permutations * n
-        return permutations
+        return math.prod(index.gifter_counts().tolist())
+
+    def get_assignment_count(
+        self,
+        entries: list[Person] | Roster,
+        index: CompatibilityIndex | None = None,
+        exact_limit: int = 2_000,
+    ) -> int | AssignmentEstimate:
+        """
+        Gets the number of valid sets of pairs for `entries`.
+        The count is exact when it can be computed quickly and for no more than
+        `exact_limit` entries, otherwise it is a bounded estimate.
+        `index` is built from `entries` if it is not given.
+        """
+        from utils.counting import count_assignments, estimate_assignments
+
+        index = index or self.build_index(entries)
+        with METRICS.span("count"):
+            reason = f"there are more than {exact_limit:,} people"
+            if len(entries) <= exact_limit:
+                try:
+                    return count_assignments(index.matrix, index.last_ids)
+                except ValueError as e:
+                    reason = str(e)
+            estimate = estimate_assignments(index.matrix)
+            estimate.reason = reason
+            return estimate
+
+    def preflight(
+        self,
+        entries: list[Person],
+        index: CompatibilityIndex | None = None,
+        test: bool = False,
+    ) -> PreflightReport:
+        """
+        Checks `entries` for every problem at once and shows them if any are found.
+        `index` is built from `entries` if it is not given. The roster rows of
+        the entries, or the test entries if `test` is set, that could not be
+        loaded are reported too.
+        """
+        from utils.preflight import preflight
+
+        row_errors = self.config.row_errors.get("test_entries" if test else "entries")
+        with METRICS.span("preflight"):
+            report = preflight(entries, index, row_errors)
+        if not report.ok:
+            self.show_preflight_report(report)
+        return report
 
     def validate_emails(self, entries: list[Person]) -> None:
         """
-        Validates emails for `entries`.
+        Validates emails for `entries` and exits at the first invalid one.
+        Kept for scripts that used it, see `preflight` for every problem.
         """
-        for entry in entries:
-            if not self.email.validate_email(entry.email):
-                msg = f"{entry.email} for {entry.full_name} is not a valid email."
-                input(msg)
-                exit()
+        from utils.preflight import INVALID_EMAIL, preflight
+
+        for problem in preflight(entries).by_kind().get(INVALID_EMAIL, []):
+            email = entries[problem.row].email
+            input(f"{email} for {problem.name} is not a valid email.")
+            exit()
 
     def validate_prev_giftees(self, entries: list[Person]) -> None:
         """
-        Validates each entries last giftee to be sure they are found within `entries`.
+        Validates each entries last giftee to be sure they are found within
+        `entries` and exits at the first that is not, like `validate_emails`.
         """
-        full_names = [entry.full_name for entry in entries]
-        for entry in entries:
-            if entry.prev_giftee and entry.prev_giftee not in full_names:
-                msg = f"Failed to match {entry.prev_giftee} with anyone."
-                input(msg)
-                exit()
+        from utils.preflight import UNKNOWN_PREV_GIFTEE, preflight
+
+        for problem in preflight(entries).by_kind().get(UNKNOWN_PREV_GIFTEE, []):
+            prev_giftee = entries[problem.row].prev_giftee
+            input(f"Failed to match {prev_giftee} with anyone.")
+            exit()
+
+    def show_preflight_report(self, report: PreflightReport) -> None:
+        """
+        Shows every problem found in the roster with a table.
+        """
+        from rich.table import Table
+        from utils.preflight import DESCRIPTIONS
+
+        table = Table(
+            title="Roster Problems",
+            show_lines=True,
+            title_style="bold",
+            style="theme-green",
+        )
+        table.add_column("Problem", justify="left")
+        table.add_column("Name", justify="left")
+        table.add_column("Details", justify="left")
+        for problem in report.problems:
+            row = [
+                f"[theme-red]{DESCRIPTIONS[problem.kind]}",
+                problem.name,
+                problem.detail,
+            ]
+            table.add_row(*row)
+        self.console.print(table, new_line_start=True)
+        summary = ", ".join(
+            f"{count} {DESCRIPTIONS[kind].lower()}"
+            for kind, count in report.counts().items()
+        )
+        self.console.print(f"\n{len(report.problems)} problems found: {summary}")
 
     def create_test_pairs(self) -> None:
         """
         Creates pairs only for testing to confirm pairs are valid.
         """
+        from rich.table import Table
+
         table = Table(
             title="Test Pairs",
             show_lines=True,
@@ -315,14 +1129,28 @@ class SecretSanta:
         """
         Creates pairs from `entires` and sends the emails out.
         """
+        from utils.counting import AssignmentEstimate, format_count
+        from utils.cycles import NoSingleCycleError
+        from utils.matching import NoValidPairsError
+        from utils.sampling import assignment_digest
+
         if test:
             print("\nStarting Test")
 
-        self.validate_emails(entries)
-        self.validate_prev_giftees(entries)
+        year = dt.date.today().year
+        self.load_history(year)
+        index = self.build_index(entries)
+        if not self.preflight(entries, index, test).ok:
+            input("\nFix the problems above and try again.")
+            return
+
+        count = self.get_assignment_count(entries, index)
+        print(f"\nThere are {format_count(count)} valid sets of pairs.")
+        if isinstance(count, AssignmentEstimate) and count.reason:
+            print(f"That is an estimate because {count.reason}.")
 
-        permutations = self.get_permutations_count(entries)
-        print(f"\nThere are {permutations:,} pair permutations.")
+        if self.check_wishlists:
+            self.show_wishlist_problems(entries, self.wishlist_links(entries))
 
         print("\nEmails will be sent to the following addresses:")
         for entry in entries:
@@ -334,16 +1162,124 @@ class SecretSanta:
             input("\nCancelled")
             return
 
-        pairs = self.create_pairs(entries)
-        self.send_secret_santa_emails(pairs=pairs, test=test)
+        # the seed and digest let this run be replayed and checked later
+        seed = secrets.randbits(64)
+        try:
+            pairs, result = self.pair_with_settings(index, seed)
+        except NoValidPairsError as error:
+            self.show_blocking_entries(index.roster, error)
+            return
+        except NoSingleCycleError as error:
+            print(f"No single gift cycle exists: {error.reason}.")
+            return
+        if result:
+            self.show_cost_breakdown(result)
+        digest = assignment_digest(index.roster.full_names, pairs.giftee_of.tolist())
+        self.console.print(f"\nPairing Seed: [sec]{seed}[/] Digest: [sec]{digest}[/]")
+        if test:
+            self.send_secret_santa_emails(pairs=pairs, test=test)
+        else:
+            from utils.outbox import Outbox
+
+            # the pairs are saved before sending so a crash cannot lose them
+            self.history.record(year, pairs.names())
+            with Outbox(self.outbox_path) as outbox:
+                self.send_secret_santa_emails(pairs=pairs, outbox=outbox)
+        self.finish_metrics()
+        input()
+
+    def repair_pairs(
+        self,
+        entries: list[Person] | Roster,
+        previous: dict[str, str] | Pairing,
+        index: CompatibilityIndex | None = None,
+    ) -> Repair:
+        """
+        Repairs the `previous` pairs, or gifter name to giftee name, for
+        `entries` after people joined or dropped out, changing as few of the
+        earlier pairs as it can. See `utils.repair.repair_pairs`.
+        `index` is built from `entries` if it is not given.
+        """
+        from utils.repair import repair_pairs
+        from utils.roster import Pairing
+
+        if isinstance(previous, Pairing):
+            previous = dict(previous.names())
+        index = index or self.build_index(entries)
+        return repair_pairs(index, previous)
+
+    def show_repair(self, repair: Repair) -> None:
+        """
+        Shows who keeps their giftee and who must be told about a new one.
+        """
+        self.console.print(
+            f"\nKept: [theme-green]{repair.kept}[/] "
+            f"Changed: [yellow]{len(repair.changed)}[/] "
+            f"Dropped: [theme-red]{len(repair.dropped)}[/]"
+        )
+        names = repair.pairing.roster.full_names
+        for gifter in repair.changed:
+            self.console.print(f"[sec]{names[gifter]}[/] will be sent a new email")
+        for name in repair.dropped:
+            self.console.print(f"[sec]{name}[/] dropped out")
+
+    def repair_and_send(self, entries: list[Person], test=False) -> None:
+        """
+        Updates this year's pairs after `entries` changed and only emails the
+        gifters whose giftee changed.
+        """
+        from utils.matching import NoValidPairsError
+
+        year = dt.date.today().year
+        previous = self.history.assignment(year)
+        if not previous:
+            input(f"\nNo pairs have been sent for {year} yet.")
+            return
+
+        self.load_history(year)
+        index = self.build_index(entries)
+        if not self.preflight(entries, index).ok:
+            input("\nFix the problems above and try again.")
+            return
+        try:
+            repair = self.repair_pairs(entries, previous, index)
+        except NoValidPairsError as error:
+            self.show_blocking_entries(index.roster, error)
+            return
+        self.show_repair(repair)
+        if not repair.changed:
+            input("\nNo one needs a new email.")
+            return
+
+        msg = "\nDo you want to notify the changed gifters of their new giftee?\n"
+        response = input(msg)
+        if not response.lower() in ["yes", "y"]:
+            input("\nCancelled")
+            return
+        if test:
+            self.send_secret_santa_emails(pairs=repair.changed_pairs(), test=test)
+        else:
+            from utils.outbox import Outbox
+
+            self.history.replace(year, repair.pairing.names())
+            with Outbox(self.outbox_path) as outbox:
+                self.send_secret_santa_emails(
+                    pairs=repair.changed_pairs(), outbox=outbox
+                )
+        self.finish_metrics()
         input()
 
     def menu_actions(self) -> None:
+        from utils.action_picker import action_picker
+
         main_run = lambda: self.create_pairs_and_send(self.entries)
         test_run = lambda: self.create_pairs_and_send(self.test_entries, test=True)
+        repair_run = lambda: self.repair_and_send(self.entries)
         choices = [
             ("Send Secret Santa Emails", main_run),
             ("Send Test Emails", test_run),
+            ("Update Pairs After Roster Change", repair_run),
+            ("Resume Unsent Emails", self.resume_sending),
             ("Create Test Pairs", self.create_test_pairs),
             ("Create Test HTML File", self.create_test_email),
             ("Show Entries Table", lambda: self.show_entries_table(self.entries)),
@@ -357,6 +1293,8 @@ class SecretSanta:
         title = f"[theme-green]Secret Santa Pair Picker[/] | [theme-red]{year}[/]"
         self.console.print(title)
 
+        # timing every phase is only turned on when there is somewhere to put it
+        METRICS.enabled = self.metrics_path is not None
         self.show_entries_table(self.entries)
 
         self.menu_actions()
@@ -0,0 +1,52 @@
+# standard library
+import json
+
+# local imports
+from benchmarks.rosters import generate_roster
+from benchmarks.run import main
+
+
+class TestGenerateRoster:
+    """
+    Tests `generate_roster` function.
+    """
+
+    def test_size(self):
+        entries = generate_roster(250, household_size=3, seed=1)
+        assert len(entries) == 250
+        assert len({entry.full_name for entry in entries}) == 250
+
+    def test_bans(self):
+        entries = generate_roster(200, ban_density=1.0, seed=2)
+        banned = [entry for entry in entries if entry.prev_giftee]
+        assert len(banned) > 150
+        names = {entry.full_name: entry for entry in entries}
+        for entry in banned:
+            assert names[entry.prev_giftee].last_name != entry.last_name
+
+    def test_no_bans(self):
+        entries = generate_roster(50, ban_density=0.0, seed=3)
+        assert not any(entry.prev_giftee for entry in entries)
+
+    def test_reproducible(self):
+        first = [entry.full_name for entry in generate_roster(80, seed=4)]
+        second = [entry.full_name for entry in generate_roster(80, seed=4)]
+        assert first == second
+
+
+class TestRun:
+    """
+    Tests the benchmark `main` function.
+    """
+
+    def test_json(self, tmp_path):
+        output = tmp_path / "bench.json"
+        argv = ["--sizes", "12", "--household-sizes", "3", "--ban-densities", "0.5"]
+        argv += ["--repeats", "1", "--single-sends", "2", "--output", str(output)]
+        main(argv)
+        report = json.loads(output.read_text())
+        phases = {result["phase"] for result in report["results"]}
+        assert {"create_pairs_uniform", "get_assignment_count", "send_all"} <= phases
+        for result in report["results"]:
+            assert result["size"] == 12
+            assert result["min"] >= 0
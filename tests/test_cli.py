@@ -0,0 +1,230 @@
+# standard library
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io, json, threading
+
+# third-party imports
+import pytest
+
+# local imports
+from cli import EXIT_ERROR, EXIT_INVALID, EXIT_OK, EXIT_UNSENT, run
+from main import SecretSanta
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+
+
+def write_config(tmp_path, entries: list[dict] | str, name: str = "config.json"):
+    config = {
+        "settings": {
+            "history": str(tmp_path / "history.sqlite3"),
+            "outbox": str(tmp_path / "outbox.jsonl"),
+        },
+        "gmail": {"username": "santa@example.com", "password": "pw"},
+        "entries": entries,
+    }
+    path = tmp_path / name
+    path.write_text(json.dumps(config))
+    return path
+
+
+def create_entries(count: int) -> list[dict]:
+    return [
+        {"first": f"First{i}", "last": f"Last{i}", "email": f"p{i}@example.com"}
+        for i in range(count)
+    ]
+
+
+def run_cli(argv: list[str]) -> tuple[int, list[dict]]:
+    out = io.StringIO()
+    code = run(argv, out)
+    return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+class TestCli:
+    """
+    Tests `run` function.
+    """
+
+    def test_validate(self, tmp_path):
+        good = write_config(tmp_path, create_entries(4), "good.json")
+        entries = create_entries(3) + [{"first": "First0", "last": "Last0"}]
+        bad = write_config(tmp_path, entries, "bad.json")
+        code, results = run_cli(["validate", str(good), str(bad)])
+        assert code == EXIT_INVALID
+        assert [result["ok"] for result in results] == [True, False]
+        assert [result["exit_code"] for result in results] == [EXIT_OK, EXIT_INVALID]
+        assert results[1]["counts"]
+
+    def test_validate_roster_rows(self, tmp_path):
+        rows = ["first,last,email"]
+        rows += [f"First{i},Last{i},p{i}@example.com" for i in range(4)]
+        rows += [",NoFirst,a@example.com", "NoLast,,b@example.com"]
+        (tmp_path / "people.csv").write_text("\n".join(rows) + "\n")
+        path = write_config(tmp_path, "people.csv")
+        code, (result,) = run_cli(["validate", str(path)])
+        assert code == EXIT_INVALID
+        assert result["entries"] == 4
+        problems = [(p["kind"], p["row"]) for p in result["problems"]]
+        assert problems == [("unreadable_row", 6), ("unreadable_row", 7)]
+
+    def test_count(self, tmp_path):
+        path = write_config(tmp_path, create_entries(4))
+        code, (result,) = run_cli(["count", str(path)])
+        assert code == EXIT_OK
+        # the derangements of 4 people
+        assert result == {
+            "command": "count",
+            "config": str(path),
+            "exact": True,
+            "count": "9",
+            "exit_code": EXIT_OK,
+        }
+
+    def test_pair_seed(self, tmp_path):
+        path = write_config(tmp_path, create_entries(6))
+        argv = ["pair", str(path), "--seed", "7", "--reveal"]
+        code, (first,) = run_cli(argv)
+        _, (second,) = run_cli(argv)
+        assert code == EXIT_OK
+        assert first["seed"] == 7
+        assert first["digest"] == second["digest"]
+        assert len(first["pairs"]) == 6
+        assert all(gifter != giftee for gifter, giftee in first["pairs"])
+
+    def test_pair_hidden(self, tmp_path):
+        path = write_config(tmp_path, create_entries(4))
+        _, (result,) = run_cli(["pair", str(path), "--strategy", "cycle"])
+        assert "pairs" not in result
+        assert result["digest"]
+
+    def test_no_pairs(self, tmp_path):
+        path = write_config(tmp_path, create_entries(1))
+        code, (result,) = run_cli(["pair", str(path)])
+        assert code == EXIT_INVALID
+
+    def test_render(self, tmp_path):
+        path = write_config(tmp_path, create_entries(3))
+        output = tmp_path / "cards"
+        code, (result,) = run_cli(["render", str(path), "--output", str(output)])
+        assert code == EXIT_OK
+        assert len(result["cards"]) == 3
+        for name, file in result["cards"].items():
+            assert name in open(file).read()
+
+    def test_analyze(self, tmp_path):
+        path = write_config(tmp_path, create_entries(5))
+        argv = ["analyze", str(path), "--trials", "200", "--workers", "2"]
+        code, (result,) = run_cli(argv + ["--strategy", "cycle"])
+        assert code == EXIT_OK
+        assert result["trials"] == 200
+        assert result["failure_rate"] == 0.0
+        assert result["cycle_lengths"] == {"5": 200}
+        assert result["max_ratio"]["gifter"].startswith("First")
+
+    def test_metrics(self, tmp_path):
+        first = write_config(tmp_path, create_entries(4), "first.json")
+        second = write_config(tmp_path, create_entries(5), "second.json")
+        metrics = tmp_path / "metrics.json"
+        argv = ["render", str(first), str(second), "--output", str(tmp_path / "cards")]
+        code, _ = run_cli(argv + ["--metrics", str(metrics)])
+        assert code == EXIT_OK
+        data = json.loads(metrics.read_text())
+        assert data["spans"]["preflight"]["count"] == 2
+        assert data["spans"]["pairing"]["count"] == 2
+        assert data["spans"]["render"]["count"] == 9
+
+    def test_shuffle_limit(self, tmp_path):
+        # guests take each other first so the family is left with no one
+        entries = [
+            {"first": f"Guest{i}", "last": f"Guest{i}", "email": f"g{i}@example.com"}
+            for i in range(20)
+        ]
+        entries += [
+            {"first": f"Kid{i}", "last": "Smith", "email": f"k{i}@example.com"}
+            for i in range(20)
+        ]
+        stuck = write_config(tmp_path, entries, "stuck.json")
+        good = write_config(tmp_path, create_entries(4), "good.json")
+        for path in (stuck, good):
+            config = json.loads(path.read_text())
+            config["settings"]["strategy"] = "shuffle"
+            path.write_text(json.dumps(config))
+        code, results = run_cli(["pair", str(stuck), str(good), "--seed", "1"])
+        assert code == EXIT_INVALID
+        assert results[0]["error"] == "attempt_limit"
+        assert results[0]["exit_code"] == EXIT_INVALID
+        assert results[1]["exit_code"] == EXIT_OK
+
+    def test_missing_config(self, tmp_path):
+        code, (result,) = run_cli(["validate", str(tmp_path / "missing.json")])
+        assert code == EXIT_ERROR
+        assert result["error"] == "FileNotFoundError"
+
+    def test_stdout_is_json(self, tmp_path, capsys):
+        path = write_config(tmp_path, create_entries(3) + [{"first": "First0"}])
+        run(["validate", str(path)])
+        captured = capsys.readouterr()
+        assert json.loads(captured.out)["ok"] is False
+        assert "Roster Problems" in captured.err
+
+    def test_usage(self):
+        with pytest.raises(SystemExit) as error:
+            run(["shuffle"], io.StringIO())
+        assert error.value.code == 2
+
+    def test_send(self, tmp_path, monkeypatch):
+        path = write_config(tmp_path, create_entries(4))
+        with LocalSMTPServer() as server:
+            server.fail_recipient("p2@example.com", 550)
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            monkeypatch.setattr(SecretSanta, "email", email)
+            code, (result,) = run_cli(["send", str(path), "--seed", "3"])
+        assert code == EXIT_UNSENT
+        assert result["sent"] == 3
+        assert list(result["failed"]) == ["First2 Last2"]
+        assert len(server.messages) == 3
+        assert (tmp_path / "outbox.jsonl").exists()
+
+    def test_spool_and_flush(self, tmp_path, monkeypatch):
+        path = write_config(tmp_path, create_entries(4))
+        spool = tmp_path / "cards.mbox"
+        argv = ["spool", str(path), "--seed", "3", "--output", str(spool)]
+        code, (result,) = run_cli(argv)
+        assert code == EXIT_OK
+        assert result["spooled"] == 4
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            monkeypatch.setattr(SecretSanta, "email", email)
+            code, (result,) = run_cli(["flush", str(path), "--spool", str(spool)])
+        assert code == EXIT_OK
+        assert (result["sent"], result["left"]) == (4, 0)
+        assert len(server.messages) == 4
+
+    def test_wishlists(self, tmp_path):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200 if self.path == "/list" else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        entries = create_entries(3)
+        entries[0]["wishlist"] = f"{url}/list"
+        entries[1]["wishlist"] = f"{url}/gone"
+        path = write_config(tmp_path, entries)
+        config = json.loads(path.read_text())
+        config["settings"]["wishlist_cache"] = str(tmp_path / "wishlists.json")
+        path.write_text(json.dumps(config))
+        try:
+            code, (result,) = run_cli(["wishlists", str(path)])
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert code == EXIT_INVALID
+        assert result["checked"] == 2
+        assert result["broken"] == {"First1 Last1": "HTTP 404"}
+        assert result["missing"] == ["First2 Last2"]
@@ -0,0 +1,61 @@
+# standard library
+import random
+
+# local imports
+from main import SecretSanta, Person
+from utils.compatibility import CompatibilityIndex
+from utils.roster import intern
+
+
+class TestIntern:
+    """
+    Tests `intern` function.
+    """
+
+    def test_shared_ids(self):
+        table = {}
+        ids = intern(["Doe", "German", "Doe", None], table)
+        assert ids.tolist() == [0, 1, 0, 2]
+        assert table == {"Doe": 0, "German": 1, None: 2}
+
+
+class TestCompatibilityIndex:
+    """
+    Tests `CompatibilityIndex` class.
+    """
+
+    ss = SecretSanta()
+
+    @staticmethod
+    def generate_entries(length: int, seed: int) -> list[Person]:
+        rng = random.Random(seed)
+        entries = [
+            Person({"first": f"First{i}", "last": f"Last{rng.randrange(5)}"})
+            for i in range(length)
+        ]
+        for entry in entries:
+            entry.prev_giftee = rng.choice(entries).full_name
+        return entries
+
+    def test_matches_is_valid_pair(self):
+        entries = self.generate_entries(40, seed=1)
+        index = CompatibilityIndex(entries)
+        for gifter in entries:
+            for giftee in entries:
+                expected = self.ss.is_valid_pair(gifter, giftee)
+                assert index.is_valid_pair(gifter, giftee) == expected
+
+    def test_unknown_prev_giftee(self):
+        entries = [
+            Person({"first": "John", "last": "Doe", "prev_giftee": "Nobody Here"}),
+            Person({"first": "Bill", "last": "German"}),
+        ]
+        index = CompatibilityIndex(entries)
+        assert index.prev_ids.tolist() == [-1, -1]
+        assert index.matrix.tolist() == [[False, True], [True, False]]
+
+    def test_counts(self):
+        entries = self.generate_entries(12, seed=3)
+        index = CompatibilityIndex(entries)
+        assert index.giftee_counts().sum() == index.matrix.sum()
+        assert index.gifter_counts().sum() == index.matrix.sum()
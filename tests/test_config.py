@@ -0,0 +1,64 @@
+# standard library
+import io, json
+
+# local imports
+from utils.config import Config
+
+
+class TestConfig:
+    """
+    Tests `Config` class.
+    """
+
+    data = {
+        "settings": {"workers": 4},
+        "gmail": {"username": "santa@example.com"},
+        "entries": [{"first": "John", "last": "Doe", "email": "john@example.com"}],
+        "test_entries": [{"first": "Jane", "last": "Doe"}],
+    }
+
+    def test_load_path(self, tmp_path):
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(self.data))
+        config = Config.load(path)
+        assert config.settings == {"workers": 4}
+        assert config.gmail["username"] == "santa@example.com"
+        assert config.entries[0].email == "john@example.com"
+
+    def test_load_stream(self):
+        config = Config.load(io.StringIO(json.dumps(self.data)))
+        assert config.test_entries[0].full_name == "Jane Doe"
+
+    def test_entries_built_once(self):
+        config = Config(self.data)
+        assert config.entries is config.entries
+
+    def test_empty(self):
+        config = Config()
+        assert config.settings == {}
+        assert config.gmail == {}
+        assert config.entries == []
+
+    def test_roster_path(self, tmp_path):
+        (tmp_path / "people.csv").write_text("first,last\nJohn,Doe\nBill,German\n")
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps({"entries": "people.csv"}))
+        config = Config.load(path)
+        assert [entry.full_name for entry in config.entries] == [
+            "John Doe",
+            "Bill German",
+        ]
+
+    def test_roster_errors(self, tmp_path):
+        rows = "first,last\nJohn,Doe\n,German\nRyan,Bickman\nJane,\n"
+        (tmp_path / "people.csv").write_text(rows)
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps({"entries": "people.csv"}))
+        config = Config.load(path)
+        assert len(config.entries) == 2
+        # every bad row is kept instead of only the first
+        errors = config.row_errors["entries"]
+        assert [(error.line, error.message) for error in errors] == [
+            (3, "missing first"),
+            (5, "missing last"),
+        ]
@@ -0,0 +1,203 @@
+# standard library
+import itertools, math
+
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from utils.counting import (
+    HouseholdCounts,
+    count_assignments,
+    estimate_assignments,
+    format_count,
+    grouped_permanent,
+    household_bans,
+    household_permanent,
+    ryser_permanent,
+)
+
+
+def brute_force_count(matrix: np.ndarray) -> int:
+    size = len(matrix)
+    return sum(
+        all(matrix[i, giftee] for i, giftee in enumerate(permutation))
+        for permutation in itertools.permutations(range(size))
+    )
+
+
+def random_rosters(count: int, seed: int):
+    """
+    Yields random household matrices with a few extra bans.
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        size = int(rng.integers(1, 8))
+        groups = rng.integers(0, 3, size)
+        matrix = groups[:, None] != groups[None, :]
+        for _ in range(int(rng.integers(0, 4))):
+            gifter, giftee = rng.integers(0, size, 2)
+            matrix[gifter, giftee] = False
+        yield matrix, groups
+
+
+class TestRyserPermanent:
+    """
+    Tests `ryser_permanent` function.
+    """
+
+    def test_derangements(self):
+        # subfactorials
+        counts = [ryser_permanent(~np.eye(n, dtype=bool)) for n in range(1, 9)]
+        assert counts == [0, 1, 2, 9, 44, 265, 1854, 14833]
+
+    def test_empty(self):
+        assert ryser_permanent(np.zeros((0, 0), dtype=bool)) == 1
+
+    def test_brute_force(self):
+        for matrix, _ in random_rosters(50, seed=1):
+            assert ryser_permanent(matrix) == brute_force_count(matrix)
+
+
+class TestHouseholdPermanent:
+    """
+    Tests `household_permanent` function.
+    """
+
+    def test_derangements(self):
+        assert household_permanent(np.arange(8)) == 14833
+
+    def test_two_households(self):
+        # each household buys for the other in 3! * 3! ways
+        assert household_permanent(np.array([0, 0, 0, 1, 1, 1])) == 36
+
+    def test_bans(self):
+        groups = np.array([0, 0, 1, 1, 2, 2])
+        matrix = groups[:, None] != groups[None, :]
+        bans = [(0, 2), (3, 4)]
+        for gifter, giftee in bans:
+            matrix[gifter, giftee] = False
+        assert household_permanent(groups, bans) == brute_force_count(matrix)
+
+    def test_large(self):
+        groups = np.repeat(np.arange(100), 4)
+        count = household_permanent(groups)
+        assert count > 0
+        estimate = estimate_assignments(groups[:, None] != groups[None, :])
+        assert estimate.lower <= math.log10(count) <= estimate.upper
+
+
+class TestGroupedPermanent:
+    """
+    Tests `grouped_permanent` function.
+    """
+
+    def test_brute_force(self):
+        rng = np.random.default_rng(3)
+        for _ in range(60):
+            size = int(rng.integers(1, 8))
+            groups = rng.integers(0, 3, size)
+            matrix = groups[:, None] != groups[None, :]
+            # at most one ban for each gifter, some on the same giftee
+            for gifter in range(size):
+                if rng.random() < 0.7:
+                    matrix[gifter, rng.integers(0, min(size, 3))] = False
+            bans = household_bans(matrix, groups)
+            assert grouped_permanent(groups, bans) == brute_force_count(matrix)
+
+    def test_previous_giftees(self):
+        # everyone bought for the next household last year
+        groups = np.repeat(np.arange(5), 3)
+        previous = (np.arange(15) + 3) % 15
+        matrix = groups[:, None] != groups[None, :]
+        matrix[np.arange(15), previous] = False
+        bans = household_bans(matrix, groups)
+        assert grouped_permanent(groups, bans) == ryser_permanent(matrix)
+
+    def test_two_bans(self):
+        with pytest.raises(ValueError):
+            grouped_permanent(np.arange(3), [(0, 1), (0, 2)])
+
+
+class TestHouseholdCounts:
+    """
+    Tests `HouseholdCounts` class.
+    """
+
+    def test_counts(self):
+        groups = np.array([0, 0, 0, 1, 1, 2, 3])
+        counts = HouseholdCounts([3, 2, 1, 1], [3, 2, 1, 1])
+        assert counts.count() == household_permanent(groups)
+        # the first gifter of household 0 takes each giftee household in turn
+        counts.remove_gifter(0)
+        for household, count in counts.giftee_counts(0).items():
+            giftee = groups.tolist().index(household)
+            minor = np.delete(np.delete(groups[:, None] != groups, 0, 0), giftee, 1)
+            assert count == ryser_permanent(minor)
+        counts.remove_giftee(2)
+        minor = np.delete(np.delete(groups[:, None] != groups, 0, 0), 5, 1)
+        assert counts.count() == ryser_permanent(minor)
+
+
+class TestCountAssignments:
+    """
+    Tests `count_assignments` function.
+    """
+
+    def test_brute_force(self):
+        for matrix, groups in random_rosters(50, seed=2):
+            expected = brute_force_count(matrix)
+            assert count_assignments(matrix, groups) == expected
+            assert count_assignments(matrix) == expected
+
+    def test_too_large(self):
+        matrix = np.ones((30, 30), dtype=bool)
+        with pytest.raises(ValueError):
+            count_assignments(matrix)
+
+    def test_ban_for_everyone(self):
+        groups = np.repeat(np.arange(6), 4)
+        matrix = groups[:, None] != groups[None, :]
+        matrix[np.arange(24), (np.arange(24) + 4) % 24] = False
+        count = count_assignments(matrix, groups, ryser_limit=0)
+        estimate = estimate_assignments(matrix)
+        assert estimate.lower <= math.log10(count) <= estimate.upper
+
+    def test_too_many_bans(self):
+        groups = np.repeat(np.arange(6), 4)
+        matrix = groups[:, None] != groups[None, :]
+        matrix[0, 4:20] = False
+        with pytest.raises(ValueError, match="more than one giftee"):
+            count_assignments(matrix, groups, ryser_limit=0)
+
+
+class TestEstimateAssignments:
+    """
+    Tests `estimate_assignments` function.
+    """
+
+    def test_bounds(self):
+        for matrix, _ in random_rosters(50, seed=3):
+            count = brute_force_count(matrix)
+            estimate = estimate_assignments(matrix)
+            if count == 0:
+                assert estimate.lower == -math.inf
+            else:
+                assert estimate.lower <= math.log10(count) + 1e-9
+                assert math.log10(count) <= estimate.upper + 1e-9
+
+    def test_gifter_without_giftees(self):
+        matrix = np.array([[False, True], [False, False]])
+        assert estimate_assignments(matrix).upper == -math.inf
+
+
+class TestFormatCount:
+    """
+    Tests `format_count` function.
+    """
+
+    def test_small(self):
+        assert format_count(1296) == "1,296"
+
+    def test_large(self):
+        assert format_count(3 * 10**40) == "3.00e40"
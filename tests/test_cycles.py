@@ -0,0 +1,82 @@
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from main import SecretSanta
+from utils.cycles import cycle_labels, single_cycle, NoSingleCycleError
+from utils.person import Person
+
+
+class TestCycleLabels:
+    """
+    Tests `cycle_labels` function.
+    """
+
+    def test_labels(self):
+        labels, count = cycle_labels(np.array([1, 0, 3, 4, 2]))
+        assert labels.tolist() == [0, 0, 1, 1, 1]
+        assert count == 2
+
+
+class TestSingleCycle:
+    """
+    Tests `single_cycle` function.
+    """
+
+    @staticmethod
+    def households(size: int, household_size: int) -> np.ndarray:
+        households = np.arange(size) // household_size
+        return households[:, None] != households[None, :]
+
+    def test_one_cycle(self):
+        matrix = self.households(500, 4)
+        for seed in range(5):
+            giftee_of = single_cycle(matrix, np.random.default_rng(seed))
+            assert matrix[np.arange(500), giftee_of].all()
+            assert cycle_labels(giftee_of)[1] == 1
+
+    def test_two_people(self):
+        matrix = ~np.eye(2, dtype=bool)
+        assert single_cycle(matrix).tolist() == [1, 0]
+
+    def test_not_connected(self):
+        # two groups that can only buy within themselves
+        matrix = np.zeros((4, 4), dtype=bool)
+        matrix[0, 1] = matrix[1, 0] = matrix[2, 3] = matrix[3, 2] = True
+        with pytest.raises(NoSingleCycleError, match="strongly connected"):
+            single_cycle(matrix)
+
+    def test_one_way(self):
+        # everyone can pass a gift on but nobody can give back to the first two
+        matrix = self.households(6, 1)
+        matrix[2:, :2] = False
+        with pytest.raises(NoSingleCycleError, match="strongly connected"):
+            single_cycle(matrix)
+
+    def test_no_giftee(self):
+        matrix = self.households(4, 1)
+        matrix[0] = False
+        with pytest.raises(NoSingleCycleError, match="no valid giftee"):
+            single_cycle(matrix)
+
+
+class TestCycleStrategy:
+    """
+    Tests the `cycle` strategy of `create_pairs`.
+    """
+
+    ss = SecretSanta()
+
+    def test_create_pairs(self):
+        data = [{"first": f"Kid{i}", "last": f"Family{i // 3}"} for i in range(30)]
+        entries = [Person(entry) for entry in data]
+        pairs = self.ss.create_pairs(entries, strategy="cycle", seed=2)
+        assert self.ss.validate_pairs(pairs)
+        assert cycle_labels(pairs.giftee_of)[1] == 1
+        assert pairs == self.ss.create_pairs(entries, strategy="cycle", seed=2)
+
+    def test_impossible(self):
+        data = [{"first": "John", "last": "Doe"}]
+        with pytest.raises(SystemExit):
+            self.ss.create_pairs([Person(entry) for entry in data], strategy="cycle")
@@ -0,0 +1,213 @@
+# standard library
+import smtplib
+
+# local imports
+from utils.dispatch import (
+    Account,
+    TokenBucket,
+    dispatch,
+    dispatch_accounts,
+    is_transient,
+)
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+from utils.scheduler import QuotaStore
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """
+    Tests `TokenBucket` class.
+    """
+
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+        for _ in range(6):
+            bucket.acquire()
+        # two tokens to start with then two per second
+        assert clock.now == 2.0
+
+    def test_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=3, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            bucket.acquire()
+        assert clock.sleeps == []
+
+
+class TestIsTransient:
+    """
+    Tests `is_transient` function.
+    """
+
+    def test_transient(self):
+        assert is_transient(smtplib.SMTPServerDisconnected())
+        assert is_transient(smtplib.SMTPResponseException(421, "Try later"))
+        refused = smtplib.SMTPRecipientsRefused({"elf@example.com": (451, "Later")})
+        assert is_transient(refused)
+        assert is_transient(ConnectionResetError())
+
+    def test_permanent(self):
+        assert not is_transient(smtplib.SMTPAuthenticationError(535, "Bad login"))
+        refused = smtplib.SMTPRecipientsRefused({"elf@example.com": (550, "No")})
+        assert not is_transient(refused)
+        assert not is_transient(ValueError())
+
+
+class TestDispatch:
+    """
+    Tests `dispatch` function.
+    """
+
+    @staticmethod
+    def create_messages(count: int):
+        for i in range(count):
+            yield f"Elf {i}", f"elf{i}@example.com", f"Subject: Hi\r\n\r\nBody {i}"
+
+    def test_sends_all(self):
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            report = dispatch(email, self.create_messages(40), workers=4)
+            assert len(report.sent) == 40
+            assert not report.failed
+            assert len(server.messages) == 40
+            assert server.logins <= 4
+
+    def test_retry(self):
+        clock = FakeClock()
+        with LocalSMTPServer() as server:
+            server.fail_recipient("elf1@example.com", 451, times=2)
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            report = dispatch(
+                email,
+                self.create_messages(3),
+                workers=2,
+                backoff=0.5,
+                sleep=clock.sleep,
+            )
+            assert report.retried == ["Elf 1"]
+            assert report.attempts["Elf 1"] == 3
+            assert clock.sleeps == [0.5, 1.0]
+            assert len(server.messages) == 3
+
+    def test_permanent_failure(self):
+        clock = FakeClock()
+        with LocalSMTPServer() as server:
+            server.fail_recipient("elf2@example.com", 550)
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            results = []
+            report = dispatch(
+                email,
+                self.create_messages(3),
+                workers=1,
+                on_result=lambda name, error: results.append((name, error)),
+                sleep=clock.sleep,
+            )
+            assert report.failed == ["Elf 2"]
+            assert report.attempts["Elf 2"] == 1
+            assert clock.sleeps == []
+            assert len(results) == 3
+
+    def test_gives_up(self):
+        clock = FakeClock()
+        with LocalSMTPServer() as server:
+            server.fail_recipient("elf0@example.com", 421, times=10)
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            report = dispatch(
+                email, self.create_messages(1), retries=2, sleep=clock.sleep
+            )
+            assert report.failed == ["Elf 0"]
+            assert report.attempts["Elf 0"] == 3
+
+
+class TestDispatchAccounts:
+    """
+    Tests `dispatch_accounts` function.
+    """
+
+    def test_accounts(self, tmp_path):
+        messages = [
+            (i % 2, f"Elf {i}", f"elf{i}@example.com", f"Subject: Hi\r\n\r\nBody {i}")
+            for i in range(10)
+        ]
+        with LocalSMTPServer() as first, LocalSMTPServer() as second:
+            accounts = [
+                Account(Email("a@example.com", "pw", first.host, first.port, False)),
+                Account(
+                    Email("b@example.com", "pw", second.host, second.port, False),
+                    workers=2,
+                ),
+            ]
+            with QuotaStore(tmp_path / "quota.sqlite3") as quota:
+                report = dispatch_accounts(accounts, iter(messages), quota=quota)
+                assert quota.usage() == {"a@example.com": 5, "b@example.com": 5}
+            assert len(report.sent) == 10
+            assert {message[0] for message in first.messages} == {"a@example.com"}
+            assert {message[0] for message in second.messages} == {"b@example.com"}
+            assert len(first.messages) == len(second.messages) == 5
+
+    def test_failures_not_counted(self, tmp_path):
+        with LocalSMTPServer() as server:
+            server.fail_recipient("elf1@example.com", 550)
+            email = Email("a@example.com", "pw", server.host, server.port, False)
+            messages = [
+                (0, f"Elf {i}", f"elf{i}@example.com", "Subject: Hi\r\n\r\nBody")
+                for i in range(3)
+            ]
+            with QuotaStore(tmp_path / "quota.sqlite3") as quota:
+                report = dispatch_accounts([Account(email)], messages, quota=quota)
+                assert quota.usage() == {"a@example.com": 2}
+            assert report.failed == ["Elf 1"]
+
+    def test_unsaved(self, tmp_path):
+        with LocalSMTPServer() as server:
+            email = Email("a@example.com", "pw", server.host, server.port, False)
+            messages = [
+                (0, f"Elf {i}", f"elf{i}@example.com", "Subject: Hi\r\n\r\nBody")
+                for i in range(3)
+            ]
+
+            def on_result(name, error):
+                if name == "Elf 1":
+                    raise OSError("disk full")
+
+            with QuotaStore(tmp_path / "quota.sqlite3") as quota:
+                report = dispatch_accounts(
+                    [Account(email, workers=2)], messages, quota, on_result=on_result
+                )
+            assert len(server.messages) == 3
+        assert len(report.sent) == 3
+        assert list(report.unsaved) == ["Elf 1"]
+        assert str(report.unsaved["Elf 1"]) == "disk full"
+
+    def test_quota_error(self):
+        class BrokenQuota:
+            def add(self, name):
+                raise OSError("database is locked")
+
+        with LocalSMTPServer() as server:
+            email = Email("a@example.com", "pw", server.host, server.port, False)
+            messages = [(0, "Elf 0", "elf0@example.com", "Subject: Hi\r\n\r\nBody")]
+            results = []
+            report = dispatch_accounts(
+                [Account(email)],
+                messages,
+                BrokenQuota(),
+                on_result=lambda name, error: results.append(name),
+            )
+        assert list(report.unsaved) == ["Elf 0"]
+        # the result is still saved when the quota is not
+        assert results == ["Elf 0"]
@@ -1,5 +1,6 @@
 # local imports
 from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
 
 
 class TestValidateEmail:
@@ -18,3 +19,46 @@ class TestValidateEmail:
         email = "bad_email%test.yom"
         valid = self.email.validate_email(email)
         assert not valid
+
+
+class TestEmailSession:
+    """
+    Tests `EmailSession` class.
+    """
+
+    def test_one_login(self):
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            with email.session() as session:
+                for i in range(5):
+                    session.send_email("Subject", f"Body {i}", f"elf{i}@example.com")
+            assert server.logins == 1
+            assert server.connections == 1
+            assert [message[1] for message in server.messages] == [
+                [f"elf{i}@example.com"] for i in range(5)
+            ]
+
+    def test_reconnect(self):
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            with email.session() as session:
+                session.send_email("Subject", "First", "elf@example.com")
+                server.disconnect_all()
+                session.send_email("Subject", "Second", "elf@example.com")
+            assert server.logins == 2
+            assert len(server.messages) == 2
+
+    def test_close(self):
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            session = email.session()
+            session.send_email("Subject", "Body", "elf@example.com")
+            session.close()
+            assert session.server is None
+            session.close()
+
+    def test_send_email(self):
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            email.send_email("Subject", "<p>Body</p>", "elf@example.com", "html")
+            assert b"<p>Body</p>" in server.messages[0][2]
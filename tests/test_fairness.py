@@ -0,0 +1,131 @@
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from utils.compatibility import CompatibilityIndex
+from utils.counting import ryser_permanent
+from utils.fairness import analyze_fairness, uniform_frequencies
+from utils.person import Person
+
+
+def create_index(count: int, household: int = 1) -> CompatibilityIndex:
+    people = [
+        Person(
+            {
+                "first": f"First{i}",
+                "last": f"Last{i // household}",
+                "email": f"p{i}@example.com",
+            }
+        )
+        for i in range(count)
+    ]
+    return CompatibilityIndex(people)
+
+
+class TestUniformFrequencies:
+    """
+    Tests `uniform_frequencies` function.
+    """
+
+    def test_exact(self):
+        matrix = ~np.eye(3, dtype=bool)
+        expected, baseline = uniform_frequencies(matrix)
+        assert baseline == "exact"
+        # the two derangements of 3 people use each valid pair once
+        assert np.allclose(expected, matrix * 0.5)
+
+    def test_sinkhorn(self):
+        matrix = ~np.eye(20, dtype=bool)
+        expected, baseline = uniform_frequencies(matrix)
+        assert baseline == "sinkhorn"
+        assert np.allclose(expected, matrix / 19)
+
+    def test_impossible(self):
+        expected, _ = uniform_frequencies(np.zeros((2, 2), dtype=bool))
+        assert not expected.any()
+
+    def test_households(self):
+        groups = np.array([i // 3 for i in range(12)])
+        matrix = groups[:, None] != groups[None, :]
+        matrix[np.arange(12), (np.arange(12) + 3) % 12] = False
+        expected, baseline = uniform_frequencies(matrix, groups)
+        assert baseline == "exact"
+        total = ryser_permanent(matrix)
+        for gifter, giftee in [(0, 4), (0, 6), (5, 1), (11, 0)]:
+            minor = np.delete(np.delete(matrix, gifter, 0), giftee, 1)
+            assert expected[gifter, giftee] == ryser_permanent(minor) / total
+
+    def test_large_households(self):
+        groups = np.array([i // 4 for i in range(40)])
+        matrix = groups[:, None] != groups[None, :]
+        matrix[0, 4] = False
+        expected, baseline = uniform_frequencies(matrix, groups)
+        assert baseline == "exact"
+        assert np.allclose(expected.sum(axis=0), 1)
+        assert np.allclose(expected.sum(axis=1), 1)
+
+
+class TestAnalyzeFairness:
+    """
+    Tests `analyze_fairness` function.
+    """
+
+    @pytest.mark.parametrize("strategy", ["uniform", "matching", "optimal", "cycle"])
+    def test_strategies(self, strategy):
+        index = create_index(6)
+        report = analyze_fairness(index, strategy, trials=300, workers=1)
+        assert report.failures == 0
+        assert report.counts.sum(axis=1).tolist() == [300] * 6
+        assert report.invalid_pairs == 0
+
+    def test_workers(self):
+        index = create_index(6, household=2)
+        one = analyze_fairness(index, "matching", trials=400, workers=1, seed=5)
+        many = analyze_fairness(
+            index, "matching", trials=400, workers=3, seed=5, chunk=50
+        )
+        assert np.array_equal(one.counts, many.counts)
+        assert np.array_equal(one.cycle_lengths, many.cycle_lengths)
+
+    def test_cycle_lengths(self):
+        report = analyze_fairness(create_index(5), "cycle", trials=50, workers=1)
+        assert report.cycle_lengths.tolist() == [0, 0, 0, 0, 0, 50]
+
+    def test_failures(self):
+        report = analyze_fairness(create_index(2, household=2), trials=20, workers=1)
+        assert report.failures == 20
+        assert report.failure_rate == 1.0
+
+    def test_bias(self):
+        index = create_index(6, household=2)
+        uniform = analyze_fairness(index, "uniform", trials=3000, workers=1)
+        shuffle = analyze_fairness(index, "shuffle", trials=3000, workers=1)
+        # taking the first valid giftee left favors some pairs over others
+        assert shuffle.total_variation.max() > 3 * uniform.total_variation.max()
+        assert uniform.to_dict()["max_z_score"] < 5
+
+    def test_optimal_weights(self):
+        people = [
+            Person({"first": f"First{i}", "last": f"Last{i}", "branch": f"B{i // 3}"})
+            for i in range(6)
+        ]
+        index = CompatibilityIndex(people)
+        same_branch = np.equal.outer(np.arange(6) // 3, np.arange(6) // 3)
+        report = analyze_fairness(index, "optimal", trials=40, workers=1)
+        assert not report.counts[same_branch].any()
+        # the weights of the settings are used instead of the defaults
+        report = analyze_fairness(
+            index, "optimal", trials=40, workers=1, weights={"same_branch": -1.0}
+        )
+        assert report.counts[same_branch].sum() == 40 * 6
+
+    def test_approximate_baseline(self):
+        report = analyze_fairness(create_index(70), "matching", trials=10, workers=1)
+        assert report.to_dict()["baseline_approximate"] is True
+        report = analyze_fairness(create_index(6), "matching", trials=10, workers=1)
+        assert report.to_dict()["baseline_approximate"] is False
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            analyze_fairness(create_index(3), "random")
@@ -0,0 +1,74 @@
+# local imports
+from main import SecretSanta
+from utils.compatibility import CompatibilityIndex
+from utils.history import GiftHistory
+from utils.person import Person
+
+
+class TestGiftHistory:
+    """
+    Tests `GiftHistory` class.
+    """
+
+    def test_record(self, tmp_path):
+        path = tmp_path / "history.sqlite3"
+        with GiftHistory(path) as history:
+            history.record(2023, [("John Doe", "Bill German")])
+            history.record(2024, [("John Doe", "Ryan Bickman")])
+            history.record(2024, [("John Doe", "Jane Doe")])
+        # reopened to check it was saved to disk
+        with GiftHistory(path) as history:
+            assert history.assignment(2023) == {"John Doe": "Bill German"}
+            assert history.assignment(2024) == {"John Doe": "Jane Doe"}
+
+    def test_ages(self, tmp_path):
+        with GiftHistory(tmp_path / "history.sqlite3") as history:
+            for year, giftee in [(2021, "A"), (2022, "C"), (2023, "C"), (2024, "D")]:
+                history.record(year, [("John Doe", giftee)])
+            assert history.ages(2025, 3) == {"John Doe": {"C": 2, "D": 1}}
+            assert history.ages(2025, 0) == {}
+
+
+class TestRepeatYears:
+    """
+    Tests excluding recent giftees from pairs.
+    """
+
+    data = [
+        {"first": "John", "last": "Doe"},
+        {"first": "Bill", "last": "German"},
+        {"first": "Ryan", "last": "Bickman"},
+        {"first": "Linda", "last": "Smith"},
+        {"first": "Ellie", "last": "Jones"},
+    ]
+
+    def test_index(self):
+        entries = [Person(entry) for entry in self.data]
+        exclusions = {"John Doe": {"Bill German", "Santa Claus"}}
+        index = CompatibilityIndex(entries, exclusions)
+        assert not index.matrix[0, 1]
+        assert index.matrix[0, 2]
+        assert index.matrix[1, 0]
+
+    def test_is_valid_pair(self):
+        ss = SecretSanta({})
+        john, bill = Person(self.data[0]), Person(self.data[1])
+        ss.recent_giftees = {"John Doe": {"Bill German"}}
+        assert not ss.is_valid_pair(john, bill)
+        assert ss.is_valid_pair(bill, john)
+
+    def test_no_repeats(self, tmp_path):
+        settings = {"repeat_years": 2, "history": str(tmp_path / "history.sqlite3")}
+        ss = SecretSanta({"settings": settings})
+        entries = [Person(entry) for entry in self.data]
+        for year in range(2020, 2026):
+            ss.load_history(year)
+            pairs = ss.create_pairs(entries, seed=year)
+            assert ss.validate_pairs(pairs)
+            ss.history.record(year, pairs.names())
+        for gifter in ss.history.assignment(2020):
+            giftees = [
+                ss.history.assignment(year)[gifter] for year in range(2020, 2026)
+            ]
+            for year in range(2, len(giftees)):
+                assert giftees[year] not in giftees[year - 2 : year]
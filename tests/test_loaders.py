@@ -0,0 +1,92 @@
+# standard library
+import io, json
+
+# third-party imports
+import pytest
+
+# local imports
+from utils.loaders import read_csv, read_jsonl, read_roster, RowError
+from utils.person import Person
+
+
+class TestReadCsv:
+    """
+    Tests `read_csv` function.
+    """
+
+    def test_export_columns(self):
+        source = io.StringIO(
+            "First Name,Last Name,Email Address,Department,Notes\n"
+            "John,Doe,john@example.com,Sales,Likes tea\n"
+            "\n"
+            "Bill,German,bill@example.com,IT,\n"
+        )
+        entries = list(read_csv(source))
+        assert [entry.full_name for entry in entries] == ["John Doe", "Bill German"]
+        assert entries[0].email == "john@example.com"
+        assert entries[0].notes == "Likes tea"
+        assert entries[1].notes is None
+
+    def test_errors(self):
+        source = io.StringIO("first,last\nJohn,Doe\n,German\nRyan\n")
+        errors = []
+        entries = list(read_csv(source, errors))
+        assert [entry.full_name for entry in entries] == ["John Doe"]
+        assert [error.line for error in errors] == [3, 4]
+        assert errors[1].message == "missing last"
+
+    def test_raises(self):
+        source = io.StringIO("first,last\n,Doe\n")
+        with pytest.raises(RowError):
+            list(read_csv(source))
+
+
+class TestReadJsonl:
+    """
+    Tests `read_jsonl` function.
+    """
+
+    def test_streams(self):
+        source = io.StringIO(
+            '{"first": "John", "last": "Doe", "notes": "Tea", "wishlist": "link"}\n'
+            "not json\n"
+            "[1, 2]\n"
+            '{"first": "Bill", "last": "German"}\n'
+        )
+        errors = []
+        entries = read_jsonl(source, errors)
+        first = next(entries)
+        assert first.notes == "Tea" and first.wishlist == "link"
+        # later lines are only read as they are needed
+        assert errors == []
+        assert [entry.full_name for entry in entries] == ["Bill German"]
+        assert [error.line for error in errors] == [2, 3]
+
+
+class TestReadRoster:
+    """
+    Tests `read_roster` function.
+    """
+
+    def test_formats(self, tmp_path):
+        (tmp_path / "roster.csv").write_text("first,last\nJohn,Doe\n")
+        (tmp_path / "roster.jsonl").write_text('{"first": "John", "last": "Doe"}\n')
+        entries = [{"first": "John", "last": "Doe"}]
+        (tmp_path / "roster.json").write_text(json.dumps({"entries": entries}))
+        for name in ("roster.csv", "roster.jsonl", "roster.json"):
+            roster = list(read_roster(tmp_path / name))
+            assert [entry.full_name for entry in roster] == ["John Doe"]
+        with pytest.raises(ValueError):
+            read_roster(tmp_path / "roster.xlsx")
+
+
+class TestPerson:
+    """
+    Tests `Person` class.
+    """
+
+    def test_slots(self):
+        person = Person({"first": "John", "last": "Doe", "notes": "Tea"})
+        assert person.notes == "Tea"
+        assert person.wishlist is None
+        assert not hasattr(person, "__dict__")
@@ -1,8 +1,15 @@
 # standard library
-import random, string
+import random, string, math, json, subprocess, sys, time
+
+# third-party imports
+import pytest
 
 # local imports
 from main import SecretSanta, Person
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+from utils.matching import NoValidPairsError
+from utils.sampling import AttemptLimitError
 
 
 class TestIsValidPair:
@@ -202,6 +209,42 @@ class TestValidatePairs:
         assert not self.ss.validate_pairs(pairs)
 
 
+class TestValidateEntries:
+    """
+    Tests `validate_emails` and `validate_prev_giftees` functions.
+    """
+
+    ss = SecretSanta()
+
+    def test_valid(self):
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+        ]
+        entries = [Person(entry) for entry in data]
+        entries[0].prev_giftee = "Bill German"
+        self.ss.validate_emails(entries)
+        self.ss.validate_prev_giftees(entries)
+
+    def test_invalid(self, monkeypatch):
+        prompts = []
+        monkeypatch.setattr("builtins.input", prompts.append)
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill"},
+        ]
+        entries = [Person(entry) for entry in data]
+        entries[0].prev_giftee = "Santa Claus"
+        with pytest.raises(SystemExit):
+            self.ss.validate_emails(entries)
+        with pytest.raises(SystemExit):
+            self.ss.validate_prev_giftees(entries)
+        assert prompts == [
+            "bill for Bill German is not a valid email.",
+            "Failed to match Santa Claus with anyone.",
+        ]
+
+
 class TestGetPermutationsCount:
     """
     Tests `get_permutations_count` function.
@@ -276,3 +319,224 @@ class TestCreatePairs:
         entries = self.generate_random_entries(4)
         pairs = self.ss.create_pairs(entries)
         print(pairs)
+
+    def test_large_family(self):
+        # half of everyone shares a last name so they must buy for the rest
+        data = [{"first": f"Kid{i}", "last": "Smith"} for i in range(20)]
+        data += [{"first": f"Guest{i}", "last": f"Guest{i}"} for i in range(20)]
+        entries = [Person(entry) for entry in data]
+        pairs = self.ss.create_pairs(entries)
+        assert len(pairs) == len(entries)
+        assert self.ss.validate_pairs(pairs)
+
+    def test_big_families(self):
+        # far too few orders are valid to shuffle and too many to count
+        data = [{"first": f"Kid{i}", "last": f"Family{i // 100}"} for i in range(600)]
+        entries = [Person(entry) for entry in data]
+        start = time.perf_counter()
+        pairs = self.ss.create_pairs(entries, seed=1)
+        assert time.perf_counter() - start < 10
+        assert self.ss.validate_pairs(pairs)
+
+    def test_seed(self):
+        entries = self.generate_random_entries(30)
+        for strategy in ("uniform", "matching", "shuffle"):
+            first = self.ss.create_pairs(entries, strategy=strategy, seed=5)
+            second = self.ss.create_pairs(entries, strategy=strategy, seed=5)
+            assert first == second
+            assert self.ss.validate_pairs(first)
+
+    def test_impossible(self):
+        data = [
+            {"first": "John", "last": "Doe"},
+            {"first": "Jane", "last": "Doe"},
+            {"first": "Bill", "last": "German"},
+        ]
+        entries = [Person(entry) for entry in data]
+        with pytest.raises(SystemExit):
+            self.ss.create_pairs(entries)
+
+    def test_shuffle_errors(self):
+        data = [{"first": f"Guest{i}", "last": f"Guest{i}"} for i in range(20)]
+        data += [{"first": f"Kid{i}", "last": "Smith"} for i in range(20)]
+        entries = [Person(entry) for entry in data]
+        with pytest.raises(AttemptLimitError):
+            self.ss.shuffle_pairs(entries, seed=1)
+        with pytest.raises(NoValidPairsError):
+            self.ss.shuffle_pairs(entries[15:], seed=1)
+        with pytest.raises(SystemExit):
+            self.ss.create_pairs(entries, strategy="shuffle", seed=1)
+
+
+class TestGetAssignmentCount:
+    """
+    Tests `get_assignment_count` function.
+    """
+
+    ss = SecretSanta()
+
+    def test_assignments(self):
+        data = [
+            {"first": "John", "last": "Doe", "prev_giftee": "Linda German"},
+            {"first": "Jane", "last": "Doe", "prev_giftee": "Bill German"},
+            {"first": "Linda", "last": "German", "prev_giftee": "Jane Doe"},
+            {"first": "Bill", "last": "German", "prev_giftee": "John Doe"},
+            {"first": "Ryan", "last": "Bickman", "prev_giftee": ""},
+            {"first": "Ellie", "last": "Bickman", "prev_giftee": ""},
+        ]
+        entries = [Person(entry) for entry in data]
+        count = self.ss.get_assignment_count(entries)
+        assert count == 24
+        assert count < self.ss.get_permutations_count(entries)
+
+    def test_estimate(self):
+        data = [{"first": f"First{i}", "last": f"Last{i // 3}"} for i in range(30)]
+        entries = [Person(entry) for entry in data]
+        estimate = self.ss.get_assignment_count(entries, exact_limit=10)
+        exact = self.ss.get_assignment_count(entries)
+        assert estimate.lower <= math.log10(exact) <= estimate.upper
+        assert estimate.reason == "there are more than 10 people"
+
+    def test_previous_giftees(self):
+        # the usual config with a previous giftee for everyone
+        data = [
+            {
+                "first": f"First{i}",
+                "last": f"Last{i // 4}",
+                "prev_giftee": f"First{(i + 4) % 24} Last{(i + 4) % 24 // 4}",
+            }
+            for i in range(24)
+        ]
+        entries = [Person(entry) for entry in data]
+        count = self.ss.get_assignment_count(entries)
+        assert isinstance(count, int)
+        assert count > 0
+
+
+class TestSendSecretSantaEmails:
+    """
+    Tests `send_secret_santa_emails` function.
+    """
+
+    ss = SecretSanta({"gmail": {"username": "santa@example.com", "password": "pw"}})
+
+    def test_send(self):
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Ryan", "last": "Bickman", "email": "ryan@example.com"},
+        ]
+        entries = [Person(entry) for entry in data]
+        pairs = self.ss.create_pairs(entries, seed=1)
+        with LocalSMTPServer() as server:
+            self.ss.email = Email(
+                "santa@example.com", "pw", server.host, server.port, False
+            )
+            report = self.ss.send_secret_santa_emails(pairs, workers=2)
+        assert sorted(report.sent) == sorted(entry.full_name for entry in entries)
+        recipients = sorted(message[1][0] for message in server.messages)
+        assert recipients == sorted(entry["email"] for entry in data)
+
+    def test_daily_limits(self, tmp_path, monkeypatch):
+        from utils.dispatch import Account
+        from utils.outbox import Outbox, read_outbox
+
+        settings = {
+            "quota": str(tmp_path / "quota.sqlite3"),
+            "outbox": str(tmp_path / "outbox.jsonl"),
+        }
+        ss = SecretSanta({"settings": settings})
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Ryan", "last": "Bickman", "email": "ryan@example.com"},
+        ]
+        pairs = ss.create_pairs([Person(entry) for entry in data], seed=1)
+        with LocalSMTPServer() as server:
+            accounts = [
+                Account(
+                    Email(sender, "pw", server.host, server.port, False),
+                    daily_limit=1,
+                )
+                for sender in ["a@example.com", "b@example.com"]
+            ]
+            monkeypatch.setattr(ss, "sender_accounts", lambda *args: accounts)
+            with Outbox(ss.outbox_path) as outbox:
+                report = ss.send_secret_santa_emails(pairs, outbox=outbox)
+        assert len(report.sent) == 2
+        assert len(report.deferred) == 1
+        senders = sorted(message[0] for message in server.messages)
+        assert senders == ["a@example.com", "b@example.com"]
+        assert ss.quota.usage() == {"a@example.com": 1, "b@example.com": 1}
+        pending = read_outbox(ss.outbox_path).pending()
+        assert [card["recipient"] for card in pending] == report.deferred
+
+
+class TestSenderAccounts:
+    """
+    Tests `sender_accounts` function.
+    """
+
+    def test_single(self):
+        ss = SecretSanta({"gmail": {"username": "santa@example.com", "password": "pw"}})
+        (account,) = ss.sender_accounts(workers=3)
+        assert account.name == "santa@example.com"
+        assert account.workers == 3
+        assert account.daily_limit is None
+
+    def test_accounts(self):
+        gmail = {
+            "accounts": [
+                {"username": "a@example.com", "password": "pw", "daily_limit": 500},
+                {"username": "b@example.com", "password": "pw", "per_minute": 30},
+            ]
+        }
+        first, second = SecretSanta({"gmail": gmail}).sender_accounts()
+        assert (first.name, first.daily_limit, first.rate) == (
+            "a@example.com",
+            500,
+            None,
+        )
+        assert (second.name, second.rate) == ("b@example.com", 0.5)
+
+
+class TestSecretSantaConfig:
+    """
+    Tests loading the config for `SecretSanta`.
+    """
+
+    data = {
+        "gmail": {"username": "santa@example.com", "password": "pw"},
+        "entries": [
+            {"first": "John", "last": "Doe"},
+            {"first": "Bill", "last": "German"},
+        ],
+    }
+
+    def test_from_data(self):
+        ss = SecretSanta(self.data)
+        assert [entry.full_name for entry in ss.entries] == ["John Doe", "Bill German"]
+        assert ss.gmail_username == "santa@example.com"
+        assert ss.test_entries == []
+
+    def test_from_path(self, tmp_path):
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(self.data))
+        ss = SecretSanta(config_path=path)
+        assert len(ss.entries) == 2
+        assert ss.email.gmail_username == "santa@example.com"
+
+    def test_missing_file(self, tmp_path):
+        ss = SecretSanta(config_path=tmp_path / "missing.json")
+        with pytest.raises(FileNotFoundError):
+            ss.entries
+
+    def test_lazy_imports(self):
+        code = (
+            "import sys, main; "
+            "print(sorted({'rich', 'jinja2', 'numpy'} & set(sys.modules)))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert output.stdout.strip() == "[]"
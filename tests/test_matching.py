@@ -0,0 +1,48 @@
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from utils.matching import NoValidPairsError, find_matrix_assignment
+
+
+class TestFindMatrixAssignment:
+    """
+    Tests `find_matrix_assignment` function.
+    """
+
+    def test_valid(self):
+        groups = np.array([i // 50 for i in range(100)])
+        matrix = groups[:, None] != groups[None, :]
+        assignment = find_matrix_assignment(matrix, np.random.default_rng(1))
+        assert sorted(assignment) == list(range(100))
+        for gifter, giftee in enumerate(assignment):
+            assert matrix[gifter, giftee]
+
+    def test_tight(self):
+        matrix = np.zeros((4, 4), dtype=bool)
+        for gifter, giftees in enumerate([[1], [2, 0], [3, 0], [0, 1]]):
+            matrix[gifter, giftees] = True
+        for seed in range(10):
+            rng = np.random.default_rng(seed)
+            assert find_matrix_assignment(matrix, rng) == [1, 2, 3, 0]
+
+    def test_infeasible(self):
+        matrix = np.zeros((5, 5), dtype=bool)
+        matrix[:3, 3:] = True
+        matrix[3:, :3] = True
+        with pytest.raises(NoValidPairsError) as error:
+            find_matrix_assignment(matrix, np.random.default_rng(3))
+        assert len(error.value.gifters) > len(error.value.giftees)
+        assert set(error.value.gifters) <= {0, 1, 2}
+        assert error.value.giftees == [3, 4]
+
+    def test_empty(self):
+        assert find_matrix_assignment(np.zeros((0, 0), dtype=bool)) == []
+
+    def test_gifter_without_giftees(self):
+        matrix = np.array([[False, True, False], [True, False, False], [0, 0, 0]])
+        with pytest.raises(NoValidPairsError) as error:
+            find_matrix_assignment(matrix.astype(bool))
+        assert 2 in error.value.gifters
+        assert len(error.value.giftees) < len(error.value.gifters)
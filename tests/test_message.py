@@ -0,0 +1,75 @@
+# standard library
+from email import message_from_bytes
+from pathlib import Path
+
+# local imports
+from utils.message import BANNER, MessageBuilder, plain_text
+
+
+class TestMessageBuilder:
+    """
+    Tests `MessageBuilder` class.
+    """
+
+    builder = MessageBuilder("santa@example.com")
+
+    def build(self, builder: MessageBuilder) -> bytes:
+        html = f'<img src="{builder.banner_src}"><p>Hello</p>'
+        return builder.build("elf@example.com", "Match", html, "Hello")
+
+    def test_structure(self):
+        message = message_from_bytes(self.build(self.builder))
+        assert message.get_content_type() == "multipart/related"
+        assert message["To"] == "elf@example.com"
+        alternative, banner = message.get_payload()
+        types = [part.get_content_type() for part in alternative.get_payload()]
+        assert types == ["text/plain", "text/html"]
+        assert banner["Content-ID"] == "<secret-santa-banner>"
+        assert banner.get_payload(decode=True) == BANNER.read_bytes()
+
+    def test_cid_reference(self):
+        message = message_from_bytes(self.build(self.builder))
+        html = message.get_payload()[0].get_payload()[1].get_payload(decode=True)
+        assert b'src="cid:secret-santa-banner"' in html
+
+    def test_banner_shared(self):
+        builder = MessageBuilder("santa@example.com")
+        part = builder.banner_part
+        self.build(builder)
+        self.build(builder)
+        assert builder.banner_part is part
+
+    def test_crlf(self):
+        data = self.build(self.builder)
+        assert b"\r\n" in data
+        assert b"\n" not in data.replace(b"\r\n", b"")
+
+    def test_no_banner(self):
+        builder = MessageBuilder("santa@example.com", banner=Path("missing.jpg"))
+        assert builder.banner_src is None
+        message = message_from_bytes(self.build(builder))
+        assert message.get_content_type() == "multipart/alternative"
+
+
+class TestPlainText:
+    """
+    Tests `plain_text` function.
+    """
+
+    def test_text(self):
+        data = {
+            "gifter_name": "John Smith",
+            "giftee_name": "Jane Doe",
+            "notes": "Likes socks.",
+            "wishlist": "https://example.com/list",
+        }
+        text = plain_text(data)
+        assert text.startswith("Hello John Smith,")
+        assert "Secret Santa for: Jane Doe" in text
+        assert "Likes socks." in text
+        assert "Wishlist: https://example.com/list" in text
+
+    def test_optional(self):
+        text = plain_text({"gifter_name": "John Smith", "giftee_name": "Jane Doe"})
+        assert "notes" not in text
+        assert "Wishlist" not in text
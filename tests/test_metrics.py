@@ -0,0 +1,130 @@
+# standard library
+import json, threading
+
+# third-party imports
+import pytest
+
+# local imports
+from utils.dispatch import dispatch
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+from utils.metrics import METRICS, Metrics, metric_name
+
+
+class FakeClock:
+    def __init__(self, *times: float) -> None:
+        self.times = list(times)
+
+    def __call__(self) -> float:
+        return self.times.pop(0)
+
+
+@pytest.fixture
+def metrics():
+    METRICS.reset()
+    METRICS.enabled = True
+    yield METRICS
+    METRICS.enabled = False
+    METRICS.reset()
+
+
+class TestMetrics:
+    """
+    Tests `Metrics` class.
+    """
+
+    def test_disabled(self):
+        metrics = Metrics()
+        assert metrics.span("render") is metrics.span("send")
+        with metrics.span("render"):
+            pass
+        metrics.count("smtp.bytes", 10)
+        assert metrics.to_dict() == {"spans": {}, "counters": {}}
+
+    def test_span(self):
+        metrics = Metrics(enabled=True, clock=FakeClock(1.0, 1.5, 2.0, 4.0))
+        with metrics.span("render"):
+            pass
+        with metrics.span("render"):
+            pass
+        timing = metrics.to_dict()["spans"]["render"]
+        assert timing == {
+            "count": 2,
+            "total": 2.5,
+            "mean": 1.25,
+            "min": 0.5,
+            "max": 2.0,
+        }
+
+    def test_span_error(self):
+        metrics = Metrics(enabled=True, clock=FakeClock(0.0, 1.0))
+        with pytest.raises(ValueError):
+            with metrics.span("send"):
+                raise ValueError()
+        assert metrics.to_dict()["spans"]["send"]["count"] == 1
+
+    def test_threads(self):
+        metrics = Metrics(enabled=True)
+
+        def work():
+            for _ in range(1000):
+                metrics.count("smtp.messages")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.counters["smtp.messages"] == 8000
+
+    def test_prometheus(self):
+        metrics = Metrics(enabled=True, clock=FakeClock(0.0, 0.25))
+        with metrics.span("smtp.connect"):
+            pass
+        metrics.count("smtp.bytes", 512)
+        assert metrics.to_prometheus().splitlines() == [
+            "# TYPE secret_santa_smtp_connect_seconds summary",
+            "secret_santa_smtp_connect_seconds_count 1",
+            "secret_santa_smtp_connect_seconds_sum 0.25",
+            "# TYPE secret_santa_smtp_bytes_total counter",
+            "secret_santa_smtp_bytes_total 512",
+        ]
+
+    def test_write(self, tmp_path):
+        metrics = Metrics(enabled=True)
+        metrics.count("render.cards", 3)
+        metrics.write(tmp_path / "metrics.json")
+        metrics.write(tmp_path / "metrics.prom")
+        data = json.loads((tmp_path / "metrics.json").read_text())
+        assert data["counters"] == {"render.cards": 3}
+        assert (
+            "secret_santa_render_cards_total 3"
+            in (tmp_path / "metrics.prom").read_text()
+        )
+
+    def test_metric_name(self):
+        assert metric_name("smtp.connect") == "smtp_connect"
+        assert metric_name("pairing-attempts") == "pairing_attempts"
+
+
+class TestSmtpMetrics:
+    """
+    Tests the metrics recorded while sending.
+    """
+
+    def test_dispatch(self, metrics):
+        messages = [
+            (f"Elf {i}", f"elf{i}@example.com", f"Subject: Hi\r\n\r\nBody {i}".encode())
+            for i in range(5)
+        ]
+        with LocalSMTPServer() as server:
+            server.fail_recipient("elf1@example.com", 451)
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            dispatch(email, messages, workers=2, backoff=0, sleep=lambda _: None)
+        data = metrics.to_dict()
+        assert data["spans"]["smtp.connect"]["count"] <= 2
+        assert data["spans"]["smtp.login"]["count"] <= 2
+        assert data["spans"]["smtp.sendmail"]["count"] == 6
+        assert data["counters"]["dispatch.retries"] == 1
+        assert data["counters"]["dispatch.sent"] == 5
+        assert data["counters"]["smtp.bytes"] == sum(len(m[2]) for m in messages)
@@ -0,0 +1,123 @@
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from main import SecretSanta
+from utils.compatibility import CompatibilityIndex
+from utils.history import GiftHistory
+from utils.matching import NoValidPairsError
+from utils.optimize import (
+    optimal_assignment,
+    location_flows,
+    RECENT,
+    SAME_BRANCH,
+    LOCATION_BALANCE,
+)
+from utils.person import Person
+
+
+def generate_entries(size: int, seed: int) -> list[Person]:
+    rng = np.random.default_rng(seed)
+    return [
+        Person(
+            {
+                "first": f"First{i}",
+                "last": f"Last{i // 2}",
+                "branch": f"Branch{rng.integers(4)}",
+                "location": f"Location{rng.integers(3)}",
+            }
+        )
+        for i in range(size)
+    ]
+
+
+class TestOptimalAssignment:
+    """
+    Tests `optimal_assignment` function.
+    """
+
+    def test_valid(self):
+        index = CompatibilityIndex(generate_entries(200, seed=1))
+        result = optimal_assignment(index, rng=np.random.default_rng(1))
+        assert index.allows(result.giftee_of)
+        assert sorted(result.giftee_of.tolist()) == list(range(200))
+        assert set(result.breakdown) == {SAME_BRANCH, LOCATION_BALANCE}
+        assert result.total == sum(result.breakdown.values())
+
+    def test_cross_branch(self):
+        index = CompatibilityIndex(generate_entries(100, seed=2))
+        result = optimal_assignment(index, {SAME_BRANCH: 1.0})
+        branches = index.roster.branch_ids
+        assert result.breakdown == {SAME_BRANCH: 0.0}
+        assert (branches != branches[result.giftee_of]).all()
+
+    def test_recent(self):
+        entries = generate_entries(6, seed=3)
+        index = CompatibilityIndex(entries)
+        ages = {
+            entries[0].full_name: {entries[2].full_name: 1},
+            entries[2].full_name: {entries[4].full_name: 2},
+        }
+        result = optimal_assignment(index, {RECENT: 10.0}, ages)
+        assert result.breakdown == {RECENT: 0.0}
+        assert result.giftee_of[0] != 2
+        assert result.giftee_of[2] != 4
+
+    def test_location_balance(self):
+        entries = generate_entries(300, seed=4)
+        index = CompatibilityIndex(entries)
+        weights = {LOCATION_BALANCE: 1.0}
+        result = optimal_assignment(index, weights, rng=np.random.default_rng(4))
+        flows, targets = location_flows(index.roster.location_ids, result.giftee_of)
+        excess = np.maximum(flows - targets, 0).sum()
+        assert result.breakdown[LOCATION_BALANCE] == pytest.approx(excess)
+        assert excess < 0.1 * len(entries)
+
+    def test_noise(self):
+        index = CompatibilityIndex(generate_entries(50, seed=5))
+        first = optimal_assignment(index, noise=0.5, rng=np.random.default_rng(1))
+        second = optimal_assignment(index, noise=0.5, rng=np.random.default_rng(1))
+        third = optimal_assignment(index, noise=0.5, rng=np.random.default_rng(2))
+        assert np.array_equal(first.giftee_of, second.giftee_of)
+        assert not np.array_equal(first.giftee_of, third.giftee_of)
+
+    def test_impossible(self):
+        entries = [Person({"first": name, "last": "Doe"}) for name in "ABC"]
+        with pytest.raises(NoValidPairsError):
+            optimal_assignment(CompatibilityIndex(entries))
+
+
+class TestOptimalStrategy:
+    """
+    Tests the `optimal` strategy of `create_pairs`.
+    """
+
+    def test_create_pairs(self, tmp_path):
+        settings = {
+            "soft_repeat_years": 3,
+            "history": str(tmp_path / "history.sqlite3"),
+        }
+        ss = SecretSanta({"settings": settings})
+        entries = generate_entries(20, seed=6)
+        with GiftHistory(settings["history"]) as history:
+            history.record(2024, [(entries[0].full_name, entries[3].full_name)])
+        ss.load_history(2025)
+        assert ss.recent_ages == {entries[0].full_name: {entries[3].full_name: 1}}
+        assert ss.recent_giftees == {}
+        pairs = ss.create_pairs(entries, strategy="optimal", seed=1)
+        assert ss.validate_pairs(pairs)
+        assert pairs.giftee_of[0] != 3
+
+    def test_settings(self):
+        settings = {"weights": {SAME_BRANCH: 5.0}, "noise": 0.5}
+        ss = SecretSanta({"settings": settings})
+        index = CompatibilityIndex(generate_entries(12, seed=7))
+        pairs = ss.assign_pairs(index, "optimal", seed=3)
+        same, result = ss.pair_with_settings(index, seed=3, strategy="optimal")
+        # both read the weights and noise from the settings
+        assert pairs.giftee_of.tolist() == same.giftee_of.tolist()
+        expected = optimal_assignment(
+            index, {SAME_BRANCH: 5.0}, noise=0.5, rng=np.random.default_rng(3)
+        )
+        assert result.giftee_of.tolist() == expected.giftee_of.tolist()
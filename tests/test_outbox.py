@@ -0,0 +1,142 @@
+# standard library
+import os
+
+# local imports
+from main import SecretSanta
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+from utils.outbox import FAILED, PENDING, SENT, Outbox, read_outbox
+from utils.person import Person
+
+
+def create_cards(count: int) -> list[dict]:
+    return [
+        {
+            "recipient": f"Elf {i}",
+            "to_email": f"elf{i}@example.com",
+            "prev_giftee": None,
+            "data": {"giftee_name": f"Elf {(i + 1) % count}"},
+        }
+        for i in range(count)
+    ]
+
+
+class TestOutbox:
+    """
+    Tests `Outbox` class.
+    """
+
+    def test_seal(self, tmp_path):
+        path = tmp_path / "outbox.jsonl"
+        with Outbox(path) as outbox:
+            run = outbox.seal(create_cards(3), test=False)
+        state = read_outbox(path)
+        assert state.run == run
+        assert state.details["test"] is False
+        assert list(state.cards) == ["Elf 0", "Elf 1", "Elf 2"]
+        assert state.counts() == {PENDING: 3, SENT: 0, FAILED: 0}
+
+    def test_mark(self, tmp_path):
+        path = tmp_path / "outbox.jsonl"
+        with Outbox(path) as outbox:
+            outbox.seal(create_cards(3))
+            outbox.mark("Elf 0")
+            outbox.mark("Elf 1", ValueError("refused"))
+        state = read_outbox(path)
+        assert state.counts() == {PENDING: 1, SENT: 1, FAILED: 1}
+        assert state.errors == {"Elf 1": "refused"}
+        assert [card["recipient"] for card in state.pending()] == ["Elf 1", "Elf 2"]
+
+    def test_partial_line(self, tmp_path):
+        path = tmp_path / "outbox.jsonl"
+        with Outbox(path) as outbox:
+            outbox.seal(create_cards(2))
+            outbox.mark("Elf 0")
+        with open(path, "a") as file:
+            file.write('{"type":"sent","run":"')
+        state = read_outbox(path)
+        assert state.counts() == {PENDING: 1, SENT: 1, FAILED: 0}
+
+    def test_append_after_partial_line(self, tmp_path):
+        path = tmp_path / "outbox.jsonl"
+        with Outbox(path) as outbox:
+            run = outbox.seal(create_cards(2))
+            outbox.mark("Elf 0")
+        with open(path, "a") as file:
+            file.write('{"type":"sent","run":"')
+        # the resumed run marks the next card after the crash
+        with Outbox(path) as outbox:
+            outbox.resume(run)
+            outbox.mark("Elf 1")
+        state = read_outbox(path)
+        assert state.counts() == {PENDING: 0, SENT: 2, FAILED: 0}
+        assert path.read_text().endswith("}\n")
+
+    def test_repair_whole_line(self, tmp_path):
+        path = tmp_path / "outbox.jsonl"
+        path.write_text("not json and no newline")
+        Outbox(path).repair()
+        assert path.read_text() == ""
+
+    def test_runs(self, tmp_path):
+        path = tmp_path / "outbox.jsonl"
+        with Outbox(path) as outbox:
+            first = outbox.seal(create_cards(2))
+            outbox.mark("Elf 0")
+            second = outbox.seal(create_cards(3))
+        assert read_outbox(path).run == second
+        assert len(read_outbox(path).pending()) == 3
+        assert len(read_outbox(path, first).pending()) == 1
+
+    def test_missing(self, tmp_path):
+        state = read_outbox(tmp_path / "missing.jsonl")
+        assert state.run is None
+        assert state.pending() == []
+
+    def test_sync_batches(self, tmp_path, monkeypatch):
+        syncs = []
+        monkeypatch.setattr(os, "fsync", syncs.append)
+        with Outbox(tmp_path / "outbox.jsonl", sync_every=4) as outbox:
+            outbox.seal(create_cards(2))
+            assert len(syncs) == 1
+            for i in range(8):
+                outbox.mark(f"Elf {i % 2}")
+            assert len(syncs) == 3
+        assert len(syncs) == 3
+
+
+class TestResumeSending:
+    """
+    Tests `resume_sending` function.
+    """
+
+    def test_resume(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("builtins.input", lambda *args: "")
+        path = tmp_path / "outbox.jsonl"
+        ss = SecretSanta(
+            {
+                "gmail": {"username": "santa@example.com", "password": "pw"},
+                "settings": {"outbox": str(path)},
+            }
+        )
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Ryan", "last": "Bickman", "email": "ryan@example.com"},
+        ]
+        pairs = ss.create_pairs([Person(entry) for entry in data], seed=1)
+        with LocalSMTPServer() as server:
+            server.fail_recipient("bill@example.com", 550)
+            ss.email = Email("santa@example.com", "pw", server.host, server.port, False)
+            with Outbox(path) as outbox:
+                report = ss.send_secret_santa_emails(pairs, outbox=outbox)
+            assert report.failed == ["Bill German"]
+            assert len(server.messages) == 2
+
+            report = ss.resume_sending()
+            assert report.sent == ["Bill German"]
+            recipients = [message[1][0] for message in server.messages]
+            assert recipients.count("bill@example.com") == 1
+            assert len(recipients) == 3
+        assert read_outbox(path).pending() == []
+        assert ss.resume_sending() is None
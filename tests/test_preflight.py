@@ -0,0 +1,70 @@
+# local imports
+from utils.person import Person
+from utils.preflight import (
+    preflight,
+    INVALID_EMAIL,
+    DUPLICATE_EMAIL,
+    DUPLICATE_NAME,
+    UNKNOWN_PREV_GIFTEE,
+    NO_GIFTEES,
+    NO_GIFTERS,
+    UNREADABLE_ROW,
+)
+from utils.loaders import RowError
+
+
+class TestPreflight:
+    """
+    Tests `preflight` function.
+    """
+
+    def test_valid(self):
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Ryan", "last": "Bickman", "email": "ryan@example.com"},
+        ]
+        report = preflight([Person(entry) for entry in data])
+        assert report.ok
+        assert report.to_dict()["problems"] == []
+
+    def test_every_problem(self):
+        data = [
+            {"first": "John", "last": "Doe", "email": "not an email"},
+            {"first": "Jane", "last": "Doe"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Bill", "last": "German", "email": "Bill@Example.com"},
+            {
+                "first": "Ryan",
+                "last": "Bickman",
+                "email": "ryan@example.com",
+                "prev_giftee": "Santa Claus",
+            },
+        ]
+        report = preflight([Person(entry) for entry in data])
+        assert not report.ok
+        groups = report.by_kind()
+        assert [problem.row for problem in groups[INVALID_EMAIL]] == [0, 1]
+        assert [problem.row for problem in groups[DUPLICATE_EMAIL]] == [2, 3]
+        assert [problem.row for problem in groups[DUPLICATE_NAME]] == [2, 3]
+        assert [problem.row for problem in groups[UNKNOWN_PREV_GIFTEE]] == [4]
+        assert NO_GIFTEES not in groups
+
+    def test_no_compatible_giftees(self):
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Jane", "last": "Doe", "email": "jane@example.com"},
+        ]
+        report = preflight([Person(entry) for entry in data])
+        assert report.counts() == {NO_GIFTEES: 2, NO_GIFTERS: 2}
+        assert str(report.problems[0]) == "No compatible giftees for John Doe"
+
+    def test_row_errors(self):
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+        ]
+        errors = [RowError(3, "missing first"), RowError(7, "invalid JSON")]
+        report = preflight([Person(entry) for entry in data], row_errors=errors)
+        assert report.counts() == {UNREADABLE_ROW: 2}
+        assert str(report.problems[1]) == "Unreadable row for Line 7: invalid JSON"
@@ -0,0 +1,100 @@
+# standard library
+import os
+
+# third-party imports
+from jinja2 import Environment, FileSystemLoader
+
+# local imports
+from main import Person
+from utils.render import CardRenderer, card_context
+
+
+class TestCardRenderer:
+    """
+    Tests `CardRenderer` class.
+    """
+
+    data = {
+        "gifter_name": "John Smith",
+        "giftee_name": "Jane Doe",
+        "wishlist": "https://www.giftster.com/list/A5IgT/",
+        "notes": "Test Notes Here.",
+    }
+
+    def test_matches_jinja(self):
+        env = Environment(loader=FileSystemLoader("."))
+        template = env.get_template("christmas_card_template.html")
+        renderer = CardRenderer()
+        for data in (self.data, {"gifter_name": "A", "giftee_name": "B"}):
+            assert renderer.render(data) == template.render(data)
+
+    def test_static_parts(self):
+        renderer = CardRenderer()
+        renderer.load()
+        assert "<style>" in renderer.prefix
+        assert "{{" not in renderer.prefix + renderer.suffix
+
+    def test_whitespace_control(self, tmp_path):
+        path = tmp_path / "card.html"
+        source = "<p>\n  {%- if name %} {{ name }} {% endif -%}  \n</p>\n"
+        path.write_text(source)
+        data = {"name": "Jane"}
+        expected = Environment().from_string(source).render(data)
+        assert CardRenderer(path).render(data) == expected
+
+    def test_no_tags(self, tmp_path):
+        path = tmp_path / "card.html"
+        path.write_text("<p>Hello</p>\n")
+        assert CardRenderer(path).render({}) == "<p>Hello</p>"
+
+    def test_reload(self, tmp_path):
+        path = tmp_path / "card.html"
+        path.write_text("Hello {{ gifter_name }}")
+        renderer = CardRenderer(path)
+        assert renderer.render(self.data) == "Hello John Smith"
+        template = renderer.template
+        assert renderer.render(self.data) == "Hello John Smith"
+        assert renderer.template is template
+
+        path.write_text("Bye {{ gifter_name }}")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert renderer.render(self.data) == "Bye John Smith"
+
+    def test_render_many(self, tmp_path):
+        path = tmp_path / "card.html"
+        path.write_text("{{ gifter_name }}:{{ giftee_name }}:{{ wishlist }}")
+        john = Person({"first": "John", "last": "Doe", "wishlist": "john.list"})
+        bill = Person({"first": "Bill", "last": "German", "wishlist": "bill.list"})
+        contexts = [card_context(john, bill), card_context(bill, john)]
+        rendered = list(CardRenderer(path).render_many(contexts))
+        assert rendered == [
+            "John Doe:Bill German:bill.list",
+            "Bill German:John Doe:john.list",
+        ]
+
+    def test_render_many_reloads_once(self, tmp_path):
+        path = tmp_path / "card.html"
+        path.write_text("{{ gifter_name }} {{ banner_src }}")
+        renderer = CardRenderer(path)
+        rendered = renderer.render_many(
+            {"gifter_name": name, "banner_src": "cid:banner"} for name in "AB"
+        )
+        assert next(rendered) == "A cid:banner"
+        # a batch keeps the template it started with
+        path.write_text("changed")
+        assert next(rendered) == "B cid:banner"
+
+
+class TestCardContext:
+    """
+    Tests `card_context` function.
+    """
+
+    def test_context(self):
+        gifter = Person({"first": "John", "last": "Doe"})
+        giftee = Person({"first": "Bill", "last": "German", "wishlist": "a.list"})
+        context = card_context(gifter, giftee)
+        assert context["gifter_name"] == "John Doe"
+        assert context["giftee_name"] == "Bill German"
+        assert context["wishlist"] == "a.list"
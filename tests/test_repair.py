@@ -0,0 +1,117 @@
+# standard library
+import datetime as dt
+
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from main import SecretSanta
+from utils.compatibility import CompatibilityIndex
+from utils.history import GiftHistory
+from utils.matching import NoValidPairsError
+from utils.person import Person
+from utils.repair import repair_assignment, repair_pairs
+
+
+def generate_entries(size: int) -> list[Person]:
+    return [
+        Person({"first": f"First{i}", "last": f"Last{i // 3}"}) for i in range(size)
+    ]
+
+
+class TestRepairAssignment:
+    """
+    Tests `repair_assignment` function.
+    """
+
+    def test_complete(self):
+        matrix = ~np.eye(4, dtype=bool)
+        giftee_of, changed = repair_assignment(matrix, np.array([1, 2, 3, 0]))
+        assert giftee_of.tolist() == [1, 2, 3, 0]
+        assert changed == []
+
+    def test_invalid_pair(self):
+        matrix = ~np.eye(4, dtype=bool)
+        matrix[0, 1] = False
+        giftee_of, changed = repair_assignment(matrix, np.array([1, 2, 3, 0]))
+        assert matrix[np.arange(4), giftee_of].all()
+        assert 0 in changed
+        assert len(changed) <= 3
+
+
+class TestRepairPairs:
+    """
+    Tests `repair_pairs` function.
+    """
+
+    ss = SecretSanta()
+
+    def test_join(self):
+        entries = generate_entries(30)
+        pairs = self.ss.create_pairs(entries, seed=1)
+        previous = dict(pairs.names())
+        joined = Person({"first": "New", "last": "Person"})
+        repair = repair_pairs(CompatibilityIndex(entries + [joined]), previous)
+        assert self.ss.validate_pairs(repair.pairing)
+        # the new person and the one gifter who now buys for them
+        assert len(repair.changed) == 2
+        assert 30 in repair.changed
+        assert repair.kept == 29
+        assert repair.dropped == []
+
+    def test_drop(self):
+        entries = generate_entries(30)
+        pairs = self.ss.create_pairs(entries, seed=2)
+        previous = dict(pairs.names())
+        remaining = entries[:10] + entries[11:]
+        repair = repair_pairs(CompatibilityIndex(remaining), previous)
+        assert self.ss.validate_pairs(repair.pairing)
+        assert repair.dropped == [entries[10].full_name]
+        # only the gifter of the dropped person and anyone moved to make room
+        names = dict(repair.pairing.names())
+        changed = [name for name, giftee in names.items() if previous[name] != giftee]
+        assert sorted(changed) == sorted(
+            repair.pairing.roster.full_names[gifter] for gifter in repair.changed
+        )
+        assert 1 <= len(changed) <= 3
+        assert [pair[0].full_name for pair in repair.changed_pairs()] == [
+            repair.pairing.roster.full_names[gifter] for gifter in repair.changed
+        ]
+
+    def test_impossible(self):
+        entries = [Person({"first": name, "last": "Doe"}) for name in "AB"]
+        entries.append(Person({"first": "C", "last": "German"}))
+        previous = {"A Doe": "C German", "C German": "A Doe"}
+        with pytest.raises(NoValidPairsError):
+            repair_pairs(CompatibilityIndex(entries), previous)
+
+
+class TestRepairAndSend:
+    """
+    Tests `repair_and_send` function.
+    """
+
+    def test_only_changed_are_sent(self, tmp_path, monkeypatch):
+        settings = {"history": str(tmp_path / "history.sqlite3")}
+        ss = SecretSanta({"settings": settings})
+        data = [
+            {"first": f"First{i}", "last": f"Last{i}", "email": f"p{i}@example.com"}
+            for i in range(10)
+        ]
+        entries = [Person(entry) for entry in data]
+        pairs = ss.create_pairs(entries[:9], seed=3)
+        year = dt.date.today().year
+        with GiftHistory(settings["history"]) as history:
+            history.record(year, pairs.names())
+
+        sent = []
+        monkeypatch.setattr(
+            ss, "send_secret_santa_emails", lambda **kw: sent.append(kw)
+        )
+        monkeypatch.setattr("builtins.input", lambda *args: "y")
+        ss.repair_and_send(entries)
+        assert len(sent) == 1
+        assert len(sent[0]["pairs"]) == 2
+        assert {pair[0].full_name for pair in sent[0]["pairs"]} >= {"First9 Last9"}
+        assert len(ss.history.assignment(year)) == 10
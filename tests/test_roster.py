@@ -0,0 +1,71 @@
+# local imports
+from main import SecretSanta
+from utils.person import Person
+from utils.roster import Pairing, Roster
+
+
+class TestRoster:
+    """
+    Tests `Roster` class.
+    """
+
+    data = [
+        {"first": "John", "last": "Doe", "prev_giftee": "Bill German"},
+        {"first": "Jane", "last": "Doe", "prev_giftee": "Santa Claus"},
+        {"first": "Bill", "last": "German", "email": "bill@example.com"},
+    ]
+
+    def test_ids(self):
+        people = [Person(entry) for entry in self.data]
+        roster = Roster.from_people(people)
+        assert len(roster) == 3
+        assert roster.household_ids.tolist() == [0, 0, 1]
+        assert roster.name_ids.tolist() == [0, 1, 2]
+        assert roster.prev_ids.tolist() == [2, -1, -1]
+        assert roster.person(1) is people[1]
+
+    def test_load(self, tmp_path):
+        path = tmp_path / "roster.csv"
+        path.write_text("first,last,email\nJohn,Doe,\nBill,German,bill@example.com\n")
+        roster = Roster.load(path)
+        assert roster.full_names == ["John Doe", "Bill German"]
+        assert roster.emails == [None, "bill@example.com"]
+        assert roster.person(1).email == "bill@example.com"
+
+
+class TestPairing:
+    """
+    Tests `Pairing` class.
+    """
+
+    ss = SecretSanta()
+    data = [
+        {"first": "John", "last": "Doe"},
+        {"first": "Bill", "last": "German"},
+        {"first": "Ryan", "last": "Bickman"},
+    ]
+
+    def test_pairs(self):
+        roster = Roster.from_people([Person(entry) for entry in self.data])
+        pairing = Pairing(roster, [1, 2, 0])
+        assert len(pairing) == 3
+        assert pairing.is_permutation()
+        assert pairing.names()[0] == ("John Doe", "Bill German")
+        gifter, giftee = pairing[-1]
+        assert (gifter.full_name, giftee.full_name) == ("Ryan Bickman", "John Doe")
+        assert len(pairing[:2]) == 2
+        assert [pair[1].first_name for pair in pairing] == ["Bill", "Ryan", "John"]
+        assert self.ss.validate_pairs(pairing)
+
+    def test_invalid(self):
+        roster = Roster.from_people([Person(entry) for entry in self.data])
+        assert not Pairing(roster, [1, 1, 0]).is_permutation()
+        assert not self.ss.validate_pairs(Pairing(roster, [1, 1, 0]))
+        assert not self.ss.validate_pairs(Pairing(roster, [0, 2, 1]))
+
+    def test_create_pairs_from_roster(self):
+        roster = Roster.from_people([Person(entry) for entry in self.data], False)
+        for strategy in ("uniform", "matching", "shuffle"):
+            pairing = self.ss.create_pairs(roster, strategy=strategy, seed=3)
+            assert pairing.roster is roster
+            assert self.ss.validate_pairs(pairing)
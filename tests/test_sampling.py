@@ -0,0 +1,181 @@
+# standard library
+from collections import Counter
+import time
+
+# third-party imports
+import numpy as np
+from scipy.stats import chisquare
+import pytest
+
+# local imports
+from utils.counting import count_assignments
+from utils.matching import NoValidPairsError
+from utils.metrics import METRICS
+from utils.sampling import (
+    assignment_digest,
+    exact_assignment,
+    household_assignment,
+    mixing_steps,
+    rejection_assignment,
+    sample_assignment,
+)
+
+
+def household_matrix(groups: list[int]) -> np.ndarray:
+    groups = np.array(groups)
+    return groups[:, None] != groups[None, :]
+
+
+def previous_matrix(groups: list[int], previous: list[int | None]) -> np.ndarray:
+    matrix = household_matrix(groups)
+    for gifter, giftee in enumerate(previous):
+        if giftee is not None:
+            matrix[gifter, giftee] = False
+    return matrix
+
+
+def assert_uniform(draws: list[tuple], matrix: np.ndarray) -> None:
+    counts = Counter(draws)
+    assert len(counts) == count_assignments(matrix)
+    assert chisquare(list(counts.values())).pvalue > 0.001
+
+
+class TestSampleAssignment:
+    """
+    Tests `sample_assignment` function.
+    """
+
+    def test_valid(self):
+        matrix = household_matrix([i // 4 for i in range(400)])
+        assignment = sample_assignment(matrix, seed=1)
+        assert sorted(assignment) == list(range(400))
+        assert all(matrix[gifter, giftee] for gifter, giftee in enumerate(assignment))
+
+    def test_reproducible(self):
+        matrix = household_matrix([i // 3 for i in range(60)])
+        assert sample_assignment(matrix, seed=7) == sample_assignment(matrix, seed=7)
+        assert sample_assignment(matrix, seed=7) != sample_assignment(matrix, seed=8)
+
+    def test_uniform(self):
+        matrix = household_matrix([0, 0, 1, 1, 2, 2])
+        matrix[0, 2] = False
+        draws = [tuple(sample_assignment(matrix, seed)) for seed in range(3_000)]
+        assert_uniform(draws, matrix)
+
+    def test_uniform_with_previous_giftees(self):
+        # swaps and rotations alone cannot reach one of the four assignments
+        # as often as the rest
+        groups = [1, 2, 4, 4, 1]
+        matrix = previous_matrix(groups, [2, 3, None, 4, 1])
+        draws = [
+            tuple(sample_assignment(matrix, seed, groups=groups))
+            for seed in range(4_000)
+        ]
+        assert_uniform(draws, matrix)
+
+    def test_large_households(self):
+        # too few orders are valid to find one by shuffling
+        groups = np.repeat([0, 1, 2], [30, 30, 2])
+        matrix = household_matrix(groups)
+        assert rejection_assignment(matrix, np.random.default_rng(1)) is None
+        assignment = sample_assignment(matrix, seed=1, groups=groups)
+        assert sorted(assignment) == list(range(62))
+        assert all(matrix[gifter, giftee] for gifter, giftee in enumerate(assignment))
+
+    def test_large_rosters_are_fast(self):
+        # too large to count, so the swap chain is used instead
+        groups = np.repeat(np.arange(253), [100, 100, 50] + [1] * 250)
+        matrix = household_matrix(groups)
+        METRICS.reset()
+        METRICS.enabled = True
+        try:
+            start = time.perf_counter()
+            assignment = sample_assignment(matrix, seed=1, groups=groups)
+            elapsed = time.perf_counter() - start
+            assert METRICS.to_dict()["counters"]["sampling.approximate"] == 1
+        finally:
+            METRICS.enabled = False
+            METRICS.reset()
+        assert elapsed < 5
+        assert sorted(assignment) == list(range(500))
+        assert all(matrix[gifter, giftee] for gifter, giftee in enumerate(assignment))
+
+    def test_impossible(self):
+        matrix = household_matrix([0, 0, 0, 1])
+        with pytest.raises(NoValidPairsError):
+            sample_assignment(matrix, seed=1)
+
+
+class TestExactAssignment:
+    """
+    Tests `exact_assignment` function.
+    """
+
+    def test_uniform(self):
+        groups = [0, 0, 1, 1, 2, 3]
+        matrix = previous_matrix(groups, [2, 4, 0, None, 5, 1])
+        rng = np.random.default_rng(1)
+        draws = [tuple(exact_assignment(matrix, rng, groups)) for _ in range(1_000)]
+        assert_uniform(draws, matrix)
+
+    def test_too_large(self):
+        rng = np.random.default_rng(1)
+        with pytest.raises(ValueError):
+            exact_assignment(np.ones((20, 20), dtype=bool), rng)
+
+
+class TestHouseholdAssignment:
+    """
+    Tests `household_assignment` function.
+    """
+
+    def test_uniform(self):
+        groups = [0, 0, 0, 1, 1, 2]
+        matrix = household_matrix(groups)
+        rng = np.random.default_rng(1)
+        draws = [tuple(household_assignment(groups, rng)) for _ in range(1_000)]
+        assert_uniform(draws, matrix)
+
+    def test_large_households(self):
+        groups = np.repeat([0, 1, 2], [60, 60, 40])
+        matrix = household_matrix(groups)
+        start = time.perf_counter()
+        assignment = household_assignment(groups, np.random.default_rng(1))
+        assert time.perf_counter() - start < 5
+        assert sorted(assignment) == list(range(160))
+        assert all(matrix[gifter, giftee] for gifter, giftee in enumerate(assignment))
+
+    def test_too_large(self):
+        groups = np.repeat([0, 1, 2], [100, 100, 50])
+        with pytest.raises(ValueError):
+            household_assignment(groups, np.random.default_rng(1))
+
+    def test_impossible(self):
+        with pytest.raises(ValueError):
+            household_assignment([0, 0, 0, 1], np.random.default_rng(1))
+
+
+class TestMixingSteps:
+    """
+    Tests `mixing_steps` function.
+    """
+
+    def test_small(self):
+        assert mixing_steps(0) == 0
+        assert mixing_steps(1) == 0
+
+    def test_grows(self):
+        assert mixing_steps(1_000) > 10 * mixing_steps(100)
+
+
+class TestAssignmentDigest:
+    """
+    Tests `assignment_digest` function.
+    """
+
+    def test_digest(self):
+        names = ["John Doe", "Bill German", "Ryan Bickman"]
+        digest = assignment_digest(names, [1, 2, 0])
+        assert digest == assignment_digest(names, [1, 2, 0])
+        assert digest != assignment_digest(names, [2, 0, 1])
+        assert "John" not in digest
@@ -0,0 +1,89 @@
+# standard library
+import datetime as dt
+import math
+
+# third-party imports
+import pytest
+
+# local imports
+from utils.scheduler import QuotaStore, allocate, interleave, plan_windows
+
+
+class TestQuotaStore:
+    """
+    Tests `QuotaStore` class.
+    """
+
+    def test_usage(self, tmp_path):
+        path = tmp_path / "quota.sqlite3"
+        day = dt.date(2026, 12, 1)
+        with QuotaStore(path) as quota:
+            quota.add("a@example.com", day=day)
+            quota.add("a@example.com", 4, day=day)
+            quota.add("b@example.com", day=day + dt.timedelta(days=1))
+        with QuotaStore(path) as quota:
+            assert quota.usage(day) == {"a@example.com": 5}
+            assert quota.usage(day + dt.timedelta(days=1)) == {"b@example.com": 1}
+            assert quota.usage(dt.date(2026, 1, 1)) == {}
+
+
+class TestAllocate:
+    """
+    Tests `allocate` function.
+    """
+
+    def test_weights(self):
+        assert allocate(90, [math.inf, math.inf], [2.0, 1.0]) == [60, 30]
+
+    def test_capacity(self):
+        # the capped account is filled and the rest goes to the others
+        assert allocate(100, [10, math.inf, math.inf], [1.0, 1.0, 1.0]) == [10, 45, 45]
+
+    def test_rounding(self):
+        counts = allocate(10, [math.inf] * 3, [1.0] * 3)
+        assert sum(counts) == 10
+        assert max(counts) - min(counts) == 1
+
+    def test_over_capacity(self):
+        assert allocate(100, [10, 20, 0], [1.0, 1.0, 1.0]) == [10, 20, 0]
+
+
+class TestPlanWindows:
+    """
+    Tests `plan_windows` function.
+    """
+
+    day = dt.date(2026, 12, 1)
+
+    def test_fits_today(self):
+        windows = plan_windows(10, [None, 100], [0, 0], [1.0, 1.0], self.day)
+        assert len(windows) == 1
+        assert windows[0].counts == [5, 5]
+
+    def test_overflow(self):
+        windows = plan_windows(250, [100, 50], [60, 0], [1.0, 1.0], self.day)
+        assert [window.counts for window in windows] == [[40, 50], [100, 50], [5, 5]]
+        assert [window.day.day for window in windows] == [1, 2, 3]
+
+    def test_none(self):
+        assert plan_windows(0, [10], [0], [1.0], self.day) == []
+
+    def test_no_capacity(self):
+        with pytest.raises(ValueError):
+            plan_windows(5, [0, 0], [0, 0], [1.0, 1.0], self.day)
+
+
+class TestInterleave:
+    """
+    Tests `interleave` function.
+    """
+
+    def test_counts(self):
+        order = interleave([4, 2, 0])
+        assert sorted(order) == [0, 0, 0, 0, 1, 1]
+
+    def test_spread(self):
+        order = interleave([3, 3])
+        assert order[:2] in ([0, 1], [1, 0])
+        # no account sends its whole share before the other starts
+        assert order.index(1) < 3 and order.index(0) < 3
@@ -0,0 +1,136 @@
+# standard library
+import os, random
+
+# third-party imports
+import numpy as np
+
+# local imports
+from main import SecretSanta
+from utils.compatibility import CompatibilityIndex
+from utils.metrics import METRICS
+from utils.person import Person
+from utils.snapshot import SnapshotCache, match_rows, row_signatures, snapshot_key
+
+
+def create_people(count: int, seed: int = 0) -> list[Person]:
+    rng = random.Random(seed)
+    people = []
+    for i in range(count):
+        last = f"Last{rng.randrange(count // 3 + 1)}"
+        prev = f"First{rng.randrange(count)} Last{rng.randrange(count // 3 + 1)}"
+        people.append(Person({"first": f"First{i}", "last": last, "prev_giftee": prev}))
+    return people
+
+
+def create_exclusions(people: list[Person], seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {
+        person.full_name: {rng.choice(people).full_name}
+        for person in rng.sample(people, len(people) // 2)
+    }
+
+
+class TestSnapshotKey:
+    """
+    Tests `snapshot_key` function.
+    """
+
+    def test_rules_change_key(self):
+        people = create_people(6)
+        index = CompatibilityIndex(people)
+        key = snapshot_key(row_signatures(index.roster))
+        assert key == snapshot_key(row_signatures(index.roster, {}))
+        exclusions = {people[0].full_name: {people[1].full_name}}
+        assert key != snapshot_key(row_signatures(index.roster, exclusions))
+
+    def test_match_rows(self):
+        previous = np.array([b"a", b"b", b"a", b"c"], dtype="S16")
+        signatures = np.array([b"a", b"d", b"a", b"a", b"c"], dtype="S16")
+        new, old = match_rows(previous, signatures)
+        assert new.tolist() == [0, 2, 4]
+        assert old.tolist() == [0, 2, 3]
+
+
+class TestSnapshotCache:
+    """
+    Tests `SnapshotCache` class.
+    """
+
+    def test_hit(self, tmp_path):
+        people = create_people(30)
+        exclusions = create_exclusions(people)
+        cache = SnapshotCache(tmp_path)
+        first = cache.index(people, exclusions)
+        second = cache.index(people, exclusions)
+        assert isinstance(second.matrix, np.memmap)
+        expected = CompatibilityIndex(people, exclusions).matrix
+        assert np.array_equal(first.matrix, expected)
+        assert np.array_equal(second.matrix, expected)
+
+    def test_rebuild(self, tmp_path):
+        people = create_people(40)
+        cache = SnapshotCache(tmp_path)
+        cache.index(people, create_exclusions(people))
+        for seed in range(1, 6):
+            rng = random.Random(seed)
+            edited = list(people)
+            # someone leaves, someone joins and someone changes their name
+            edited.pop(rng.randrange(len(edited)))
+            edited.insert(rng.randrange(len(edited)), create_people(41, seed)[40])
+            changed = rng.randrange(len(edited))
+            edited[changed] = Person(
+                {"first": "New", "last": edited[changed].last_name}
+            )
+            exclusions = create_exclusions(edited, seed)
+            index = cache.index(edited, exclusions)
+            expected = CompatibilityIndex(edited, exclusions).matrix
+            assert np.array_equal(index.matrix, expected)
+
+    def test_shuffled(self, tmp_path, monkeypatch):
+        people = create_people(30)
+        cache = SnapshotCache(tmp_path)
+        cache.index(people)
+        shuffled = random.Random(1).sample(people, len(people))
+        # shuffled rows leave too many runs to copy as slices
+        monkeypatch.setattr("utils.snapshot.MAX_RUNS", 0)
+        index = cache.index(shuffled[1:] + create_people(1, seed=2))
+        expected = CompatibilityIndex(shuffled[1:] + create_people(1, seed=2))
+        assert np.array_equal(index.matrix, expected.matrix)
+
+    def test_kept_rows(self, tmp_path):
+        people = create_people(20)
+        cache = SnapshotCache(tmp_path)
+        cache.index(people)
+        METRICS.reset()
+        METRICS.enabled = True
+        try:
+            cache.index(people + create_people(1, seed=3))
+        finally:
+            METRICS.enabled = False
+        assert METRICS.counters["snapshot.misses"] == 1
+        assert METRICS.counters["snapshot.kept_rows"] == 20
+
+    def test_prune(self, tmp_path):
+        cache = SnapshotCache(tmp_path, keep=2)
+        for size in range(3, 7):
+            cache.index(create_people(size))
+        snapshots = [name for name in os.listdir(tmp_path) if name != "latest"]
+        assert len(snapshots) == 2
+
+    def test_pairs_from_snapshot(self, tmp_path):
+        data = {
+            "settings": {"snapshots": str(tmp_path)},
+            "entries": [
+                {"first": "John", "last": "Doe"},
+                {"first": "Bill", "last": "German"},
+                {"first": "Ryan", "last": "Bickman"},
+                {"first": "Jane", "last": "Doe"},
+            ],
+        }
+        ss = SecretSanta(data)
+        ss.build_index(ss.entries)
+        index = ss.build_index(ss.entries)
+        assert isinstance(index.matrix, np.memmap)
+        for strategy in ["uniform", "matching", "optimal", "cycle"]:
+            pairs = ss.assign_pairs(index, strategy, seed=1)
+            assert index.allows(pairs.giftee_of)
@@ -0,0 +1,228 @@
+# standard library
+import os
+
+# third-party imports
+import pytest
+
+# local imports
+from main import SecretSanta
+from utils.email import Email
+from utils.local_smtp import LocalSMTPServer
+from utils.person import Person
+from utils.spool import (
+    MAILDIR,
+    MBOX,
+    SentLog,
+    Spool,
+    mark_sent,
+    read_spool,
+    spool_kind,
+    spool_size,
+)
+
+MESSAGE = (
+    "From: santa@example.com\r\n"
+    "To: {to}\r\n"
+    "Subject: Secret Santa Match\r\n"
+    "\r\n"
+    "From here on you buy for {to}.\r\n"
+    ">From the north pole\r\n"
+)
+
+
+def create_messages(count: int) -> list[tuple[str, bytes]]:
+    messages = []
+    for i in range(count):
+        to = f"elf{i}@example.com"
+        messages.append((to, MESSAGE.format(to=to).encode()))
+    return messages
+
+
+@pytest.fixture(params=["spool", "cards.mbox"])
+def path(request, tmp_path):
+    return tmp_path / request.param
+
+
+class TestSpool:
+    """
+    Tests `Spool` class.
+    """
+
+    def test_kind(self):
+        assert spool_kind("cards.mbox") == MBOX
+        assert spool_kind("spool") == MAILDIR
+
+    def test_round_trip(self, path):
+        messages = create_messages(5)
+        with Spool(path, batch=2) as spool:
+            for to, message in messages:
+                spool.add(to, message)
+        read = [(to, message) for _, to, message in read_spool(path)]
+        assert read == messages
+        assert spool_size(path) == 5
+
+    def test_batches(self, tmp_path):
+        path = tmp_path / "spool"
+        spool = Spool(path, batch=3)
+        for to, message in create_messages(4):
+            spool.add(to, message)
+        # only whole batches are written until the spool is closed
+        assert spool_size(path) == 3
+        assert not os.listdir(path / "tmp")
+        spool.close()
+        assert spool_size(path) == 4
+
+    def test_mbox_in_place_on_close(self, tmp_path):
+        path = tmp_path / "cards.mbox"
+        spool = Spool(path, batch=1)
+        spool.add(*create_messages(1)[0])
+        assert not path.exists()
+        spool.close()
+        assert spool_size(path) == 1
+        assert os.listdir(tmp_path) == ["cards.mbox"]
+
+    def test_adds_to_mbox(self, tmp_path):
+        path = tmp_path / "cards.mbox"
+        first, second = create_messages(2)
+        with Spool(path) as spool:
+            spool.add(*first)
+        with Spool(path) as spool:
+            spool.add(*second)
+        assert [to for _, to, _ in read_spool(path)] == [first[0], second[0]]
+
+    def test_mark_sent(self, path):
+        with Spool(path) as spool:
+            for to, message in create_messages(3):
+                spool.add(to, message)
+        keys = [key for key, _, _ in read_spool(path)]
+        assert mark_sent(path, {keys[0], keys[2]}) == 1
+        assert [to for _, to, _ in read_spool(path)] == ["elf1@example.com"]
+
+    def test_missing(self, path):
+        assert list(read_spool(path)) == []
+        assert spool_size(path) == 0
+
+
+class TestSentLog:
+    """
+    Tests `SentLog` class.
+    """
+
+    def test_mark(self, path):
+        with Spool(path) as spool:
+            for to, message in create_messages(3):
+                spool.add(to, message)
+        keys = [key for key, _, _ in read_spool(path)]
+        sent_log = SentLog(path)
+        sent_log.mark(keys[1])
+        # each message is marked before the flush is over
+        assert [to for _, to, _ in read_spool(path)] == [
+            "elf0@example.com",
+            "elf2@example.com",
+        ]
+        assert spool_size(path) == 2
+        sent_log.close()
+        assert [key for key, _, _ in read_spool(path)] == [keys[0], keys[2]]
+        assert os.listdir(path.parent) == [path.name]
+
+    def test_maildir_mark_does_not_list(self, tmp_path, monkeypatch):
+        path = tmp_path / "spool"
+        with Spool(path) as spool:
+            for to, message in create_messages(3):
+                spool.add(to, message)
+        keys = [key for key, _, _ in read_spool(path)]
+        listed = []
+        listdir = os.listdir
+        monkeypatch.setattr(os, "listdir", lambda p: listed.append(p) or listdir(p))
+        with SentLog(path) as sent_log:
+            for key in keys:
+                sent_log.mark(key)
+        # marking each message must not scan the whole folder
+        assert listed == []
+        assert spool_size(path) == 0
+
+    def test_torn_key(self, tmp_path):
+        path = tmp_path / "cards.mbox"
+        with Spool(path) as spool:
+            for to, message in create_messages(2):
+                spool.add(to, message)
+        keys = [key for key, _, _ in read_spool(path)]
+        (tmp_path / ".cards.mbox.sent").write_text(keys[0][:10])
+        with SentLog(path) as sent_log:
+            sent_log.mark(keys[1])
+        assert [key for key, _, _ in read_spool(path)] == [keys[0]]
+
+    def test_duplicates(self, tmp_path):
+        path = tmp_path / "cards.mbox"
+        to, message = create_messages(1)[0]
+        with Spool(path) as spool:
+            spool.add(to, message)
+            spool.add(to, message)
+        keys = [key for key, _, _ in read_spool(path)]
+        assert len(set(keys)) == 2
+        with SentLog(path) as sent_log:
+            sent_log.mark(keys[1])
+        assert spool_size(path) == 1
+
+
+class TestFlushSpool:
+    """
+    Tests `flush_spool` function.
+    """
+
+    def test_flush(self, path, monkeypatch):
+        ss = SecretSanta({"gmail": {"username": "santa@example.com"}})
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Ryan", "last": "Bickman", "email": "ryan@example.com"},
+        ]
+        pairs = ss.create_pairs([Person(entry) for entry in data], seed=1)
+        report = ss.write_spool(pairs, path)
+        assert len(report.sent) == 3
+        assert spool_size(path) == 3
+
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            monkeypatch.setattr(SecretSanta, "email", email)
+            server.fail_recipient("bill@example.com", 550)
+            report = ss.flush_spool(path)
+            assert report.failed == ["bill@example.com"]
+            assert spool_size(path) == 1
+            report = ss.flush_spool(path)
+        assert report.sent == ["bill@example.com"]
+        assert spool_size(path) == 0
+        recipients = sorted(message[1][0] for message in server.messages)
+        assert recipients == sorted(entry["email"] for entry in data)
+        # the spooled message is sent as it was written
+        spooled = server.messages[0][2]
+        assert b"Subject: Secret Santa Match" in spooled
+
+    def test_marks_each_delivery(self, path, monkeypatch):
+        import utils.dispatch
+
+        ss = SecretSanta({"gmail": {"username": "santa@example.com"}})
+        data = [
+            {"first": "John", "last": "Doe", "email": "john@example.com"},
+            {"first": "Bill", "last": "German", "email": "bill@example.com"},
+            {"first": "Ryan", "last": "Bickman", "email": "ryan@example.com"},
+        ]
+        pairs = ss.create_pairs([Person(entry) for entry in data], seed=1)
+        ss.write_spool(pairs, path)
+        dispatch_accounts = utils.dispatch.dispatch_accounts
+        left = []
+
+        def watch(*args, on_result, **kwargs):
+            def record(name, error):
+                on_result(name, error)
+                left.append(spool_size(path))
+
+            return dispatch_accounts(*args, on_result=record, **kwargs)
+
+        monkeypatch.setattr(utils.dispatch, "dispatch_accounts", watch)
+        with LocalSMTPServer() as server:
+            email = Email("santa@example.com", "pw", server.host, server.port, False)
+            monkeypatch.setattr(SecretSanta, "email", email)
+            ss.flush_spool(path)
+        # each email is marked as soon as it is delivered, not at the end
+        assert left == [2, 1, 0]
@@ -0,0 +1,273 @@
+# standard library
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio, json, threading, time
+
+# third-party imports
+import pytest
+
+# local imports
+from main import SecretSanta
+from utils.person import Person
+from utils.wishlist import (
+    ConnectionPool,
+    WishlistCache,
+    check_url,
+    parse_metadata,
+    resolve,
+    resolve_all,
+    resolve_wishlists,
+)
+
+PAGE = """<!doctype html>
+<html><head>
+<title>  Bill's
+  Wishlist </title>
+<meta property="og:description" content="Socks &amp; books">
+<meta property="og:image" content="/images/socks.png">
+</head><body><title>Not this</title></body></html>"""
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send_page(self, status: int, body: bytes, **headers) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        if self.path.startswith("/list"):
+            self.send_page(200, PAGE.encode())
+        elif self.path == "/moved":
+            self.send_page(301, b"", Location="/list/moved")
+        elif self.path == "/loop":
+            self.send_page(302, b"", Location="/loop")
+        elif self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in (b"<title>Chunked", b" List</title>"):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+        elif self.path.startswith("/slow"):
+            time.sleep(0.5)
+            self.send_page(200, PAGE.encode())
+        else:
+            self.send_page(404, b"<title>Not Found</title>")
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.connections = 0
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestParseMetadata:
+    """
+    Tests `parse_metadata` function.
+    """
+
+    def test_head(self):
+        metadata = parse_metadata(PAGE, "https://example.com/list/1")
+        assert metadata == {
+            "title": "Bill's Wishlist",
+            "description": "Socks & books",
+            "image": "https://example.com/images/socks.png",
+        }
+
+    def test_open_graph_title(self):
+        html = '<title>Site</title><meta property="og:title" content="List">'
+        assert parse_metadata(html, "https://example.com")["title"] == "List"
+
+    def test_empty(self):
+        metadata = parse_metadata("", "https://example.com")
+        assert metadata == {"title": None, "description": None, "image": None}
+
+
+class TestCheckUrl:
+    """
+    Tests `check_url` function.
+    """
+
+    @pytest.mark.parametrize(
+        "url", ["example.com/list", "ftp://example.com", "https://", "http://a:b"]
+    )
+    def test_malformed(self, url):
+        assert check_url(url).startswith("Malformed link")
+
+    def test_valid(self):
+        assert check_url("https://www.giftster.com/list/A5IgT/") is None
+
+
+class TestResolve:
+    """
+    Tests `resolve` function.
+    """
+
+    def resolve(self, url: str, timeout: float = 5.0):
+        async def run():
+            pool = ConnectionPool()
+            try:
+                return await resolve(pool, url, timeout)
+            finally:
+                await pool.close()
+
+        return asyncio.run(run())
+
+    def test_metadata(self, server):
+        link = self.resolve(f"{server.url}/list/1")
+        assert link.ok
+        assert link.status == 200
+        assert link.title == "Bill's Wishlist"
+        assert link.image == f"{server.url}/images/socks.png"
+
+    def test_redirect(self, server):
+        link = self.resolve(f"{server.url}/moved")
+        assert link.ok
+        assert link.final_url == f"{server.url}/list/moved"
+        assert link.title == "Bill's Wishlist"
+
+    def test_redirect_loop(self, server):
+        link = self.resolve(f"{server.url}/loop")
+        assert link.problem == "Too many redirects"
+
+    def test_chunked(self, server):
+        assert self.resolve(f"{server.url}/chunked").title == "Chunked List"
+
+    def test_not_found(self, server):
+        link = self.resolve(f"{server.url}/gone")
+        assert not link.ok
+        assert link.problem == "HTTP 404"
+
+    def test_timeout(self, server):
+        link = self.resolve(f"{server.url}/slow", timeout=0.2)
+        assert link.problem == "Timed out after 0.2 seconds"
+
+    def test_refused(self, server):
+        port = server.server_address[1]
+        server.shutdown()
+        server.server_close()
+        link = self.resolve(f"http://127.0.0.1:{port}/list")
+        assert not link.ok
+        assert link.error
+
+
+class TestResolveAll:
+    """
+    Tests `resolve_all` function.
+    """
+
+    def test_reuses_connections(self, server):
+        urls = [f"{server.url}/list/{i}" for i in range(10)]
+        links = asyncio.run(resolve_all(urls + urls[:2], limit=4, per_host=2))
+        assert list(links) == urls
+        assert all(link.ok for link in links.values())
+        assert len(server.requests) == 10
+        assert server.connections <= 2
+
+    def test_concurrent(self, server):
+        urls = [f"{server.url}/slow?{i}" for i in range(4)]
+        start = time.perf_counter()
+        links = asyncio.run(resolve_all(urls, per_host=4))
+        assert all(link.ok for link in links.values())
+        # two seconds if they were checked one at a time
+        assert time.perf_counter() - start < 1.5
+
+    def test_queued_not_timed_out(self, server):
+        urls = [f"{server.url}/slow?{i}" for i in range(8)]
+        links = asyncio.run(resolve_all(urls, per_host=2, timeout=1.0))
+        # the last links wait two seconds for a slot but each request is quick
+        assert all(link.ok for link in links.values())
+
+
+class TestWishlistCache:
+    """
+    Tests `WishlistCache` class.
+    """
+
+    def test_ttl(self, server, tmp_path):
+        now = [1_000.0]
+        path = tmp_path / "wishlists.json"
+        urls = [f"{server.url}/list/1", f"{server.url}/gone", "not a link"]
+
+        def check():
+            cache = WishlistCache(path, ttl=7_200, clock=lambda: now[0])
+            return resolve_wishlists(urls, cache)
+
+        links = check()
+        assert [link.ok for link in links.values()] == [True, False, False]
+        assert len(server.requests) == 2
+        assert set(json.loads(path.read_text())) == set(urls)
+
+        # nothing is loaded again within the time to live
+        now[0] += 60
+        assert check()[urls[0]].title == "Bill's Wishlist"
+        assert len(server.requests) == 2
+
+        # broken links are checked again after an hour
+        now[0] += 3_600
+        check()
+        assert server.requests[2:] == ["/gone"]
+
+        now[0] += 7_200
+        check()
+        assert sorted(server.requests[3:]) == ["/gone", "/list/1"]
+
+
+class TestWishlistLinks:
+    """
+    Tests `wishlist_links` function.
+    """
+
+    def test_cards(self, server, tmp_path):
+        settings = {
+            "check_wishlists": True,
+            "wishlist_cache": str(tmp_path / "wishlists.json"),
+        }
+        ss = SecretSanta({"settings": settings})
+        data = [
+            {"first": "John", "last": "Doe", "wishlist": f"{server.url}/list/1"},
+            {"first": "Bill", "last": "German", "wishlist": f"{server.url}/gone"},
+            {"first": "Ryan", "last": "Bickman"},
+        ]
+        people = [Person(entry) for entry in data]
+        links = ss.wishlist_links(people)
+        assert len(links) == 2
+        ss.show_wishlist_problems(people, links)
+
+        cards = {}
+        ss.send_cards = lambda cards_, *args: cards.update(
+            (card["data"]["giftee_name"], card["data"]) for card in cards_
+        )
+        ss.send_secret_santa_emails(ss.create_pairs(people, seed=1))
+        assert cards["John Doe"]["wishlist_title"] == "Bill's Wishlist"
+        assert cards["Bill German"]["wishlist_ok"] is False
+        assert "wishlist_ok" not in cards["Ryan Bickman"]
+        # the second check was answered from the cache
+        assert len(server.requests) == 2
@@ -5,7 +5,6 @@ import sys
 from rich.console import Console
 from pick import pick
 
-
 console = Console()
 
 
@@ -28,17 +27,17 @@ def action_picker(choices: list[tuple], repeat: bool = True) -> None:
     """
     # skip if terminal is incompatible.
     if not sys.stdout.isatty():
-        print("\nSkipping Task Picker.\nInput can't be used")
+        print("\nSkipping Task Picker.\nInput can't be used, run cli.py instead")
         return
-    input("\nPress Enter to Pick Next Action:")
     PROMPT = "What do you want to do? (Use Arrow Keys and Enter):"
-    selected = advanced_picker(choices, PROMPT)
-    if selected:
+    while True:
+        input("\nPress Enter to Pick Next Action:")
+        selected = advanced_picker(choices, PROMPT)
+        if not selected:
+            return
         name, func = selected
         msg = f"\n[b underline]{name}[/] Selected"
         console.print(msg, highlight=False)
         func()
-        if "exit" in name.lower():
+        if "exit" in name.lower() or not repeat:
             return
-        if repeat:
-            action_picker(choices, repeat)
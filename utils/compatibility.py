@@ -0,0 +1,121 @@
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.roster import Roster
+
+
+class CompatibilityIndex:
+    """
+    Every valid gifter and giftee pair for a group of people, built in one pass.
+
+    `matrix[gifter, giftee]` is True when the pair follows the same rules as
+    `SecretSanta.is_valid_pair`. It is built from the interned id arrays of a
+    `Roster` so the rules are checked with array comparisons. Rows are the
+    roster's person ids.
+
+    `exclusions` maps a gifter's full name to the full names they may not
+    give to, such as the giftees they had in recent years.
+    A `matrix` worked out before, such as one from a `SnapshotCache`, is used
+    as it is instead of checking the rules again.
+    """
+
+    def __init__(
+        self,
+        people,
+        exclusions: dict | None = None,
+        matrix: np.ndarray | None = None,
+    ) -> None:
+        if not isinstance(people, Roster):
+            people = Roster.from_people(people)
+        self.roster = people
+        self.last_ids = people.household_ids
+        self.name_ids = people.name_ids
+        self.prev_ids = people.prev_ids
+        self._rows = None
+        if matrix is None:
+            everyone = np.arange(len(people))
+            matrix = self.allowed(everyone, everyone, exclusions)
+        self.matrix = matrix
+
+    def allowed(
+        self,
+        rows: np.ndarray,
+        columns: np.ndarray,
+        exclusions: dict | None = None,
+    ) -> np.ndarray:
+        """
+        Checks the rules for every gifter in `rows` with every giftee in
+        `columns` and gives the part of the matrix they cover.
+        """
+        last_ids, name_ids = self.last_ids, self.name_ids
+        # same last name
+        matrix = last_ids[rows, None] != last_ids[None, columns]
+        # previous giftee
+        matrix &= self.prev_ids[rows, None] != name_ids[None, columns]
+        # same person
+        matrix &= rows[:, None] != columns[None, :]
+        # recent giftees
+        if exclusions:
+            matrix &= ~self.excluded(exclusions, rows)[:, name_ids[columns]]
+        return matrix
+
+    def excluded(self, exclusions: dict, rows=None) -> np.ndarray:
+        """
+        Gets a matrix that is True for each gifter row and giftee name id in
+        `exclusions`, so people with the same name are excluded together.
+        Only the gifters in `rows` are given if it is set.
+        """
+        names = self.roster.names
+        full_names = self.roster.full_names
+        rows = range(len(self.roster)) if rows is None else rows
+        found, name_ids = [], []
+        for position, row in enumerate(rows):
+            for giftee in exclusions.get(full_names[row], ()):
+                if giftee in names:
+                    found.append(position)
+                    name_ids.append(names[giftee])
+        excluded = np.zeros((len(rows), len(names)), dtype=bool)
+        excluded[found, name_ids] = True
+        return excluded
+
+    def __len__(self) -> int:
+        return len(self.roster)
+
+    @property
+    def people(self) -> list:
+        return self.roster.people()
+
+    def row(self, person) -> int:
+        """
+        Gets the matrix row and column of `person`.
+        """
+        if self._rows is None:
+            people = enumerate(self.roster.people())
+            self._rows = {id(entry): row for row, entry in people}
+        return self._rows[id(person)]
+
+    def is_valid_pair(self, gifter, giftee) -> bool:
+        """
+        Determines if `gifter` and `giftee` are a valid pair.
+        """
+        return bool(self.matrix[self.row(gifter), self.row(giftee)])
+
+    def allows(self, giftee_of) -> bool:
+        """
+        Determines if every gifter row may give to its giftee in `giftee_of`.
+        """
+        gifters = np.arange(len(giftee_of))
+        return bool(self.matrix[gifters, giftee_of].all())
+
+    def giftee_counts(self) -> np.ndarray:
+        """
+        Gets the number of valid giftees for each gifter.
+        """
+        return self.matrix.sum(axis=1)
+
+    def gifter_counts(self) -> np.ndarray:
+        """
+        Gets the number of valid gifters for each giftee.
+        """
+        return self.matrix.sum(axis=0)
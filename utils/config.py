@@ -0,0 +1,66 @@
+# standard library
+from functools import cached_property
+from pathlib import Path
+import json
+
+# local imports
+from utils.person import Person
+
+CONFIG = Path("config.json")
+
+
+class Config:
+    """
+    Settings, Gmail details and entries for a Secret Santa.
+
+    Entries are only built into `Person` objects the first time they are used.
+    They can also be the path of a CSV or JSON Lines roster, relative to
+    `base`, which is streamed in one row at a time.
+    """
+
+    def __init__(self, data: dict | None = None, base: Path = Path(".")) -> None:
+        self.data = data or {}
+        self.base = Path(base)
+        # `RowError`s for the roster rows under each key that could not be loaded
+        self.row_errors = {}
+
+    @classmethod
+    def load(cls, source=CONFIG) -> "Config":
+        """
+        Loads a config from a JSON file path or an open text stream.
+        """
+        if hasattr(source, "read"):
+            return cls(json.load(source))
+        with open(source) as file:
+            return cls(json.load(file), Path(source).parent)
+
+    @property
+    def settings(self) -> dict:
+        return self.data.get("settings") or {}
+
+    @property
+    def gmail(self) -> dict:
+        return self.data.get("gmail") or {}
+
+    def load_entries(self, key: str) -> list[Person]:
+        """
+        Builds the entries under `key` from the config or the roster file it names.
+        Rows of the roster file that cannot be loaded are skipped and kept in
+        `row_errors` so they can all be shown at once.
+        """
+        entries = self.data.get(key) or []
+        if isinstance(entries, str):
+            from utils.loaders import read_roster
+
+            errors = self.row_errors.setdefault(key, [])
+            errors.clear()
+            return list(read_roster(self.base / entries, errors))
+        return [Person(person) for person in entries]
+
+    @cached_property
+    def entries(self) -> list[Person]:
+        return self.load_entries("entries")
+
+    @cached_property
+    def test_entries(self) -> list[Person]:
+        return self.load_entries("test_entries")
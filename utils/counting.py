@@ -0,0 +1,511 @@
+# standard library
+from functools import lru_cache
+import math
+
+# third-party imports
+import numpy as np
+
+RYSER_LIMIT = 20
+MAX_BANS = 10
+# most household column counts `grouped_permanent` sums over
+GROUPED_LIMIT = 500_000
+
+
+class AssignmentEstimate:
+    """
+    Estimated number of valid assignments for rosters too large to count.
+
+    Values are stored as base 10 logarithms because the counts for large
+    rosters do not fit in a float. `lower` and `upper` always hold the true
+    count between them.
+    """
+
+    def __init__(
+        self,
+        log10: float,
+        lower: float,
+        upper: float,
+        reason: str | None = None,
+    ) -> None:
+        self.log10 = log10
+        self.lower = lower
+        self.upper = upper
+        # why the roster could not be counted exactly
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return (
+            f"AssignmentEstimate(log10={self.log10}, "
+            f"lower={self.lower}, upper={self.upper})"
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"about {format_log10(self.log10)} "
+            f"(between {format_log10(self.lower)} and {format_log10(self.upper)})"
+        )
+
+
+def format_log10(log10: float) -> str:
+    """
+    Formats the number with the base 10 logarithm `log10` in scientific notation.
+    """
+    if log10 == -math.inf:
+        return "0"
+    exponent = math.floor(log10)
+    return f"{10 ** (log10 - exponent):.2f}e{exponent}"
+
+
+def format_count(count: int | AssignmentEstimate) -> str:
+    """
+    Formats an exact or estimated `count` of valid assignments for display.
+    Exact counts too long to read are shown in scientific notation.
+    """
+    if isinstance(count, AssignmentEstimate):
+        return str(count)
+    if count < 10**24:
+        return f"{count:,}"
+    return format_log10(math.log10(count))
+
+
+def ryser_permanent(matrix: np.ndarray) -> int:
+    """
+    Counts the valid assignments for the boolean `matrix` exactly using Ryser's
+    formula with the column subsets visited in Gray code order.
+
+    Takes O(2^N * N) time so it is only meant for N up to about `RYSER_LIMIT`.
+    """
+    size = len(matrix)
+    if size == 0:
+        return 1
+    columns = [np.flatnonzero(matrix[:, col]).tolist() for col in range(size)]
+    row_sums = [0] * size
+    zero_rows = size
+    in_subset = [False] * size
+    subset_size = 0
+    total = 0
+    for step in range(1, 2**size):
+        # the column that flips between consecutive Gray codes
+        col = (step & -step).bit_length() - 1
+        if in_subset[col]:
+            in_subset[col] = False
+            subset_size -= 1
+            for row in columns[col]:
+                row_sums[row] -= 1
+                if row_sums[row] == 0:
+                    zero_rows += 1
+        else:
+            in_subset[col] = True
+            subset_size += 1
+            for row in columns[col]:
+                if row_sums[row] == 0:
+                    zero_rows -= 1
+                row_sums[row] += 1
+        if zero_rows == 0:
+            product = math.prod(row_sums)
+            total += -product if subset_size % 2 else product
+    return -total if size % 2 else total
+
+
+def household_permanent(
+    groups: np.ndarray,
+    bans: list[tuple[int, int]] = (),
+    giftee_groups: np.ndarray | None = None,
+) -> int:
+    """
+    Counts the valid assignments exactly when no one can buy for anyone in
+    their own group and `bans` lists any other forbidden (gifter, giftee) pairs.
+    `giftee_groups` are the groups of the giftees when they are not the
+    gifters, as in a minor of the matrix.
+
+    Uses inclusion-exclusion over the forbidden board. Each group adds a factor
+    to the rook polynomial so the cost is O(N^2) for the groups alone, and it
+    doubles for every ban.
+    """
+    groups = np.asarray(groups)
+    giftee_groups = groups if giftee_groups is None else np.asarray(giftee_groups)
+    size = len(groups)
+    labels, inverse = np.unique(
+        np.concatenate((groups, giftee_groups)), return_inverse=True
+    )
+    row_inverse, col_inverse = inverse[:size], inverse[size:]
+    row_sizes = np.bincount(row_inverse, minlength=len(labels))
+    col_sizes = np.bincount(col_inverse, minlength=len(labels))
+    factorials = [1] * (size + 1)
+    for n in range(1, size + 1):
+        factorials[n] = factorials[n - 1] * n
+
+    total = 0
+    for used_rows, used_cols, sign in _ban_subsets(bans):
+        rows = row_sizes.tolist()
+        cols = col_sizes.tolist()
+        for row in used_rows:
+            rows[row_inverse[row]] -= 1
+        for col in used_cols:
+            cols[col_inverse[col]] -= 1
+        # rook polynomial of the groups left after the bans take their places
+        poly = [1]
+        for row_count, col_count in zip(rows, cols):
+            poly = _multiply(poly, rook_factor(row_count, col_count))
+        remaining = size - len(used_rows)
+        total += sign * sum(
+            coefficient * factorials[remaining - k]
+            for k, coefficient in enumerate(poly)
+        )
+    return total
+
+
+@lru_cache(maxsize=4096)
+def rook_factor(row_count: int, col_count: int) -> tuple[int, ...]:
+    """
+    Gets the factor a group with `row_count` gifters and `col_count` giftees
+    adds to the signed rook polynomial of `household_permanent`.
+    """
+    return tuple(
+        (-1) ** k
+        * math.comb(row_count, k)
+        * math.comb(col_count, k)
+        * math.factorial(k)
+        for k in range(min(row_count, col_count) + 1)
+    )
+
+
+class HouseholdCounts:
+    """
+    Counts the ways to finish an assignment when no one can buy for anyone in
+    their own household and there are no other rules, as gifters and giftees
+    are taken out one at a time.
+
+    `rows` and `cols` are how many gifters and giftees each household has
+    left. The rook polynomial of `household_permanent` is kept and updated
+    for the one or two households that change instead of built again.
+    `work` adds up the coefficient products, so callers can stop early.
+    """
+
+    def __init__(self, rows: list[int], cols: list[int]) -> None:
+        self.rows = list(rows)
+        self.cols = list(cols)
+        self.size = sum(self.rows)
+        self.work = 0
+        self._polys = {}
+        self.factorials = [1] * (self.size + 1)
+        for n in range(1, self.size + 1):
+            self.factorials[n] = self.factorials[n - 1] * n
+        self.poly = [1]
+        for row_count, col_count in zip(self.rows, self.cols):
+            self.poly = self._multiply(self.poly, rook_factor(row_count, col_count))
+
+    def _multiply(self, left: list[int], right: tuple[int, ...]) -> list[int]:
+        self.work += len(left) * len(right)
+        return _multiply(left, list(right))
+
+    def _divide(self, poly: list[int], factor: tuple[int, ...]) -> list[int]:
+        """
+        Divides `poly` by `factor`, which divides it and starts with 1.
+        """
+        self.work += len(poly) * len(factor)
+        quotient = [0] * (len(poly) - len(factor) + 1)
+        for i in range(len(quotient)):
+            value = poly[i]
+            for j in range(1, min(i, len(factor) - 1) + 1):
+                value -= factor[j] * quotient[i - j]
+            quotient[i] = value
+        return quotient
+
+    def _change(self, poly: list[int], household: int, rows: int, cols: int):
+        old = rook_factor(self.rows[household], self.cols[household])
+        return self._multiply(self._divide(poly, old), rook_factor(rows, cols))
+
+    def count(self, poly: list[int] | None = None) -> int:
+        """
+        Gets the number of ways to finish the assignment from `poly`, the
+        current polynomial by default, once there are as many giftees left
+        as gifters.
+        """
+        poly = self.poly if poly is None else poly
+        return sum(
+            coefficient * self.factorials[self.size - k]
+            for k, coefficient in enumerate(poly)
+        )
+
+    def remove_gifter(self, household: int) -> None:
+        rows = self.rows[household] - 1
+        self.poly = self._change(self.poly, household, rows, self.cols[household])
+        self.rows[household] = rows
+        self.size -= 1
+        self._polys = {}
+
+    def giftee_counts(self, gifter_household: int) -> dict[int, int]:
+        """
+        Gets the number of ways to finish the assignment after a gifter from
+        `gifter_household`, already removed, takes a giftee from each other
+        household with one left. Households with the same gifters and giftees
+        left are counted once.
+        """
+        counts = {}
+        by_key = {}
+        for household, col_count in enumerate(self.cols):
+            if not col_count or household == gifter_household:
+                continue
+            key = (self.rows[household], col_count)
+            if key not in by_key:
+                poly = self._change(self.poly, household, key[0], col_count - 1)
+                self._polys[key] = poly
+                by_key[key] = self.count(poly)
+            counts[household] = by_key[key]
+        return counts
+
+    def remove_giftee(self, household: int) -> None:
+        key = (self.rows[household], self.cols[household])
+        poly = self._polys.get(key)
+        if poly is None:
+            poly = self._change(self.poly, household, key[0], key[1] - 1)
+        self.poly = poly
+        self.cols[household] -= 1
+        self._polys = {}
+
+
+def _ban_subsets(bans: list[tuple[int, int]]):
+    """
+    Yields the rows, columns and inclusion-exclusion sign of every subset of
+    `bans` with no shared rows or columns.
+    """
+    bans = list(bans)
+    used_rows, used_cols = [], []
+
+    def visit(start: int):
+        sign = -1 if len(used_rows) % 2 else 1
+        yield used_rows, used_cols, sign
+        for i in range(start, len(bans)):
+            row, col = bans[i]
+            if row in used_rows or col in used_cols:
+                continue
+            used_rows.append(row)
+            used_cols.append(col)
+            yield from visit(i + 1)
+            used_rows.pop()
+            used_cols.pop()
+
+    yield from visit(0)
+
+
+def _multiply(left: list[int], right: list[int]) -> list[int]:
+    """
+    Multiplies two polynomials given as coefficient lists.
+    """
+    result = [0] * (len(left) + len(right) - 1)
+    for i, a in enumerate(left):
+        if a:
+            for j, b in enumerate(right):
+                result[i + j] += a * b
+    return result
+
+
+@lru_cache
+def _primes(count: int) -> tuple[int, ...]:
+    """
+    Gets the `count` largest primes below 2^31, so the product of two numbers
+    below any of them fits in an int64.
+    """
+    primes = []
+    candidate = 2**31 - 1
+    while len(primes) < count:
+        if all(candidate % d for d in range(3, math.isqrt(candidate) + 1, 2)):
+            primes.append(candidate)
+        candidate -= 2
+    return tuple(primes)
+
+
+def grouped_size(groups: np.ndarray) -> int:
+    """
+    Gets how many terms `grouped_permanent` sums over for `groups`.
+    """
+    _, sizes = np.unique(np.asarray(groups), return_counts=True)
+    return math.prod(int(size) + 1 for size in sizes)
+
+
+def grouped_permanent(groups: np.ndarray, bans: list[tuple[int, int]]) -> int:
+    """
+    Counts the valid assignments exactly when no one can buy for anyone in
+    their own group and `bans` forbids at most one other giftee for each
+    gifter, such as their `prev_giftee`.
+
+    Uses Ryser's formula with the columns grouped by household. For a subset
+    of columns, a gifter's row sum only depends on how many columns were taken
+    from their own household and whether their banned giftee was taken, so
+    the formula sums over how many columns are taken from each household
+    instead of over every subset. That is `grouped_size` terms, which are
+    worked out with NumPy modulo a few primes and joined with the Chinese
+    remainder theorem.
+    """
+    groups = np.asarray(groups)
+    size = len(groups)
+    if size == 0:
+        return 1
+    banned = dict(bans)
+    if len(banned) != len(bans):
+        raise ValueError("More than one ban for a gifter")
+    _, inverse, sizes = np.unique(groups, return_inverse=True, return_counts=True)
+    households = len(sizes)
+    # gifters with a ban are counted with the column of their banned giftee
+    free_rows = np.bincount(inverse, minlength=households)
+    banners = [[] for _ in range(size)]
+    for row, col in banned.items():
+        free_rows[inverse[row]] -= 1
+        banners[col].append(int(inverse[row]))
+    columns = [[] for _ in range(households)]
+    for col in range(size):
+        columns[inverse[col]].append(banners[col])
+
+    # how many columns are taken from each household, for every term
+    taken = np.indices(sizes + 1).reshape(households, -1)
+    total = taken.sum(axis=0)
+    bits = math.log2(math.factorial(size)) + 2
+    primes = _primes(math.ceil(bits / 30))
+    odd = (total + size) % 2 == 1
+    residues = []
+    for prime in primes:
+        # row sums of gifters whose banned giftee was not or was taken
+        outside = (total - taken) % prime
+        inside = (outside - 1) % prime
+        terms = np.ones(len(total), dtype=np.int64)
+        for household, count in enumerate(free_rows.tolist()):
+            for _ in range(count):
+                terms *= outside[household]
+                terms %= prime
+        for household, household_columns in enumerate(columns):
+            # coefficients of z^k: products over every way to take k columns,
+            # where columns no one is banned from just add one to k
+            unbanned = sum(not gifters for gifters in household_columns)
+            poly = [np.ones(len(total), dtype=np.int64)]
+            for gifters in household_columns:
+                if not gifters:
+                    continue
+                left, right = outside[gifters[0]], inside[gifters[0]]
+                for gifter in gifters[1:]:
+                    left = left * outside[gifter] % prime
+                    right = right * inside[gifter] % prime
+                poly = [
+                    (
+                        (poly[k] * left if k < len(poly) else 0)
+                        + (poly[k - 1] * right % prime if k else 0)
+                    )
+                    % prime
+                    for k in range(len(poly) + 1)
+                ]
+            # ways to take the rest of the columns from the unbanned ones,
+            # offset so that taking more columns than there are gives zero
+            ways = np.zeros(len(poly) + sizes[household] + 1, dtype=np.int64)
+            for rest in range(unbanned + 1):
+                ways[len(poly) + rest] = math.comb(unbanned, rest) % prime
+            coefficient = np.zeros(len(total), dtype=np.int64)
+            for k, values in enumerate(poly):
+                coefficient += values * ways[len(poly) + taken[household] - k] % prime
+            terms *= coefficient % prime
+            terms %= prime
+        residue = int(terms[~odd].sum() % prime) - int(terms[odd].sum() % prime)
+        residues.append(residue % prime)
+
+    # Chinese remainder theorem, the count is below the product of the primes
+    count, modulus = 0, 1
+    for prime, residue in zip(primes, residues):
+        step = (residue - count) * pow(modulus, -1, prime) % prime
+        count += modulus * step
+        modulus *= prime
+    return count
+
+
+def household_bans(
+    matrix: np.ndarray,
+    groups: np.ndarray,
+    giftee_groups: np.ndarray | None = None,
+) -> list | None:
+    """
+    Gets the forbidden pairs in `matrix` between different `groups`, with
+    the giftees in `giftee_groups` if they are not the gifters.
+    Returns None if anyone is allowed to buy for someone in their own group.
+    """
+    groups = np.asarray(groups)
+    giftee_groups = groups if giftee_groups is None else np.asarray(giftee_groups)
+    same_group = groups[:, None] == giftee_groups[None, :]
+    if (matrix & same_group).any():
+        return None
+    rows, cols = np.nonzero(~matrix & ~same_group)
+    return list(zip(rows.tolist(), cols.tolist()))
+
+
+def count_assignments(
+    matrix: np.ndarray,
+    groups: np.ndarray | None = None,
+    max_bans: int = MAX_BANS,
+    ryser_limit: int = RYSER_LIMIT,
+    grouped_limit: int = GROUPED_LIMIT,
+    giftee_groups: np.ndarray | None = None,
+) -> int:
+    """
+    Counts the valid assignments for the boolean `matrix` exactly, which is
+    the permanent of the matrix.
+
+    Uses `household_permanent` when `groups` (such as last name ids) explain
+    every forbidden pair except for up to `max_bans`, `grouped_permanent`
+    when they explain all but at most one per gifter, such as each entry's
+    `prev_giftee`, and `ryser_permanent` for up to `ryser_limit` people
+    otherwise. `giftee_groups` are the groups of the columns when they are
+    not the people of the rows, as in a minor of the matrix.
+
+    Raises ValueError, saying why, if none of them can count the roster in
+    reasonable time.
+    """
+    matrix = np.asarray(matrix, dtype=bool)
+    reason = f"there are too many people to count exactly ({len(matrix)})"
+    if groups is not None:
+        bans = household_bans(matrix, groups, giftee_groups)
+        if bans is not None and len(bans) <= max_bans:
+            return household_permanent(groups, bans, giftee_groups)
+        if bans is not None and giftee_groups is None:
+            gifters = {gifter for gifter, _ in bans}
+            if len(gifters) < len(bans):
+                reason = "some people have more than one giftee ruled out"
+            elif grouped_size(groups) <= grouped_limit:
+                return grouped_permanent(groups, bans)
+            else:
+                reason = "there are too many households to count exactly"
+    if len(matrix) <= ryser_limit:
+        return ryser_permanent(matrix)
+    raise ValueError(reason)
+
+
+def estimate_assignments(matrix: np.ndarray) -> AssignmentEstimate:
+    """
+    Quickly estimates the valid assignments for the boolean `matrix` with
+    bounds, using only the number of valid giftees per gifter.
+
+    The estimate treats each gifter's choice as independent. The upper bound is
+    Bregman's bound and the lower bound is Hall's bound of `d!` assignments
+    when every row and column has at least `d >= N/2` valid pairs.
+    """
+    matrix = np.asarray(matrix, dtype=bool)
+    size = len(matrix)
+    row_sums = matrix.sum(axis=1)
+    col_sums = matrix.sum(axis=0)
+    if size == 0:
+        return AssignmentEstimate(0.0, 0.0, 0.0)
+    if not row_sums.all() or not col_sums.all():
+        return AssignmentEstimate(-math.inf, -math.inf, -math.inf)
+
+    ln10 = math.log(10)
+    upper = min(
+        sum(math.lgamma(n + 1) / n for n in sums.tolist())
+        for sums in (row_sums, col_sums)
+    )
+    upper /= ln10
+
+    min_degree = int(min(row_sums.min(), col_sums.min()))
+    if 2 * min_degree >= size:
+        lower = math.lgamma(min_degree + 1) / ln10
+    else:
+        lower = -math.inf
+
+    log10 = math.lgamma(size + 1) / ln10
+    log10 += float(np.log10(row_sums / size).sum())
+    return AssignmentEstimate(min(max(log10, lower), upper), lower, upper)
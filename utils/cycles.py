@@ -0,0 +1,143 @@
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.matching import find_matrix_assignment
+
+# how many new starting pairs are tried when the cycles cannot all be merged
+RESTARTS = 20
+
+
+class NoSingleCycleError(Exception):
+    """
+    Raised when the pairs cannot form one gift cycle through everyone.
+    `reason` says why.
+    """
+
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+        super().__init__(reason)
+
+
+def cycle_labels(giftee_of: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    Labels each gifter with the cycle of `giftee_of` they are in and returns
+    the labels and the number of cycles.
+    """
+    giftee_of = giftee_of.tolist()
+    labels = [-1] * len(giftee_of)
+    count = 0
+    for start in range(len(giftee_of)):
+        if labels[start] >= 0:
+            continue
+        person = start
+        while labels[person] < 0:
+            labels[person] = count
+            person = giftee_of[person]
+        count += 1
+    return np.array(labels), count
+
+
+def reachable(matrix: np.ndarray, start: int) -> np.ndarray:
+    """
+    Finds everyone reachable from `start` by following valid pairs,
+    one whole breadth first level at a time.
+    """
+    seen = np.zeros(len(matrix), dtype=bool)
+    seen[start] = True
+    frontier = seen.copy()
+    while frontier.any():
+        frontier = matrix[frontier].any(axis=0) & ~seen
+        seen |= frontier
+    return seen
+
+
+def check_single_cycle(matrix: np.ndarray) -> None:
+    """
+    Raises `NoSingleCycleError` with the reason if the valid pairs in
+    `matrix` clearly cannot form one gift cycle through everyone.
+    """
+    size = len(matrix)
+    if size < 2:
+        raise NoSingleCycleError("a gift cycle needs at least 2 people")
+    if not matrix.any(axis=1).all():
+        raise NoSingleCycleError("someone has no valid giftee")
+    if not matrix.any(axis=0).all():
+        raise NoSingleCycleError("someone has no valid gifter")
+    # every person must be able to reach and be reached from everyone else
+    forward = reachable(matrix, 0)
+    if not forward.all():
+        missing = int(size - forward.sum())
+        raise NoSingleCycleError(
+            f"the valid pairs are not strongly connected, "
+            f"{missing} people can never receive a gift chain from the first"
+        )
+    backward = reachable(matrix.T, 0)
+    if not backward.all():
+        missing = int(size - backward.sum())
+        raise NoSingleCycleError(
+            f"the valid pairs are not strongly connected, "
+            f"{missing} people can never pass a gift chain to the first"
+        )
+
+
+def merge_cycles(
+    matrix: np.ndarray,
+    giftee_of: np.ndarray,
+    rng: np.random.Generator,
+) -> bool:
+    """
+    Joins the cycles of `giftee_of` in place until one is left and returns
+    True, or returns False if no two cycles can be joined.
+
+    Two gifters `a` and `b` in different cycles swap giftees when `a` may
+    give to `b`'s giftee and `b` to `a`'s, which turns their two cycles into
+    one. Every swap for a cycle is found at once with array operations.
+    """
+    labels, count = cycle_labels(giftee_of)
+    while count > 1:
+        # joining the smallest cycle first leaves more options for the rest
+        sizes = np.bincount(labels, minlength=count)
+        for label in np.argsort(sizes, kind="stable").tolist():
+            members = np.flatnonzero(labels == label)
+            # swaps[i, b] when members[i] can take b's giftee and b can take theirs
+            swaps = matrix[members][:, giftee_of]
+            swaps &= matrix[:, giftee_of[members]].T
+            swaps &= labels[None, :] != label
+            options = np.argwhere(swaps)
+            if len(options):
+                break
+        else:
+            return False
+        row, b = options[rng.integers(len(options))]
+        a = members[row]
+        giftee_of[a], giftee_of[b] = giftee_of[b], giftee_of[a]
+        labels[labels == labels[b]] = label
+        count -= 1
+    return True
+
+
+def single_cycle(
+    matrix: np.ndarray,
+    rng: np.random.Generator | None = None,
+    restarts: int = RESTARTS,
+) -> np.ndarray:
+    """
+    Finds valid pairs in `matrix` that form one gift cycle through everyone,
+    so no smaller groups or two people buy for each other.
+
+    Starts from any full set of valid pairs and joins its cycles with giftee
+    swaps. If the last cycles cannot be joined it starts again from a new
+    random set of pairs, up to `restarts` times.
+    Raises `NoValidPairsError` when no full set of pairs exists and
+    `NoSingleCycleError` with the reason when no single cycle is found.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    check_single_cycle(matrix)
+    for _ in range(restarts + 1):
+        giftee_of = np.asarray(find_matrix_assignment(matrix, rng), dtype=np.int32)
+        if merge_cycles(matrix, giftee_of, rng):
+            return giftee_of
+    raise NoSingleCycleError(
+        f"the pairs could not be joined into one cycle after {restarts} restarts"
+    )
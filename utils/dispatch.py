@@ -0,0 +1,272 @@
+# standard library
+from concurrent.futures import ThreadPoolExecutor
+import smtplib, threading, time
+
+# local imports
+from utils.email import Email
+from utils.metrics import METRICS
+from utils.scheduler import QuotaStore
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket that limits sends to `rate` per second with
+    bursts of up to `capacity` sends.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int = 1,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Takes one token, waiting until one is available.
+        """
+        while True:
+            with self.lock:
+                now = self.clock()
+                elapsed = now - self.updated
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            METRICS.count("dispatch.throttled_seconds", wait)
+            self.sleep(wait)
+
+
+class DispatchReport:
+    """
+    Delivery results for each recipient of a dispatch.
+    """
+
+    def __init__(self) -> None:
+        self.attempts = {}
+        self.errors = {}
+        # recipients left for a later send window
+        self.deferred = []
+        # delivered recipients whose quota use or result could not be saved
+        self.unsaved = {}
+        self.lock = threading.Lock()
+
+    def record(
+        self,
+        recipient: str,
+        attempts: int,
+        error: Exception | None,
+    ) -> None:
+        with self.lock:
+            self.attempts[recipient] = attempts
+            if error is not None:
+                self.errors[recipient] = error
+
+    def record_unsaved(self, recipient: str, error: Exception) -> None:
+        METRICS.count("dispatch.unsaved")
+        with self.lock:
+            self.unsaved[recipient] = error
+
+    @property
+    def sent(self) -> list[str]:
+        return [name for name in self.attempts if name not in self.errors]
+
+    @property
+    def retried(self) -> list[str]:
+        return [name for name in self.sent if self.attempts[name] > 1]
+
+    @property
+    def failed(self) -> list[str]:
+        return list(self.errors)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Determines if a failed send is worth trying again.
+    Dropped connections and 4xx replies are temporary, 5xx replies are not.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class Account:
+    """
+    A sender account that sends over `workers` connections at once, no
+    faster than `rate` emails per second if it is set and no more than
+    `daily_limit` emails a day if it is set.
+    """
+
+    def __init__(
+        self,
+        email: Email,
+        workers: int = 1,
+        rate: float | None = None,
+        daily_limit: int | None = None,
+    ) -> None:
+        self.email = email
+        self.workers = workers
+        self.rate = rate
+        self.daily_limit = daily_limit
+
+    @property
+    def name(self) -> str:
+        return self.email.gmail_username
+
+    def __repr__(self) -> str:
+        return f"Account({self.name!r}, workers={self.workers}, rate={self.rate})"
+
+
+def dispatch(
+    email: Email,
+    messages,
+    workers: int = 4,
+    rate: float | None = None,
+    retries: int = 3,
+    backoff: float = 1.0,
+    on_result=None,
+    sleep=time.sleep,
+) -> DispatchReport:
+    """
+    Sends `messages` as (recipient, to_email, message) tuples over `workers`
+    parallel SMTP sessions and returns a `DispatchReport` keyed by `recipient`.
+
+    Sends are limited to `rate` per second if it is set. Transient failures
+    are tried again up to `retries` times, waiting `backoff` seconds and then
+    twice as long after each failure. `on_result(recipient, error)` is called
+    after each recipient is done, with `error` set to None on success. If it
+    raises, the error is kept in `DispatchReport.unsaved` so a result that
+    was not saved never looks like a clean send.
+    Only a few messages are read ahead of the workers so `messages` can be a
+    generator that builds them as they are needed.
+    """
+    return dispatch_accounts(
+        [Account(email, workers, rate)],
+        ((0, *message) for message in messages),
+        retries=retries,
+        backoff=backoff,
+        on_result=on_result,
+        sleep=sleep,
+    )
+
+
+def dispatch_accounts(
+    accounts: list[Account],
+    messages,
+    quota: QuotaStore | None = None,
+    retries: int = 3,
+    backoff: float = 1.0,
+    on_result=None,
+    sleep=time.sleep,
+) -> DispatchReport:
+    """
+    Sends `messages` as (account index, recipient, to_email, message) tuples
+    from the matching account in `accounts`, see `dispatch`.
+
+    Every account has its own sessions, workers and rate limit so all of
+    them send at once. Each delivered message is added to the account's
+    daily use in `quota` if it is given.
+    """
+    report = DispatchReport()
+    buckets = [
+        (
+            TokenBucket(account.rate, capacity=account.workers, sleep=sleep)
+            if account.rate
+            else None
+        )
+        for account in accounts
+    ]
+    locals_ = [threading.local() for _ in accounts]
+    sessions = []
+    sessions_lock = threading.Lock()
+    pending = threading.BoundedSemaphore(sum(a.workers for a in accounts) * 2)
+
+    def get_session(index: int):
+        local = locals_[index]
+        if not hasattr(local, "session"):
+            local.session = accounts[index].email.session()
+            with sessions_lock:
+                sessions.append(local.session)
+        return local.session
+
+    def send(index: int, recipient: str, to_email: str, message: str | bytes) -> None:
+        try:
+            deliver(index, recipient, to_email, message)
+        finally:
+            pending.release()
+
+    def deliver(index: int, recipient: str, to_email: str, message: str | bytes):
+        bucket = buckets[index]
+        session = None
+        attempt = 0
+        while True:
+            attempt += 1
+            if bucket:
+                bucket.acquire()
+            try:
+                session = get_session(index)
+                session.sendmail(to_email, message)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                if attempt > retries or not is_transient(e):
+                    break
+                METRICS.count("dispatch.retries")
+                refused = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+                if session is not None and not isinstance(e, refused):
+                    # the connection may be broken so the next try opens a new one
+                    session.close()
+                sleep(backoff * 2 ** (attempt - 1))
+        METRICS.count("dispatch.failed" if error else "dispatch.sent")
+        report.record(recipient, attempt, error)
+        if quota and error is None:
+            try:
+                quota.add(accounts[index].name)
+            except Exception as e:
+                report.record_unsaved(recipient, e)
+        if on_result:
+            try:
+                on_result(recipient, error)
+            except Exception as e:
+                report.record_unsaved(recipient, e)
+
+    executors = [ThreadPoolExecutor(max_workers=a.workers) for a in accounts]
+    futures = {}
+    try:
+        for index, recipient, to_email, message in messages:
+            pending.acquire()
+            future = executors[index].submit(send, index, recipient, to_email, message)
+            futures[future] = recipient
+    finally:
+        for executor in executors:
+            executor.shutdown()
+        for session in sessions:
+            session.close()
+    for future, recipient in futures.items():
+        # anything that broke a send outside of the checks above
+        error = future.exception()
+        if error is None:
+            continue
+        if recipient in report.attempts:
+            report.record_unsaved(recipient, error)
+        else:
+            report.record(recipient, 0, error)
+    return report
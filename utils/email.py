@@ -2,32 +2,78 @@ import smtplib, ssl, re
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from utils.metrics import METRICS
+
+EMAIL_REGEX = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b")
+
 
 class Email:
-    def __init__(self, gmail_username: str, gmail_password: str) -> None:
+    def __init__(
+        self,
+        gmail_username: str,
+        gmail_password: str,
+        host: str = "smtp.gmail.com",
+        port: int = 465,
+        use_ssl: bool = True,
+    ) -> None:
         """
         Python Email functionality.
         """
         self.gmail_username = gmail_username
         self.gmail_password = gmail_password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self._context = None
+
+    @property
+    def context(self) -> ssl.SSLContext:
+        """
+        SSL context shared by every connection.
+        """
+        if self._context is None:
+            self._context = ssl.create_default_context()
+        return self._context
 
     @staticmethod
     def validate_email(email: str) -> bool:
         """
         Verifies if an email is valid using regex.
         """
-        regex = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b"
-        return re.fullmatch(regex, email)
+        return EMAIL_REGEX.fullmatch(email)
 
-    def send_email(
+    def connect(self) -> smtplib.SMTP:
+        """
+        Opens and logs in to a new connection to the SMTP server.
+        """
+        with METRICS.span("smtp.connect"):
+            if self.use_ssl:
+                server = smtplib.SMTP_SSL(self.host, self.port, context=self.context)
+            else:
+                server = smtplib.SMTP(self.host, self.port)
+        try:
+            with METRICS.span("smtp.login"):
+                server.login(self.gmail_username, self.gmail_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def session(self) -> "EmailSession":
+        """
+        Creates a session that sends many emails over one connection.
+        """
+        return EmailSession(self)
+
+    def create_message(
         self,
         subject: str,
         body: str,
         to_email: str,
         text: str = "plain",
-    ) -> None:
+    ) -> MIMEMultipart:
         """
-        Sends an email with `subject` and `body` to the `to_email`.
+        Creates an email with `subject` and `body` to the `to_email`.
         Body can be set to plain text or html by setting the `text` arg.
         """
         message = MIMEMultipart()
@@ -35,7 +81,88 @@ class Email:
         message["To"] = to_email
         message["Subject"] = subject
         message.attach(MIMEText(body, text))
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(self.gmail_username, self.gmail_password)
-            server.sendmail(self.gmail_username, to_email, message.as_string())
+        return message
+
+    def send_email(
+        self,
+        subject: str,
+        body: str,
+        to_email: str,
+        text: str = "plain",
+    ) -> None:
+        """
+        Sends an email with `subject` and `body` to the `to_email`.
+        Body can be set to plain text or html by setting the `text` arg.
+        Use `session` instead when sending more than one email.
+        """
+        with self.session() as session:
+            session.send_email(subject, body, to_email, text)
+
+
+class EmailSession:
+    """
+    Sends many emails over one logged in SMTP connection.
+
+    Connects on first use, reconnects once if the server has dropped the
+    connection and closes the connection when the `with` block exits.
+    """
+
+    def __init__(self, email: Email) -> None:
+        self.email = email
+        self.server = None
+
+    def __enter__(self) -> "EmailSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """
+        Connects and logs in if not already connected.
+        """
+        if self.server is None:
+            self.server = self.email.connect()
+
+    def close(self) -> None:
+        """
+        Closes the connection if it is open.
+        """
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPServerDisconnected, OSError):
+            server.close()
+
+    def send_email(
+        self,
+        subject: str,
+        body: str,
+        to_email: str,
+        text: str = "plain",
+    ) -> None:
+        """
+        Sends an email with `subject` and `body` to the `to_email`.
+        Body can be set to plain text or html by setting the `text` arg.
+        """
+        message = self.email.create_message(subject, body, to_email, text)
+        self.sendmail(to_email, message.as_string())
+
+    def sendmail(self, to_email: str, message: str | bytes) -> None:
+        """
+        Sends an already built `message` to the `to_email`.
+        """
+        self.open()
+        try:
+            with METRICS.span("smtp.sendmail"):
+                self.server.sendmail(self.email.gmail_username, to_email, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # the server dropped the connection so send again on a new one
+            METRICS.count("smtp.reconnects")
+            self.close()
+            self.open()
+            with METRICS.span("smtp.sendmail"):
+                self.server.sendmail(self.email.gmail_username, to_email, message)
+        METRICS.count("smtp.bytes", len(message))
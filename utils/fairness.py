@@ -0,0 +1,388 @@
+# standard library
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import math, multiprocessing, os
+
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.compatibility import CompatibilityIndex
+from utils.counting import count_assignments
+from utils.cycles import NoSingleCycleError, cycle_labels, single_cycle
+from utils.matching import NoValidPairsError, find_matrix_assignment
+from utils.optimize import optimal_assignment
+from utils.sampling import sample_assignment, shuffle_assignment
+
+STRATEGIES = ["uniform", "matching", "optimal", "cycle", "shuffle"]
+# trials handed to a worker at a time
+CHUNK = 1_000
+# rosters up to this size get exact uniform frequencies from permanents
+EXACT_LIMIT = 10
+# and up to this size when their rules are mostly households
+HOUSEHOLD_LIMIT = 60
+SINKHORN_ROUNDS = 1_000
+SINKHORN_TOLERANCE = 1e-9
+
+# the index, strategy and shared totals of each worker process
+_worker = {}
+
+
+class FairnessReport:
+    """
+    How often each gifter got each giftee over many seeded pairing trials,
+    compared with drawing uniformly from every valid set of pairs.
+
+    `counts[gifter, giftee]` counts the trials with that pair and
+    `cycle_lengths[n]` counts the gift cycles of length n over all trials.
+    `expected` holds the frequency of each pair under a uniform draw. It is
+    exact for rosters that can be counted and only estimated with Sinkhorn
+    scaling otherwise, see `baseline` and `uniform_frequencies`.
+    """
+
+    def __init__(
+        self,
+        strategy: str,
+        trials: int,
+        failures: int,
+        counts: np.ndarray,
+        cycle_lengths: np.ndarray,
+        expected: np.ndarray,
+        baseline: str,
+    ) -> None:
+        self.strategy = strategy
+        self.trials = trials
+        self.failures = failures
+        self.counts = counts
+        self.cycle_lengths = cycle_lengths
+        self.expected = expected
+        self.baseline = baseline
+
+    @property
+    def successes(self) -> int:
+        return self.trials - self.failures
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failures / self.trials if self.trials else 0.0
+
+    @property
+    def frequencies(self) -> np.ndarray:
+        return self.counts / max(self.successes, 1)
+
+    @property
+    def total_variation(self) -> np.ndarray:
+        """
+        Gets the total variation distance of each gifter's giftees from uniform.
+        """
+        return np.abs(self.frequencies - self.expected).sum(axis=1) / 2
+
+    @property
+    def ratios(self) -> np.ndarray:
+        """
+        Gets how many times more often each valid pair came up than uniform.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = self.frequencies / self.expected
+        return np.where(self.expected > 0, ratios, 0.0)
+
+    @property
+    def z_scores(self) -> np.ndarray:
+        """
+        Gets how many standard errors each pair's frequency is from uniform,
+        so sampling noise can be told apart from real bias.
+        """
+        expected = self.expected
+        error = np.sqrt(expected * (1 - expected) / max(self.successes, 1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = (self.frequencies - expected) / error
+        return np.where(error > 0, scores, 0.0)
+
+    @property
+    def invalid_pairs(self) -> int:
+        """
+        Counts the drawn pairs that a uniform draw can never give.
+        """
+        return int(self.counts[self.expected == 0].sum())
+
+    def to_dict(self, names: list[str] | None = None) -> dict:
+        ratios = self.ratios
+        gifter, giftee = np.unravel_index(int(ratios.argmax()), ratios.shape)
+        variation = self.total_variation
+        name = (lambda row: names[row]) if names else int
+        return {
+            "strategy": self.strategy,
+            "trials": self.trials,
+            "failures": self.failures,
+            "failure_rate": self.failure_rate,
+            "baseline": self.baseline,
+            "baseline_approximate": self.baseline != "exact",
+            "total_variation": {
+                "mean": float(variation.mean()) if len(variation) else 0.0,
+                "max": float(variation.max()) if len(variation) else 0.0,
+            },
+            "max_ratio": {
+                "gifter": name(gifter),
+                "giftee": name(giftee),
+                "ratio": float(ratios[gifter, giftee]),
+            },
+            "max_z_score": float(np.abs(self.z_scores).max(initial=0.0)),
+            "invalid_pairs": self.invalid_pairs,
+            "cycle_lengths": {
+                str(length): int(count)
+                for length, count in enumerate(self.cycle_lengths)
+                if count
+            },
+        }
+
+
+def uniform_frequencies(
+    matrix: np.ndarray,
+    groups: np.ndarray | None = None,
+) -> tuple[np.ndarray, str]:
+    """
+    Gets how often each pair comes up when every valid set of pairs in
+    `matrix` is equally likely, and how it was worked out.
+
+    Each pair's frequency is the number of assignments that use it over the
+    number of assignments, counted with `count_assignments` for up to
+    `EXACT_LIMIT` people, or `HOUSEHOLD_LIMIT` people when `groups` such as
+    last name ids explain the rules. Other rosters are only approximated by
+    scaling to equal row and column sums with Sinkhorn iterations, which is
+    close to uniform for rosters with few rules.
+    """
+    size = len(matrix)
+    if size <= EXACT_LIMIT or (groups is not None and size <= HOUSEHOLD_LIMIT):
+        try:
+            return exact_frequencies(matrix, groups), "exact"
+        except ValueError:
+            pass
+
+    expected = matrix.astype(float)
+    for _ in range(SINKHORN_ROUNDS):
+        expected /= np.maximum(expected.sum(axis=1, keepdims=True), 1e-300)
+        columns = expected.sum(axis=0, keepdims=True)
+        expected /= np.maximum(columns, 1e-300)
+        if np.abs(expected.sum(axis=1) - 1).max() < SINKHORN_TOLERANCE:
+            break
+    return expected, "sinkhorn"
+
+
+def exact_frequencies(
+    matrix: np.ndarray,
+    groups: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Gets the exact frequency of each pair in `matrix` under a uniform draw
+    from the counts of the minors, see `uniform_frequencies`.
+    Giftees with the same column of valid gifters share one count.
+    Raises ValueError if a minor cannot be counted quickly.
+    """
+    size = len(matrix)
+    groups = np.arange(size) if groups is None else np.asarray(groups)
+    expected = np.zeros((size, size))
+    total = count_assignments(matrix, groups, ryser_limit=EXACT_LIMIT)
+    if not total:
+        return expected
+    for gifter in range(size):
+        rest = np.delete(matrix, gifter, 0)
+        classes = {}
+        for giftee in np.flatnonzero(matrix[gifter]).tolist():
+            classes.setdefault(rest[:, giftee].tobytes(), []).append(giftee)
+        for giftees in classes.values():
+            count = count_assignments(
+                np.delete(rest, giftees[0], 1),
+                np.delete(groups, gifter),
+                ryser_limit=EXACT_LIMIT,
+                giftee_groups=np.delete(groups, giftees[0]),
+            )
+            expected[gifter, giftees] = count / total
+    return expected
+
+
+def draw(
+    index: CompatibilityIndex,
+    strategy: str,
+    seed,
+    ages: dict | None = None,
+    weights: dict[str, float] | None = None,
+    noise: float = 0.0,
+) -> np.ndarray | None:
+    """
+    Draws the giftee of each gifter with `strategy` and `seed` like
+    `SecretSanta.create_pairs` does, or returns None if the strategy fails.
+    `ages`, `weights` and `noise` are used by the `optimal` strategy.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = index.matrix
+    try:
+        if strategy == "uniform":
+            return np.asarray(sample_assignment(matrix, seed, groups=index.last_ids))
+        if strategy == "matching":
+            return np.asarray(find_matrix_assignment(matrix, rng))
+        if strategy == "optimal":
+            result = optimal_assignment(index, weights, ages, noise, rng)
+            return result.giftee_of
+        if strategy == "cycle":
+            return single_cycle(matrix, rng)
+        if strategy == "shuffle":
+            return shuffle_assignment(matrix, rng)
+    except (NoValidPairsError, NoSingleCycleError):
+        return None
+    raise ValueError(f"Unknown pairing strategy: {strategy}")
+
+
+def run_trials(
+    index: CompatibilityIndex,
+    strategy: str,
+    seed: int,
+    trials: range,
+    counts: np.ndarray,
+    cycle_lengths: np.ndarray,
+    failures: np.ndarray,
+    ages: dict | None = None,
+    weights: dict[str, float] | None = None,
+    noise: float = 0.0,
+) -> None:
+    """
+    Runs each trial in `trials` and adds its pairs and cycle lengths to the
+    `counts` and `cycle_lengths` arrays in place, or one to `failures[0]`.
+    Trial `t` is seeded with (`seed`, `t`) so the totals are the same for
+    any split of the trials between workers.
+    """
+    gifters = np.arange(len(index))
+    for trial in trials:
+        giftee_of = draw(index, strategy, [seed, trial], ages, weights, noise)
+        if giftee_of is None:
+            failures[0] += 1
+            continue
+        counts[gifters, giftee_of] += 1
+        labels, _ = cycle_labels(np.asarray(giftee_of))
+        np.add.at(cycle_lengths, np.bincount(labels), 1)
+
+
+def _shared_arrays(buffer, slots: int, size: int):
+    """
+    Gets the (counts, cycle lengths, failures) arrays of every worker slot
+    laid out one after another in the shared `buffer`.
+    """
+    counts = np.ndarray((slots, size, size), dtype=np.int64, buffer=buffer)
+    offset = counts.nbytes
+    cycle_lengths = np.ndarray(
+        (slots, size + 1), dtype=np.int64, buffer=buffer, offset=offset
+    )
+    offset += cycle_lengths.nbytes
+    failures = np.ndarray((slots, 1), dtype=np.int64, buffer=buffer, offset=offset)
+    return counts, cycle_lengths, failures
+
+
+def _start_worker(name, slots, index, strategy, options, next_slot) -> None:
+    """
+    Attaches a new worker process to the shared totals and gives it its own
+    slot in them so workers never write to the same memory.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    with next_slot.get_lock():
+        slot = next_slot.value
+        next_slot.value += 1
+    arrays = _shared_arrays(memory.buf, slots, len(index))
+    _worker.update(
+        memory=memory,
+        index=index,
+        strategy=strategy,
+        options=options,
+        arrays=[array[slot] for array in arrays],
+    )
+
+
+def _run_chunk(seed: int, start: int, stop: int) -> None:
+    run_trials(
+        _worker["index"],
+        _worker["strategy"],
+        seed,
+        range(start, stop),
+        *_worker["arrays"],
+        **_worker["options"],
+    )
+
+
+def analyze_fairness(
+    index: CompatibilityIndex,
+    strategy: str = "uniform",
+    trials: int = 10_000,
+    workers: int | None = None,
+    seed: int = 0,
+    ages: dict | None = None,
+    chunk: int = CHUNK,
+    weights: dict[str, float] | None = None,
+    noise: float = 0.0,
+) -> FairnessReport:
+    """
+    Runs `trials` seeded pairings of the roster of `index` with `strategy`
+    over `workers` processes and measures how far the pairs are from a
+    uniform draw, see `FairnessReport`.
+
+    Every worker adds its results straight into its own slot of arrays in
+    shared memory instead of sending them back, and the slots are summed at
+    the end. `workers` defaults to the number of CPUs and 1 runs in this
+    process. `ages`, `weights` and `noise` are used by the `optimal`
+    strategy, see `optimal_assignment`, and should match the settings the
+    pairs are really made with.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown pairing strategy: {strategy}")
+    size = len(index)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, math.ceil(trials / chunk)))
+    options = {"ages": ages, "weights": weights, "noise": noise}
+
+    if workers == 1:
+        counts = np.zeros((size, size), dtype=np.int64)
+        cycle_lengths = np.zeros(size + 1, dtype=np.int64)
+        failures = np.zeros(1, dtype=np.int64)
+        run_trials(
+            index,
+            strategy,
+            seed,
+            range(trials),
+            counts,
+            cycle_lengths,
+            failures,
+            **options,
+        )
+    else:
+        nbytes = 8 * workers * (size * size + size + 2)
+        memory = shared_memory.SharedMemory(create=True, size=nbytes)
+        arrays = _shared_arrays(memory.buf, workers, size)
+        try:
+            for array in arrays:
+                array.fill(0)
+            next_slot = multiprocessing.Value("i", 0)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_start_worker,
+                initargs=(memory.name, workers, index, strategy, options, next_slot),
+            ) as executor:
+                chunks = [
+                    executor.submit(_run_chunk, seed, start, min(start + chunk, trials))
+                    for start in range(0, trials, chunk)
+                ]
+                for future in chunks:
+                    future.result()
+            counts, cycle_lengths, failures = (array.sum(axis=0) for array in arrays)
+        finally:
+            # the views must go before the shared memory can be closed
+            del arrays
+            memory.close()
+            memory.unlink()
+
+    expected, baseline = uniform_frequencies(index.matrix, index.last_ids)
+    return FairnessReport(
+        strategy,
+        trials,
+        int(failures[0]),
+        counts,
+        cycle_lengths,
+        expected,
+        baseline,
+    )
@@ -0,0 +1,86 @@
+# standard library
+from pathlib import Path
+import sqlite3
+
+HISTORY = Path("history.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    gifter TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    giftee TEXT NOT NULL,
+    PRIMARY KEY (gifter, year)
+);
+CREATE INDEX IF NOT EXISTS assignments_year ON assignments (year);
+"""
+
+
+class GiftHistory:
+    """
+    Past Secret Santa assignments kept in a SQLite database on disk.
+
+    Each gifter has at most one giftee per year. Reads are done for a whole
+    run at once with `ages` so the pairing rules never query per pair.
+    """
+
+    def __init__(self, path: str | Path = HISTORY) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def record(self, year: int, pairs) -> None:
+        """
+        Saves the (gifter name, giftee name) `pairs` as the assignment for
+        `year`, replacing any earlier assignment for the same gifters.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO assignments (gifter, year, giftee) "
+                "VALUES (?, ?, ?)",
+                ((gifter, year, giftee) for gifter, giftee in pairs),
+            )
+
+    def replace(self, year: int, pairs) -> None:
+        """
+        Saves the (gifter name, giftee name) `pairs` as the whole assignment
+        for `year`, removing gifters who are not in `pairs`.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM assignments WHERE year = ?", (year,))
+            self.connection.executemany(
+                "INSERT INTO assignments (gifter, year, giftee) VALUES (?, ?, ?)",
+                ((gifter, year, giftee) for gifter, giftee in pairs),
+            )
+
+    def assignment(self, year: int) -> dict[str, str]:
+        """
+        Gets the giftee of each gifter in `year`.
+        """
+        rows = self.connection.execute(
+            "SELECT gifter, giftee FROM assignments WHERE year = ?", (year,)
+        )
+        return dict(rows)
+
+    def ages(self, year: int, years: int) -> dict[str, dict[str, int]]:
+        """
+        Gets how many years ago each gifter last gave to each of their
+        giftees in the `years` years before `year`.
+        """
+        rows = self.connection.execute(
+            "SELECT gifter, giftee, MAX(year) FROM assignments "
+            "WHERE year >= ? AND year < ? GROUP BY gifter, giftee",
+            (year - years, year),
+        )
+        ages = {}
+        for gifter, giftee, last_year in rows:
+            ages.setdefault(gifter, {})[giftee] = year - last_year
+        return ages
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "GiftHistory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,160 @@
+# standard library
+from pathlib import Path
+import csv, json
+
+# local imports
+from utils.person import Person
+
+FIELDS = (
+    "first",
+    "last",
+    "email",
+    "prev_giftee",
+    "wishlist",
+    "notes",
+    "branch",
+    "location",
+)
+REQUIRED = ("first", "last")
+# column names found in exported rosters for each field
+ALIASES = {
+    "first_name": "first",
+    "given_name": "first",
+    "last_name": "last",
+    "surname": "last",
+    "family_name": "last",
+    "email_address": "email",
+    "previous_giftee": "prev_giftee",
+    "last_giftee": "prev_giftee",
+    "wishlist_link": "wishlist",
+    "department": "branch",
+    "office": "location",
+    "site": "location",
+}
+
+
+class RowError(ValueError):
+    """
+    A roster row at `line` that could not be loaded.
+    """
+
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def normalize_column(name: str) -> str:
+    """
+    Turns a column name such as "First Name" into its field name.
+    """
+    name = name.strip().lower().replace(" ", "_").replace("-", "_")
+    return ALIASES.get(name, name)
+
+
+def make_person(line: int, data: dict) -> Person:
+    """
+    Creates a `Person` from the roster row `data` found at `line`.
+    """
+    if not isinstance(data, dict):
+        raise RowError(line, "expected an object with the entry's fields")
+    missing = [field for field in REQUIRED if not data.get(field)]
+    if missing:
+        raise RowError(line, f"missing {', '.join(missing)}")
+    return Person(data)
+
+
+def _rows(rows, errors: list | None):
+    """
+    Yields a `Person` for each (line, data) in `rows`, where `data` may be a
+    `RowError` for a row that could not be parsed.
+    Bad rows raise `RowError` or are skipped and added to `errors` if given.
+    """
+    for line, data in rows:
+        try:
+            if isinstance(data, RowError):
+                raise data
+            yield make_person(line, data)
+        except RowError as error:
+            if errors is None:
+                raise
+            errors.append(error)
+
+
+def read_jsonl(source, errors: list | None = None):
+    """
+    Yields a `Person` for each line of a JSON Lines roster at the path or
+    open text stream `source`, reading one line at a time.
+    """
+    if not hasattr(source, "read"):
+        with open(source, encoding="utf-8") as file:
+            yield from read_jsonl(file, errors)
+        return
+
+    def rows():
+        for line, text in enumerate(source, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as error:
+                yield line, RowError(line, f"invalid JSON ({error.msg})")
+
+    yield from _rows(rows(), errors)
+
+
+def read_csv(source, errors: list | None = None):
+    """
+    Yields a `Person` for each row of a CSV roster at the path or open text
+    stream `source`, reading one row at a time.
+    Column names are matched to fields ignoring case, spaces and common
+    export names such as "First Name" or "Email Address".
+    """
+    if not hasattr(source, "read"):
+        with open(source, encoding="utf-8-sig", newline="") as file:
+            yield from read_csv(file, errors)
+        return
+
+    reader = csv.reader(source)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [
+        (position, field)
+        for position, field in enumerate(map(normalize_column, header))
+        if field in FIELDS
+    ]
+
+    def rows():
+        for row in reader:
+            if not any(row):
+                continue
+            data = {
+                field: row[position].strip()
+                for position, field in columns
+                if position < len(row) and row[position].strip()
+            }
+            yield reader.line_num, data
+
+    yield from _rows(rows(), errors)
+
+
+def read_roster(path: str | Path, errors: list | None = None):
+    """
+    Yields a `Person` for each entry of the CSV, JSON Lines or JSON roster at
+    `path`, picking the format from its extension.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return read_csv(path, errors)
+    if suffix in (".jsonl", ".ndjson"):
+        return read_jsonl(path, errors)
+    if suffix == ".json":
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            data = data.get("entries", [])
+        rows = enumerate(data, start=1)
+        return _rows(rows, errors)
+    raise ValueError(f"Unknown roster format: {path.name}")
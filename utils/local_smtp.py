@@ -0,0 +1,149 @@
+# standard library
+import socketserver, threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Handles one SMTP client connection for `LocalSMTPServer`.
+    """
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server = self.server.owner
+        server.track(self.connection)
+        self.reply("220 localhost ESMTP")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "AUTH":
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip("<> "), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command[8:].strip("<> ")
+                code = server.next_failure(recipient)
+                if code:
+                    self.reply(f"{code} Failed for {recipient}")
+                    continue
+                recipients.append(recipient)
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self.read_data()
+                with server.lock:
+                    server.messages.append((sender, recipients, data))
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                break
+            else:
+                self.reply("502 Command not implemented")
+
+    def read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b".\r\n":
+                break
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+        return b"".join(lines)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPServer:
+    """
+    Minimal SMTP server on localhost for tests and benchmarks.
+
+    Accepts any login and keeps every message in `messages` as
+    (sender, recipients, data) tuples. Use it with `Email(use_ssl=False)`.
+    Failures can be set up per recipient with `fail_recipient`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.messages = []
+        self.logins = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.failures = {}
+        self._sockets = []
+        self._server = _ThreadingServer((host, port), _SMTPHandler)
+        self._server.owner = self
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def track(self, connection) -> None:
+        with self.lock:
+            self.connections += 1
+            self._sockets.append(connection)
+
+    def fail_recipient(self, recipient: str, code: int, times: int = 1) -> None:
+        """
+        Rejects the next `times` messages to `recipient` with the reply `code`.
+        """
+        with self.lock:
+            self.failures.setdefault(recipient, []).extend([code] * times)
+
+    def next_failure(self, recipient: str) -> int | None:
+        with self.lock:
+            codes = self.failures.get(recipient)
+            return codes.pop(0) if codes else None
+
+    def disconnect_all(self) -> None:
+        """
+        Drops every open client connection like a server timeout would.
+        """
+        with self.lock:
+            sockets, self._sockets = self._sockets, []
+        for connection in sockets:
+            try:
+                connection.shutdown(2)
+            except OSError:
+                pass
+
+    def start(self) -> "LocalSMTPServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.disconnect_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "LocalSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
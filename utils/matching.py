@@ -0,0 +1,98 @@
+# third-party imports
+import numpy as np
+
+
+class NoValidPairsError(Exception):
+    """
+    Raised when no full set of valid pairs exists.
+
+    `gifters` holds the indexes of the gifters that block a full set of pairs
+    and `giftees` holds the only giftees they can be paired with. There are
+    always fewer `giftees` than `gifters`, which proves no full set exists.
+    """
+
+    def __init__(self, gifters: list[int], giftees: list[int]) -> None:
+        self.gifters = gifters
+        self.giftees = giftees
+        super().__init__(
+            f"{len(gifters)} gifters can only be paired with "
+            f"{len(giftees)} giftees."
+        )
+
+
+def find_matrix_assignment(
+    matrix: np.ndarray,
+    rng: np.random.Generator | None = None,
+) -> list[int]:
+    """
+    Finds a giftee for every gifter from the boolean `matrix` of valid pairs.
+
+    Gifters first take a random free valid giftee in a random order, then any
+    gifter left over is matched with a breadth first augmenting path search that
+    runs over whole matrix rows at once. This avoids building adjacency lists so
+    it stays fast for rosters of several thousand people.
+
+    Raises `NoValidPairsError` when no full set of pairs exists.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    size = len(matrix)
+    giftee_of = np.full(size, -1)
+    gifter_of = np.full(size, -1)
+    free_giftees = np.ones(size, dtype=bool)
+    for gifter in rng.permutation(size).tolist():
+        candidates = np.flatnonzero(matrix[gifter] & free_giftees)
+        if len(candidates):
+            giftee = candidates[rng.integers(len(candidates))]
+            giftee_of[gifter] = giftee
+            gifter_of[giftee] = gifter
+            free_giftees[giftee] = False
+
+    for root in np.flatnonzero(giftee_of == -1).tolist():
+        augment(matrix, giftee_of, gifter_of, root)
+    return giftee_of.tolist()
+
+
+def augment(
+    matrix: np.ndarray,
+    giftee_of: np.ndarray,
+    gifter_of: np.ndarray,
+    root: int,
+) -> int:
+    """
+    Gives the unpaired gifter `root` a giftee along the shortest augmenting
+    path in the boolean `matrix`, updating `giftee_of` and `gifter_of` in
+    place where -1 means unpaired. Every gifter on the path before the last
+    one moves to a new giftee, so the shortest path changes the fewest pairs.
+
+    The breadth first search runs over whole matrix rows at once.
+    Returns the number of gifters already paired that moved.
+    Raises `NoValidPairsError` when `root` cannot be given a giftee.
+    """
+    size = len(matrix)
+    parent = np.full(size, -1)
+    visited = np.zeros(size, dtype=bool)
+    frontier = np.array([root])
+    while True:
+        reach = matrix[frontier]
+        found = np.flatnonzero(reach.any(axis=0) & ~visited)
+        if not len(found):
+            gifters = [root] + gifter_of[visited].tolist()
+            raise NoValidPairsError(sorted(gifters), np.flatnonzero(visited).tolist())
+        parent[found] = frontier[reach[:, found].argmax(axis=0)]
+        visited[found] = True
+        free = found[gifter_of[found] == -1]
+        if len(free):
+            break
+        frontier = gifter_of[found]
+    # flip the matched pairs along the path back to the root
+    giftee = free[0]
+    moved = 0
+    while True:
+        gifter = parent[giftee]
+        previous = giftee_of[gifter]
+        giftee_of[gifter] = giftee
+        gifter_of[giftee] = gifter
+        if gifter == root:
+            return moved
+        moved += 1
+        giftee = previous
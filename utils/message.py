@@ -0,0 +1,125 @@
+# standard library
+from email.message import Message
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.policy import compat32
+from pathlib import Path
+import base64, uuid
+
+BANNER = Path("images/secret-santa-banner.jpg")
+BANNER_CID = "secret-santa-banner"
+# the default policy with the CRLF line endings SMTP needs
+SMTP = compat32.clone(linesep="\r\n")
+
+
+def plain_text(data: dict) -> str:
+    """
+    Creates the plain text version of the card from the card template `data`.
+    """
+    lines = [
+        f"Hello {data['gifter_name']},",
+        "",
+        f"Exciting news! You are the Secret Santa for: {data['giftee_name']}",
+    ]
+    if data.get("notes"):
+        lines += ["", f"{data['giftee_name']} left you the following notes:"]
+        lines += [data["notes"]]
+    if data.get("wishlist"):
+        lines += ["", f"Wishlist: {data['wishlist']}"]
+        if data.get("wishlist_title"):
+            lines += [data["wishlist_title"]]
+    lines += [
+        "",
+        "Gift Price should be limited to $100 or less.",
+        "",
+        "Wishing you a wonderful holiday season!",
+        "Your Secret Santa Organizer",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+class MessageBuilder:
+    """
+    Builds Secret Santa emails with an html card, a plain text alternative and
+    the banner image embedded inline.
+
+    The banner is read, base64 encoded and serialized once and those bytes
+    are joined into every message instead of being serialized again.
+    """
+
+    def __init__(self, sender: str, banner: Path | None = BANNER) -> None:
+        self.sender = sender
+        self.banner = Path(banner) if banner else None
+        self.boundary = f"==============={uuid.uuid4().hex}=="
+        self._banner_part = None
+        self._banner_bytes = None
+
+    @property
+    def banner_src(self) -> str | None:
+        """
+        Image source for the banner in the card template, if there is a banner.
+        """
+        if self.banner and self.banner.exists():
+            return f"cid:{BANNER_CID}"
+        return None
+
+    @property
+    def banner_part(self) -> MIMEBase | None:
+        """
+        The encoded inline banner part shared by every message.
+        """
+        if self._banner_part is None and self.banner_src:
+            encoded = base64.encodebytes(self.banner.read_bytes()).decode("ascii")
+            part = MIMEBase("image", "jpeg")
+            part.set_payload(encoded)
+            part["Content-Transfer-Encoding"] = "base64"
+            part["Content-ID"] = f"<{BANNER_CID}>"
+            part["Content-Disposition"] = f'inline; filename="{self.banner.name}"'
+            self._banner_part = part
+            self._banner_bytes = part.as_bytes(policy=SMTP)
+        return self._banner_part
+
+    def build(
+        self,
+        to_email: str,
+        subject: str,
+        html: str,
+        text: str,
+        sender: str | None = None,
+    ) -> bytes:
+        """
+        Builds the email to `to_email` and serializes it for `sendmail`.
+        It is from `sender` if it is given instead of the default sender.
+        """
+        sender = sender or self.sender
+        alternative = MIMEMultipart("alternative")
+        alternative.attach(MIMEText(text, "plain"))
+        alternative.attach(MIMEText(html, "html"))
+        if self.banner_part is None:
+            alternative["From"] = sender
+            alternative["To"] = to_email
+            alternative["Subject"] = subject
+            return alternative.as_bytes(policy=SMTP)
+
+        del alternative["MIME-Version"]
+        headers = Message()
+        headers["From"] = sender
+        headers["To"] = to_email
+        headers["Subject"] = subject
+        headers["MIME-Version"] = "1.0"
+        # serialized without a body, then the blank line is replaced
+        head = headers.as_bytes(policy=SMTP)[:-2]
+        content_type = f'Content-Type: multipart/related; boundary="{self.boundary}"'
+        delimiter = f"\r\n--{self.boundary}\r\n".encode()
+        return b"".join(
+            [
+                head,
+                f"{content_type}\r\n\r\n".encode(),
+                delimiter[2:],
+                alternative.as_bytes(policy=SMTP),
+                delimiter,
+                self._banner_bytes,
+                f"\r\n--{self.boundary}--\r\n".encode(),
+            ]
+        )
@@ -0,0 +1,149 @@
+# standard library
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import json, re, threading, time
+
+PREFIX = "secret_santa"
+# shared by every span while metrics are off so nothing is created per call
+_NO_SPAN = nullcontext()
+
+
+class Timing:
+    """
+    Count, total, fastest and slowest of the durations recorded for a span.
+    """
+
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """
+    Timing spans and counters for the phases of a run. Safe to use from
+    many threads.
+
+    Everything is skipped while `enabled` is False: `span` hands back one
+    shared empty context manager and `count` returns straight away.
+    """
+
+    def __init__(self, enabled: bool = False, clock=time.perf_counter) -> None:
+        self.enabled = enabled
+        self.clock = clock
+        self.timings = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def span(self, name: str):
+        """
+        Times the `with` block as one run of the span `name`.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, self.clock() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Adds a run of the span `name` that took `seconds`.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Adds `value` to the counter `name`.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "spans": {name: t.to_dict() for name, t in self.timings.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Formats the metrics in the Prometheus text format. Spans are
+        summaries in seconds and counters are totals.
+        """
+        data = self.to_dict()
+        lines = []
+        for name, timing in sorted(data["spans"].items()):
+            metric = f"{PREFIX}_{metric_name(name)}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count {timing['count']}")
+            lines.append(f"{metric}_sum {timing['total']!r}")
+        for name, value in sorted(data["counters"].items()):
+            metric = f"{PREFIX}_{metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path) -> None:
+        """
+        Writes the metrics to `path` in the Prometheus text format if it ends
+        in `.prom` and as JSON otherwise.
+        """
+        path = Path(path)
+        if path.suffix == ".prom":
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_dict(), indent=2) + "\n"
+        path.write_text(text, encoding="utf-8")
+
+
+def metric_name(name: str) -> str:
+    """
+    Turns a span or counter name like `smtp.connect` into a valid
+    Prometheus metric name like `smtp_connect`.
+    """
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+# the metrics every module records to, off until a run turns them on
+METRICS = Metrics()
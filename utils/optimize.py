@@ -0,0 +1,188 @@
+# third-party imports
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# local imports
+from utils.compatibility import CompatibilityIndex
+from utils.matching import find_matrix_assignment
+
+RECENT = "recent"
+SAME_BRANCH = "same_branch"
+LOCATION_BALANCE = "location_balance"
+WEIGHTS = {RECENT: 10.0, SAME_BRANCH: 1.0, LOCATION_BALANCE: 1.0}
+# how many times the location flows are checked and the pairs solved again
+BALANCE_ROUNDS = 3
+# location flows within this fraction of their share are balanced
+BALANCE_TOLERANCE = 0.1
+
+
+class OptimalAssignment:
+    """
+    The cheapest valid assignment found for a cost matrix built from weighted
+    soft rules.
+
+    `giftee_of[gifter]` holds the giftee row of each gifter. `breakdown` holds
+    the weighted cost of each rule for the chosen pairs and `total` is their
+    sum, without the random `noise` that was added while solving.
+    """
+
+    def __init__(
+        self,
+        giftee_of: np.ndarray,
+        breakdown: dict[str, float],
+        noise: float = 0.0,
+    ) -> None:
+        self.giftee_of = giftee_of
+        self.breakdown = breakdown
+        self.noise = noise
+
+    @property
+    def total(self) -> float:
+        return sum(self.breakdown.values())
+
+    def __repr__(self) -> str:
+        return f"OptimalAssignment(total={self.total}, breakdown={self.breakdown})"
+
+
+def recent_costs(index: CompatibilityIndex, ages: dict) -> np.ndarray:
+    """
+    Gets the cost of each pair for how recently the gifter last gave to the
+    giftee, from `ages` of gifter name to giftee name to years ago.
+    Last year costs 1, two years ago costs 1/2 and so on.
+    """
+    roster = index.roster
+    names = roster.names
+    costs = np.zeros((len(roster), len(names)), dtype=np.float32)
+    for row, gifter in enumerate(roster.full_names):
+        for giftee, age in ages.get(gifter, {}).items():
+            if giftee in names:
+                costs[row, names[giftee]] = 1 / max(age, 1)
+    return costs[:, roster.name_ids]
+
+
+def same_group_costs(ids: np.ndarray) -> np.ndarray:
+    """
+    Gets a cost of 1 for each pair in the same group of `ids`, where -1 is
+    no group and never matches.
+    """
+    same = ids[:, None] == ids[None, :]
+    same &= ids[:, None] >= 0
+    return same.astype(np.float32)
+
+
+def location_flows(location_ids: np.ndarray, giftee_of: np.ndarray):
+    """
+    Gets the (flows, targets) of gifts between locations for `giftee_of`.
+
+    `flows[a, b]` counts the pairs from location a to location b and
+    `targets[a, b]` is that count with even mixing, size(a) * size(b) / N.
+    People without a location, -1 in `location_ids`, are left out.
+    """
+    known = location_ids >= 0
+    count = int(location_ids.max()) + 1
+    sizes = np.bincount(location_ids[known], minlength=count)
+    targets = np.outer(sizes, sizes) / known.sum()
+    gifters = np.flatnonzero(known & (location_ids[giftee_of] >= 0))
+    flows = np.zeros((count, count))
+    np.add.at(flows, (location_ids[gifters], location_ids[giftee_of[gifters]]), 1)
+    return flows, targets
+
+
+def solve(costs: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Solves the min-cost assignment for `costs` and returns the giftee of each
+    gifter. Rows and columns are shuffled first so ties are broken at random.
+    """
+    rows = rng.permutation(len(costs))
+    columns = rng.permutation(len(costs))
+    _, picked = linear_sum_assignment(costs[np.ix_(rows, columns)])
+    giftee_of = np.empty(len(costs), dtype=np.int32)
+    giftee_of[rows] = columns[picked]
+    return giftee_of
+
+
+def optimal_assignment(
+    index: CompatibilityIndex,
+    weights: dict[str, float] | None = None,
+    ages: dict | None = None,
+    noise: float = 0.0,
+    rng: np.random.Generator | None = None,
+    rounds: int = BALANCE_ROUNDS,
+) -> OptimalAssignment:
+    """
+    Finds the valid assignment with the lowest total cost of the soft rules
+    using min-cost bipartite matching.
+
+    Each rule gives every pair a cost that is multiplied by its entry in
+    `weights`, which defaults to `WEIGHTS`:
+    - `recent` costs 1 / years ago for giftees the gifter had, see `ages`
+    - `same_branch` costs 1 for pairs in the same branch
+    - `location_balance` costs 1 for each pair over an even share of gifts
+      between two locations. It depends on every pair at once so the flows
+      are priced and the pairs solved again up to `rounds` times.
+
+    Ties are broken at random with `rng` and uniform noise up to `noise` is
+    added to each cost so nearly equal answers are picked at random too.
+    Invalid pairs in `index` are never used.
+    Raises `NoValidPairsError` when no full set of valid pairs exists.
+    """
+    weights = WEIGHTS if weights is None else weights
+    rng = rng if rng is not None else np.random.default_rng()
+    roster = index.roster
+    matrix = index.matrix
+    # reports who blocks a full set before any cost is built
+    find_matrix_assignment(matrix, rng)
+
+    rules = {}
+    if weights.get(RECENT) and ages:
+        rules[RECENT] = recent_costs(index, ages)
+    if weights.get(SAME_BRANCH):
+        rules[SAME_BRANCH] = same_group_costs(roster.branch_ids)
+
+    costs = np.zeros(matrix.shape)
+    for rule, rule_costs in rules.items():
+        costs += weights[rule] * rule_costs
+    if noise:
+        costs += rng.uniform(0, noise, size=matrix.shape)
+    costs[~matrix] = np.inf
+    giftee_of = solve(costs, rng)
+
+    location_ids = roster.location_ids
+    balance = bool(weights.get(LOCATION_BALANCE)) and bool((location_ids >= 0).any())
+    gifters = np.arange(len(matrix))
+
+    def breakdown_of(giftee_of: np.ndarray) -> dict[str, float]:
+        breakdown = {
+            rule: float(weights[rule] * rule_costs[gifters, giftee_of].sum())
+            for rule, rule_costs in rules.items()
+        }
+        if balance:
+            flows, targets = location_flows(location_ids, giftee_of)
+            excess = np.maximum(flows - targets, 0).sum()
+            breakdown[LOCATION_BALANCE] = float(weights[LOCATION_BALANCE] * excess)
+        return breakdown
+
+    breakdown = breakdown_of(giftee_of)
+    if balance:
+        # prices on each flow between locations are raised while it is over
+        # its share and lowered while it is under, in smaller steps each round
+        known = location_ids >= 0
+        ids = location_ids[known]
+        prices = np.zeros((int(location_ids.max()) + 1,) * 2)
+        attempt = giftee_of
+        for step in range(1, rounds + 1):
+            flows, targets = location_flows(location_ids, attempt)
+            over = (flows - targets) / np.maximum(targets, 1)
+            if np.abs(over).max() <= BALANCE_TOLERANCE:
+                break
+            prices += weights[LOCATION_BALANCE] * over / step
+            priced = costs.copy()
+            # coarse prices keep the assignment problem quick to solve
+            coarse = np.round(prices, 1)
+            priced[np.ix_(known, known)] += coarse[ids[:, None], ids[None, :]]
+            attempt = solve(priced, rng)
+            attempt_breakdown = breakdown_of(attempt)
+            # the prices only guide the search so the true costs pick the answer
+            if sum(attempt_breakdown.values()) < sum(breakdown.values()):
+                giftee_of, breakdown = attempt, attempt_breakdown
+    return OptimalAssignment(giftee_of, breakdown, noise)
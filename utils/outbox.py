@@ -0,0 +1,203 @@
+# standard library
+from pathlib import Path
+import datetime as dt
+import json, os, threading, uuid
+
+# local imports
+from utils.metrics import METRICS
+
+OUTBOX = Path("outbox.jsonl")
+# records written between each fsync while sending
+SYNC_EVERY = 64
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class Outbox:
+    """
+    Append-only JSON Lines journal of the cards for a send run and whether
+    each one was delivered.
+
+    `seal` writes the whole assignment and syncs it to disk before anything is
+    sent. Delivery results are then appended with `mark` and synced in batches
+    of `sync_every` records, so a crash loses at most one batch of results and
+    those recipients are only sent again. Safe to use from many threads.
+    """
+
+    def __init__(self, path: str | Path = OUTBOX, sync_every: int = SYNC_EVERY) -> None:
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.run = None
+        self.lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+
+    def open(self) -> "Outbox":
+        if self._file is None:
+            self.repair()
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def repair(self) -> None:
+        """
+        Cuts off a partly written last line left by a crash so the next record
+        starts on its own line instead of being glued onto it and lost.
+        """
+        try:
+            file = open(self.path, "r+b")
+        except FileNotFoundError:
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                file.seek(start)
+                chunk = file.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                METRICS.count("outbox.torn_bytes", end - position)
+                file.truncate(position)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def write(self, record: dict, sync: bool = False) -> None:
+        """
+        Appends `record` and syncs the file if `sync` or the batch is full.
+        """
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.open()
+            self._file.write(line)
+            self._unsynced += 1
+            if sync or self._unsynced >= self.sync_every:
+                self._sync()
+
+    def _sync(self) -> None:
+        with METRICS.span("outbox.sync"):
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self) -> None:
+        with self.lock:
+            if self._file is not None and self._unsynced:
+                self._sync()
+
+    def seal(self, cards: list[dict], **details) -> str:
+        """
+        Starts a new run with every card in `cards` and syncs it to disk.
+        Each card needs a unique `recipient`. `details` are kept with the run.
+        Returns the id of the run.
+        """
+        self.run = uuid.uuid4().hex
+        created = dt.datetime.now(dt.timezone.utc).isoformat()
+        self.write({"type": "run", "run": self.run, "created": created, **details})
+        for card in cards:
+            self.write({"type": "card", "run": self.run, **card})
+        self.sync()
+        return self.run
+
+    def resume(self, run: str) -> None:
+        """
+        Appends later results to the existing `run`.
+        """
+        self.run = run
+
+    def mark(self, recipient: str, error: Exception | None = None) -> None:
+        """
+        Records that the card for `recipient` was sent, or failed with `error`.
+        """
+        record = {"type": SENT, "run": self.run, "recipient": recipient}
+        if error is not None:
+            record.update(type=FAILED, error=str(error))
+        self.write(record)
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                if self._unsynced:
+                    self._sync()
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "Outbox":
+        # the file is opened by the first write
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class OutboxState:
+    """
+    The cards of one run read back from an outbox and the latest delivery
+    status of each recipient.
+    """
+
+    def __init__(self, run: str | None = None, details: dict | None = None) -> None:
+        self.run = run
+        self.details = details or {}
+        self.cards = {}
+        self.status = {}
+        self.errors = {}
+
+    def pending(self) -> list[dict]:
+        """
+        Gets the cards that have not been delivered, in the order they were sealed.
+        """
+        return [
+            card
+            for recipient, card in self.cards.items()
+            if self.status[recipient] != SENT
+        ]
+
+    def counts(self) -> dict[str, int]:
+        counts = {PENDING: 0, SENT: 0, FAILED: 0}
+        for status in self.status.values():
+            counts[status] += 1
+        return counts
+
+
+def read_outbox(path: str | Path = OUTBOX, run: str | None = None) -> OutboxState:
+    """
+    Reads the last run in the outbox at `path`, or the run with the id `run`.
+
+    The file is read one line at a time and each record is applied with a
+    dict lookup. A partly written last line from a crash is ignored.
+    """
+    state = OutboxState()
+    path = Path(path)
+    if not path.exists():
+        return state
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            kind = record.pop("type")
+            record_run = record.pop("run")
+            if kind == "run":
+                if run is None or record_run == run:
+                    state = OutboxState(record_run, record)
+                continue
+            if record_run != state.run:
+                continue
+            recipient = record["recipient"]
+            if kind == "card":
+                state.cards[recipient] = record
+                state.status[recipient] = PENDING
+            elif recipient in state.status:
+                state.status[recipient] = kind
+                if kind == FAILED:
+                    state.errors[recipient] = record.get("error")
+                else:
+                    state.errors.pop(recipient, None)
+    return state
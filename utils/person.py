@@ -0,0 +1,34 @@
+class Person:
+    # slots keep large rosters small as there is no dict for each person
+    __slots__ = (
+        "first_name",
+        "last_name",
+        "email",
+        "prev_giftee",
+        "wishlist",
+        "notes",
+        "branch",
+        "location",
+    )
+
+    def __init__(self, data: dict) -> None:
+        self.first_name = data.get("first", None)
+        self.last_name = data.get("last", None)
+        self.email = data.get("email", None)
+        self.prev_giftee = data.get("prev_giftee", None)
+        self.wishlist = data.get("wishlist", None)
+        self.notes = data.get("notes", None)
+        # optional groups used by the soft rules of the optimal strategy
+        self.branch = data.get("branch", None)
+        self.location = data.get("location", None)
+
+    def __repr__(self) -> str:
+        return (
+            f"Person(\nfirst_name={self.first_name}, last_name={self.last_name}, "
+            f"email={self.email}, prev_giftee={self.prev_giftee}, "
+            f"wishlist={self.wishlist}, notes={self.notes})"
+        )
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.first_name} {self.last_name}"
@@ -0,0 +1,154 @@
+# standard library
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+# local imports
+from utils.email import EMAIL_REGEX
+
+if TYPE_CHECKING:
+    from utils.compatibility import CompatibilityIndex
+    from utils.loaders import RowError
+    from utils.person import Person
+
+UNREADABLE_ROW = "unreadable_row"
+INVALID_EMAIL = "invalid_email"
+DUPLICATE_EMAIL = "duplicate_email"
+DUPLICATE_NAME = "duplicate_name"
+UNKNOWN_PREV_GIFTEE = "unknown_prev_giftee"
+NO_GIFTEES = "no_giftees"
+NO_GIFTERS = "no_gifters"
+
+DESCRIPTIONS = {
+    UNREADABLE_ROW: "Unreadable row",
+    INVALID_EMAIL: "Invalid email",
+    DUPLICATE_EMAIL: "Duplicate email",
+    DUPLICATE_NAME: "Duplicate name",
+    UNKNOWN_PREV_GIFTEE: "Unknown previous giftee",
+    NO_GIFTEES: "No compatible giftees",
+    NO_GIFTERS: "No compatible gifters",
+}
+
+
+class Problem:
+    """
+    A single problem with the entry at `row` of a roster, or with the line
+    `row` of the roster file for a row that could not be read.
+    """
+
+    def __init__(self, kind: str, row: int, name: str, detail: str = "") -> None:
+        self.kind = kind
+        self.row = row
+        self.name = name
+        self.detail = detail
+
+    def __repr__(self) -> str:
+        return (
+            f"Problem(kind={self.kind!r}, row={self.row}, "
+            f"name={self.name!r}, detail={self.detail!r})"
+        )
+
+    def __str__(self) -> str:
+        message = f"{DESCRIPTIONS[self.kind]} for {self.name}"
+        return f"{message}: {self.detail}" if self.detail else message
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "row": self.row,
+            "name": self.name,
+            "detail": self.detail,
+        }
+
+
+class PreflightReport:
+    """
+    Every problem found in a roster, in roster order for each kind.
+    """
+
+    def __init__(self, size: int, problems: list[Problem] | None = None) -> None:
+        self.size = size
+        self.problems = problems or []
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def by_kind(self) -> dict[str, list[Problem]]:
+        """
+        Groups the problems by their kind.
+        """
+        groups = {}
+        for problem in self.problems:
+            groups.setdefault(problem.kind, []).append(problem)
+        return groups
+
+    def counts(self) -> dict[str, int]:
+        return {kind: len(problems) for kind, problems in self.by_kind().items()}
+
+    def to_dict(self) -> dict:
+        return {
+            "entries": self.size,
+            "ok": self.ok,
+            "counts": self.counts(),
+            "problems": [problem.to_dict() for problem in self.problems],
+        }
+
+
+def preflight(
+    entries: list[Person],
+    index: CompatibilityIndex | None = None,
+    row_errors: list[RowError] | None = None,
+) -> PreflightReport:
+    """
+    Checks `entries` for every problem that would stop a Secret Santa from
+    being sent and reports them all at once, along with the `row_errors` of
+    the roster rows that could not be loaded into `entries`.
+
+    Names and emails are indexed in a single pass over `entries` so large
+    rosters are checked in linear time. People without any compatible giftees
+    or gifters are found from `index`, which is built if it is not given.
+    """
+    problems = [
+        Problem(UNREADABLE_ROW, error.line, f"Line {error.line}", error.message)
+        for error in row_errors or []
+    ]
+    rows_by_name = {}
+    rows_by_email = {}
+    for row, entry in enumerate(entries):
+        name = entry.full_name
+        rows_by_name.setdefault(name, []).append(row)
+        if not entry.email or not EMAIL_REGEX.fullmatch(entry.email):
+            detail = entry.email or "missing"
+            problems.append(Problem(INVALID_EMAIL, row, name, detail))
+        else:
+            rows_by_email.setdefault(entry.email.lower(), []).append(row)
+
+    for email, rows in rows_by_email.items():
+        if len(rows) > 1:
+            for row in rows:
+                detail = f"{email} is used by {len(rows)} entries"
+                problems.append(
+                    Problem(DUPLICATE_EMAIL, row, entries[row].full_name, detail)
+                )
+    for name, rows in rows_by_name.items():
+        if len(rows) > 1:
+            for row in rows:
+                detail = f"{len(rows)} entries share this name"
+                problems.append(Problem(DUPLICATE_NAME, row, name, detail))
+    for row, entry in enumerate(entries):
+        if entry.prev_giftee and entry.prev_giftee not in rows_by_name:
+            detail = f"{entry.prev_giftee} is not in the roster"
+            problems.append(Problem(UNKNOWN_PREV_GIFTEE, row, entry.full_name, detail))
+
+    if len(entries) > 1:
+        if index is None:
+            from utils.compatibility import CompatibilityIndex
+
+            index = CompatibilityIndex(entries)
+        for kind, counts in (
+            (NO_GIFTEES, index.giftee_counts()),
+            (NO_GIFTERS, index.gifter_counts()),
+        ):
+            for row in (counts == 0).nonzero()[0].tolist():
+                problems.append(Problem(kind, row, entries[row].full_name))
+    return PreflightReport(len(entries), problems)
@@ -0,0 +1,109 @@
+# standard library
+from pathlib import Path
+import re
+
+# third-party imports
+from jinja2 import Environment
+
+# local imports
+from utils.metrics import METRICS
+
+TEMPLATE = Path("christmas_card_template.html")
+START_TAG = re.compile(r"\{[{%#]")
+END_TAG = re.compile(r"[}%#]\}")
+
+
+def card_context(gifter, giftee, link=None) -> dict:
+    """
+    Gets the template data for the card sent to `gifter`.
+    The title and preview of the giftee's wishlist are added from `link`, a
+    checked `WishlistLink`, if it is given.
+    """
+    context = {
+        "gifter_name": gifter.full_name,
+        "giftee_name": giftee.full_name,
+        "notes": giftee.notes,
+        "wishlist": giftee.wishlist,
+    }
+    if link is not None:
+        context.update(link.context())
+    return context
+
+
+class CardRenderer:
+    """
+    Renders the Christmas card template for many recipients.
+
+    The template is compiled once and only compiled again when the file's
+    modified time changes. Text before the first and after the last template
+    tag, such as the inline CSS, never changes so it is kept as plain strings
+    and joined around the compiled part instead of going through Jinja2.
+    """
+
+    def __init__(self, path: Path = TEMPLATE) -> None:
+        self.path = Path(path)
+        self.environment = Environment()
+        self.mtime = None
+        self.prefix = ""
+        self.suffix = ""
+        self.template = None
+
+    def load(self) -> None:
+        """
+        Compiles the template if it is new or has changed on disk.
+        """
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self.mtime:
+            return
+        source = self.path.read_text()
+        self.prefix, middle, self.suffix = self.split(source)
+        self.template = self.environment.from_string(middle)
+        self.mtime = mtime
+
+    @staticmethod
+    def split(source: str) -> tuple[str, str, str]:
+        """
+        Splits template `source` into its static prefix, dynamic middle and
+        static suffix, matching how Jinja2 would render the static parts.
+        """
+        # Jinja2 normalizes newlines and drops one trailing newline
+        source = source.replace("\r\n", "\n").replace("\r", "\n")
+        if source.endswith("\n"):
+            source = source[:-1]
+        start = START_TAG.search(source)
+        if not start:
+            return source, "", ""
+        end = None
+        for end in END_TAG.finditer(source):
+            pass
+        if end is None or end.end() <= start.start():
+            return "", source, ""
+        prefix = source[: start.start()]
+        middle = source[start.start() : end.end()]
+        suffix = source[end.end() :]
+        # whitespace control on the outer tags strips the static parts
+        if middle[2:3] == "-":
+            prefix = prefix.rstrip()
+        if middle[-3:-2] == "-":
+            suffix = suffix.lstrip()
+        return prefix, middle, suffix
+
+    def render(self, data: dict) -> str:
+        """
+        Renders the card with the given `data`.
+        """
+        self.load()
+        with METRICS.span("render"):
+            return self.prefix + self.template.render(data) + self.suffix
+
+    def render_many(self, contexts):
+        """
+        Yields the card html for each of the template data dicts `contexts`.
+        The template is checked for changes once for the whole batch.
+        """
+        self.load()
+        prefix, suffix, template = self.prefix, self.suffix, self.template
+        for data in contexts:
+            with METRICS.span("render"):
+                html = prefix + template.render(data) + suffix
+            yield html
@@ -0,0 +1,97 @@
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.compatibility import CompatibilityIndex
+from utils.matching import augment
+from utils.roster import Pairing
+
+
+class Repair:
+    """
+    A full set of pairs repaired after the roster changed.
+
+    `changed` holds the ids of the gifters in `pairing` whose giftee is new to
+    them, including people who joined, so only they need to be told again.
+    `kept` counts the earlier pairs that are unchanged and `dropped` lists the
+    names of earlier gifters who are no longer in the roster.
+    """
+
+    def __init__(
+        self,
+        pairing: Pairing,
+        changed: list[int],
+        kept: int,
+        dropped: list[str],
+    ) -> None:
+        self.pairing = pairing
+        self.changed = changed
+        self.kept = kept
+        self.dropped = dropped
+
+    def __repr__(self) -> str:
+        return (
+            f"Repair(changed={len(self.changed)}, kept={self.kept}, "
+            f"dropped={len(self.dropped)})"
+        )
+
+    def changed_pairs(self) -> list:
+        """
+        Gets the (gifter, giftee) pairs of the gifters that must be told again.
+        """
+        return [self.pairing.pair(gifter) for gifter in self.changed]
+
+
+def repair_assignment(
+    matrix: np.ndarray,
+    giftee_of: np.ndarray,
+) -> tuple[np.ndarray, list[int]]:
+    """
+    Completes the partial assignment `giftee_of`, where -1 means a gifter has
+    no giftee, while moving as few of its pairs as it can.
+
+    Invalid pairs in `giftee_of` are dropped first. Each gifter left without a
+    giftee is then given one along the shortest augmenting path, which moves
+    the fewest paired gifters for that gifter.
+    Returns the new assignment and the gifters whose giftee changed.
+    Raises `NoValidPairsError` when no full set of pairs exists.
+    """
+    size = len(matrix)
+    before = np.asarray(giftee_of).copy()
+    giftee_of = before.copy()
+    paired = np.flatnonzero(giftee_of >= 0)
+    invalid = paired[~matrix[paired, giftee_of[paired]]]
+    giftee_of[invalid] = -1
+    gifter_of = np.full(size, -1)
+    paired = np.flatnonzero(giftee_of >= 0)
+    gifter_of[giftee_of[paired]] = paired
+    for root in np.flatnonzero(giftee_of == -1).tolist():
+        augment(matrix, giftee_of, gifter_of, root)
+    changed = np.flatnonzero(giftee_of != before).tolist()
+    return giftee_of, changed
+
+
+def repair_pairs(index: CompatibilityIndex, previous: dict[str, str]) -> Repair:
+    """
+    Repairs the earlier assignment `previous` of gifter name to giftee name
+    for the roster of `index`, after people joined or dropped out.
+
+    Earlier pairs are matched to the roster by full name and kept when they
+    are still valid. See `repair_assignment`.
+    """
+    roster = index.roster
+    rows = {}
+    for row, name in enumerate(roster.full_names):
+        rows.setdefault(name, row)
+    giftee_of = np.full(len(roster), -1)
+    taken = set()
+    for gifter, name in enumerate(roster.full_names):
+        giftee = rows.get(previous.get(name))
+        # two people with the same name cannot both keep the same giftee
+        if giftee is not None and giftee not in taken:
+            giftee_of[gifter] = giftee
+            taken.add(giftee)
+    giftee_of, changed = repair_assignment(index.matrix, giftee_of)
+    kept = len(roster) - len(changed)
+    dropped = [name for name in previous if name not in rows]
+    return Repair(Pairing(roster, giftee_of), changed, kept, dropped)
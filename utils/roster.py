@@ -0,0 +1,198 @@
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.person import Person
+
+
+def intern(values, table: dict) -> np.ndarray:
+    """
+    Replaces each of `values` with an integer id that is shared by equal values.
+    New values are added to `table`.
+    """
+    return np.fromiter(
+        (table.setdefault(value, len(table)) for value in values),
+        dtype=np.int32,
+    )
+
+
+def intern_optional(values, table: dict) -> np.ndarray:
+    """
+    Same as `intern` but missing values are given the id -1.
+    """
+    return np.fromiter(
+        (
+            -1 if value is None else table.setdefault(value, len(table))
+            for value in values
+        ),
+        dtype=np.int32,
+    )
+
+
+class Roster:
+    """
+    Columnar store of the people in a Secret Santa.
+
+    Each person is an integer id. Their text fields are kept in parallel lists
+    and last names, full names and previous giftees are interned into int32
+    arrays so pairing rules are checked over indices. Branches and locations
+    are interned too, with -1 for people without one. `Person` objects are only
+    made by `person` when a card is rendered or sent.
+    """
+
+    def __init__(self) -> None:
+        self.first_names = []
+        self.last_names = []
+        self.emails = []
+        self.prev_giftees = []
+        self.wishlists = []
+        self.notes = []
+        self.branches = []
+        self.locations = []
+        self.full_names = []
+        self.households = {}
+        self.names = {}
+        self.household_ids = np.zeros(0, dtype=np.int32)
+        self.name_ids = np.zeros(0, dtype=np.int32)
+        self.prev_ids = np.zeros(0, dtype=np.int32)
+        self.branch_ids = np.zeros(0, dtype=np.int32)
+        self.location_ids = np.zeros(0, dtype=np.int32)
+        self._people = None
+
+    @classmethod
+    def from_people(cls, people, keep: bool = True) -> "Roster":
+        """
+        Builds a roster from `people` in one pass.
+        If `keep` is True the same objects are given back by `person`,
+        otherwise only the columns are kept.
+        """
+        roster = cls()
+        kept = []
+        for person in people:
+            roster.first_names.append(person.first_name)
+            roster.last_names.append(person.last_name)
+            roster.emails.append(person.email)
+            roster.prev_giftees.append(person.prev_giftee)
+            roster.wishlists.append(person.wishlist)
+            roster.notes.append(person.notes)
+            roster.branches.append(person.branch)
+            roster.locations.append(person.location)
+            if keep:
+                kept.append(person)
+        roster._people = kept if keep else None
+        roster.build_ids()
+        return roster
+
+    @classmethod
+    def load(cls, path, errors: list | None = None) -> "Roster":
+        """
+        Streams the roster file at `path` into columns without keeping a
+        `Person` for each row. See `utils.loaders.read_roster`.
+        """
+        from utils.loaders import read_roster
+
+        return cls.from_people(read_roster(path, errors), keep=False)
+
+    def build_ids(self) -> None:
+        """
+        Interns last names, full names and previous giftees into id arrays.
+        """
+        self.full_names = [
+            f"{first} {last}" for first, last in zip(self.first_names, self.last_names)
+        ]
+        self.households = {}
+        self.names = {}
+        self.household_ids = intern(self.last_names, self.households)
+        self.name_ids = intern(self.full_names, self.names)
+        # previous giftees outside the roster never match anyone
+        self.prev_ids = np.fromiter(
+            (self.names.get(name, -1) for name in self.prev_giftees),
+            dtype=np.int32,
+            count=len(self),
+        )
+        self.branch_ids = intern_optional(self.branches, {})
+        self.location_ids = intern_optional(self.locations, {})
+
+    def __len__(self) -> int:
+        return len(self.first_names)
+
+    def person(self, person_id: int) -> Person:
+        """
+        Gets the `Person` with the given `person_id`.
+        """
+        if self._people is not None:
+            return self._people[person_id]
+        return Person(
+            {
+                "first": self.first_names[person_id],
+                "last": self.last_names[person_id],
+                "email": self.emails[person_id],
+                "prev_giftee": self.prev_giftees[person_id],
+                "wishlist": self.wishlists[person_id],
+                "notes": self.notes[person_id],
+                "branch": self.branches[person_id],
+                "location": self.locations[person_id],
+            }
+        )
+
+    def people(self) -> list[Person]:
+        return [self.person(person_id) for person_id in range(len(self))]
+
+
+class Pairing:
+    """
+    A full set of pairs for a `Roster` stored as a permutation array, where
+    `giftee_of[gifter]` is the id of the giftee for each gifter id.
+
+    Iterating gives (gifter, giftee) `Person` pairs that are made as they are
+    needed, so it can be used anywhere a list of pairs was.
+    """
+
+    def __init__(self, roster: Roster, giftee_of) -> None:
+        self.roster = roster
+        self.giftee_of = np.asarray(giftee_of, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.giftee_of)
+
+    def pair(self, gifter: int) -> tuple[Person, Person]:
+        giftee = int(self.giftee_of[gifter])
+        return self.roster.person(gifter), self.roster.person(giftee)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.pair(gifter) for gifter in range(len(self))[key]]
+        return self.pair(range(len(self))[key])
+
+    def __iter__(self):
+        for gifter in range(len(self)):
+            yield self.pair(gifter)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Pairing):
+            return NotImplemented
+        same_roster = self.roster is other.roster or (
+            self.roster.full_names == other.roster.full_names
+        )
+        return same_roster and np.array_equal(self.giftee_of, other.giftee_of)
+
+    def __repr__(self) -> str:
+        return f"Pairing(giftee_of={self.giftee_of.tolist()})"
+
+    def is_permutation(self) -> bool:
+        """
+        Determines if everyone is given exactly once.
+        """
+        seen = np.zeros(len(self), dtype=bool)
+        seen[self.giftee_of] = True
+        return len(self.giftee_of) == len(self.roster) and bool(seen.all())
+
+    def names(self) -> list[tuple[str, str]]:
+        """
+        Gets the (gifter, giftee) full names of every pair.
+        """
+        full_names = self.roster.full_names
+        return [
+            (full_names[gifter], full_names[giftee])
+            for gifter, giftee in enumerate(self.giftee_of.tolist())
+        ]
@@ -0,0 +1,316 @@
+# standard library
+import hashlib, math
+
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.counting import HouseholdCounts, count_assignments, household_bans
+from utils.matching import find_matrix_assignment
+from utils.metrics import METRICS
+
+SWEEPS = 10
+# most gifter slots checked by `rejection_assignment` before giving up
+REJECTION_BUDGET = 20_000_000
+# largest minor `exact_assignment` counts with Ryser's formula
+SEQUENTIAL_RYSER_LIMIT = 12
+# most work, in products of two numbers, `exact_assignment` does before it
+# gives up, which is about a second
+EXACT_WORK_LIMIT = 2_500_000
+
+
+class AttemptLimitError(Exception):
+    """
+    Raised when `attempt_limit` random orders were tried without finding a
+    full set of valid pairs, though one may exist.
+    """
+
+    def __init__(self, attempt_limit: int) -> None:
+        self.attempt_limit = attempt_limit
+        super().__init__(f"No valid pairs were found in {attempt_limit:,} attempts.")
+
+
+def mixing_steps(size: int, sweeps: int = SWEEPS) -> int:
+    """
+    Gets the number of swap chain steps used for a roster of `size` people.
+
+    Random swaps mix an unconstrained roster in about `N * ln(N) / 2` steps, so
+    `sweeps` times `N * ln(N)` leaves a wide margin for the rules that slow the
+    chain down.
+    """
+    if size < 2:
+        return 0
+    return math.ceil(sweeps * size * max(1.0, math.log(size)))
+
+
+def sample_assignment(
+    matrix: np.ndarray,
+    seed: int,
+    sweeps: int = SWEEPS,
+    groups: np.ndarray | None = None,
+) -> list[int]:
+    """
+    Draws a random valid assignment from the boolean `matrix` of valid pairs so
+    every valid assignment is equally likely, apart from the last fallback
+    below. The same `seed` and `matrix`
+    always give the same assignment. `groups`, such as last name ids, let
+    larger rosters be counted, see `count_assignments`.
+
+    Tries `rejection_assignment` first, which is exact and fast unless only a
+    tiny share of all orders are valid, then `exact_assignment` for rosters
+    that can be counted within `EXACT_WORK_LIMIT`. Rosters that are too large
+    and too tight for either fall back to `swap_assignment`, which is only
+    close to uniform, so every roster is drawn in about a second or two.
+
+    Raises `NoValidPairsError` when no full set of pairs exists.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = np.asarray(matrix, dtype=bool)
+    # fails fast when there is no full set of pairs to draw from
+    giftee_of = find_matrix_assignment(matrix, rng)
+    drawn = rejection_assignment(matrix, rng)
+    if drawn is not None:
+        return drawn
+    try:
+        return exact_assignment(matrix, rng, groups)
+    except ValueError:
+        METRICS.count("sampling.approximate")
+        return swap_assignment(matrix, giftee_of, rng, sweeps)
+
+
+def rejection_assignment(
+    matrix: np.ndarray,
+    rng: np.random.Generator,
+    budget: int = REJECTION_BUDGET,
+) -> list[int] | None:
+    """
+    Draws uniformly random orders of the giftees until one gives everyone a
+    valid giftee, checking at most `budget` gifter slots in all. Every order is
+    equally likely so the first valid one is a uniform valid assignment.
+    Returns None if none of them were valid.
+    """
+    size = len(matrix)
+    if size == 0:
+        return []
+    gifters = np.arange(size)
+    # small batches first so loose rosters do not shuffle more than they need
+    batch = 16
+    while budget > 0:
+        batch = max(1, min(batch, budget // size))
+        orders = rng.permuted(np.tile(gifters, (batch, 1)), axis=1)
+        valid = matrix[gifters, orders].all(axis=1)
+        if valid.any():
+            return orders[valid.argmax()].tolist()
+        budget -= batch * size
+        batch = min(batch * 2, max(1, 100_000 // size))
+    return None
+
+
+def exact_assignment(
+    matrix: np.ndarray,
+    rng: np.random.Generator,
+    groups: np.ndarray | None = None,
+    ryser_limit: int = SEQUENTIAL_RYSER_LIMIT,
+    work_limit: int = EXACT_WORK_LIMIT,
+) -> list[int]:
+    """
+    Draws a uniform valid assignment by picking each gifter's giftee with
+    odds in proportion to the number of ways to finish the assignment after
+    it, counted with `count_assignments` on the minor of the matrix.
+
+    Giftees with the same column of valid gifters left give the same count,
+    so a household with no other rules is counted once per gifter. Rosters
+    that `groups` explain completely are drawn with `household_assignment`.
+
+    Raises ValueError when there is no full set of pairs or the minors
+    cannot be counted within about `work_limit` products.
+    """
+    size = len(matrix)
+    if groups is not None and household_bans(matrix, groups) == []:
+        return household_assignment(groups, rng, work_limit)
+    if size**3 > work_limit:
+        raise ValueError("The roster is too large to count every minor")
+    groups = np.arange(size) if groups is None else np.asarray(groups)
+    columns = list(range(size))
+    giftee_of = []
+    work = 0
+    for gifter in range(size):
+        rest = matrix[gifter + 1 :][:, columns]
+        # giftees with the same valid gifters left are interchangeable
+        classes = {}
+        for position, giftee in enumerate(columns):
+            if matrix[gifter, giftee]:
+                key = rest[:, position].tobytes()
+                classes.setdefault(key, []).append(position)
+        weights = []
+        for positions in classes.values():
+            minor = np.delete(rest, positions[0], axis=1)
+            count = count_assignments(
+                minor,
+                groups[gifter + 1 :],
+                ryser_limit=ryser_limit,
+                giftee_groups=np.delete(groups[columns], positions[0]),
+            )
+            weights.append(count * len(positions))
+            work += len(minor) ** 2
+        if work > work_limit:
+            raise ValueError("The roster is too large to count every minor")
+        total = sum(weights)
+        if not total:
+            raise ValueError("No valid set of pairs exists")
+        pick = _below(rng, total)
+        for positions, weight in zip(classes.values(), weights):
+            if pick < weight:
+                break
+            pick -= weight
+        position = positions[pick * len(positions) // weight]
+        giftee_of.append(columns.pop(position))
+    return giftee_of
+
+
+def household_assignment(
+    groups: np.ndarray,
+    rng: np.random.Generator,
+    work_limit: int = EXACT_WORK_LIMIT,
+) -> list[int]:
+    """
+    Draws a uniform assignment in which no one buys for anyone in their own
+    household of `groups`, with no other rules.
+
+    Only the household of each giftee changes the count of ways to finish,
+    so each gifter picks a household with odds from `HouseholdCounts` and
+    then any giftee left in it. The work grows with the number of people
+    squared times the size of the largest household.
+
+    Raises ValueError when there is no full set of pairs or it would take
+    more than about `work_limit` products.
+    """
+    _, inverse = np.unique(np.asarray(groups), return_inverse=True)
+    inverse = inverse.tolist()
+    members = [[] for _ in range(max(inverse, default=-1) + 1)]
+    for person, household in enumerate(inverse):
+        members[household].append(person)
+    sizes = [len(people) for people in members]
+    size = len(inverse)
+    if size and size**2 * (max(sizes) + len(set(sizes))) > work_limit:
+        raise ValueError("The roster is too large to count every household")
+    counts = HouseholdCounts(sizes, sizes)
+    giftee_of = []
+    for household in inverse:
+        counts.remove_gifter(household)
+        weights = {
+            giftee_household: count * counts.cols[giftee_household]
+            for giftee_household, count in counts.giftee_counts(household).items()
+            if count
+        }
+        total = sum(weights.values())
+        if not total:
+            raise ValueError("No valid set of pairs exists")
+        pick = _below(rng, total)
+        for giftee_household, weight in weights.items():
+            if pick < weight:
+                break
+            pick -= weight
+        # every giftee left in the household is as likely
+        left = members[giftee_household]
+        giftee_of.append(left.pop(pick * len(left) // weight))
+        counts.remove_giftee(giftee_household)
+        if counts.work > work_limit:
+            raise ValueError("The roster is too large to count every household")
+    return giftee_of
+
+
+def _below(rng: np.random.Generator, limit: int) -> int:
+    """
+    Draws a uniform integer from 0 up to `limit`, which can be larger than
+    an int64.
+    """
+    bits = limit.bit_length()
+    while True:
+        value = int.from_bytes(rng.bytes((bits + 7) // 8), "little")
+        value >>= (bits + 7) // 8 * 8 - bits
+        if value < limit:
+            return value
+
+
+def swap_assignment(
+    matrix: np.ndarray,
+    giftee_of: list[int],
+    rng: np.random.Generator,
+    sweeps: int = SWEEPS,
+) -> list[int]:
+    """
+    Starts from the valid assignment `giftee_of` and runs a Markov chain for
+    `mixing_steps` steps. Each step picks two or three gifters at random and
+    swaps or rotates their giftees if every new pair is still valid.
+
+    The moves are symmetric so the chain settles on the uniform distribution
+    over the assignments it can reach, but with rules beyond households the
+    moves do not always connect every assignment, so the draw is only close
+    to uniform.
+    """
+    size = len(matrix)
+    giftee_of = list(giftee_of)
+    steps = mixing_steps(size, sweeps)
+    if not steps:
+        return giftee_of
+
+    # bytes rows index faster than NumPy scalars inside the loop
+    rows = [row.tobytes() for row in np.asarray(matrix, dtype=bool)]
+    firsts = rng.integers(size, size=steps).tolist()
+    seconds = rng.integers(size, size=steps).tolist()
+    thirds = rng.integers(size, size=steps).tolist()
+    rotations = (rng.random(steps) < 0.5).tolist()
+    for a, b, c, rotate in zip(firsts, seconds, thirds, rotations):
+        giftee_a, giftee_b = giftee_of[a], giftee_of[b]
+        if not rotate:
+            if rows[a][giftee_b] and rows[b][giftee_a]:
+                giftee_of[a], giftee_of[b] = giftee_b, giftee_a
+            continue
+        if a == b or b == c or a == c:
+            continue
+        giftee_c = giftee_of[c]
+        if rows[a][giftee_b] and rows[b][giftee_c] and rows[c][giftee_a]:
+            giftee_of[a], giftee_of[b], giftee_of[c] = giftee_b, giftee_c, giftee_a
+    return giftee_of
+
+
+def shuffle_assignment(
+    matrix: np.ndarray,
+    rng: np.random.Generator,
+    attempt_limit: int = 1_000,
+) -> np.ndarray | None:
+    """
+    Tries up to `attempt_limit` random orders of the giftees and returns the
+    first that gives everyone a valid giftee, or None if none of them do.
+    Each gifter takes the first valid giftee left in the shuffled order.
+    """
+    size = len(matrix)
+    METRICS.count("pairing.attempt_limit", attempt_limit)
+    for _ in range(attempt_limit):
+        METRICS.count("pairing.attempts")
+        order = rng.permutation(size)
+        # marks who is still left in the shuffled order
+        left = np.ones(size, dtype=bool)
+        giftee_of = np.full(size, -1, dtype=np.int32)
+        for gifter in range(size):
+            open_giftees = matrix[gifter, order] & left
+            position = int(open_giftees.argmax())
+            if not open_giftees[position]:
+                break
+            left[position] = False
+            giftee_of[gifter] = order[position]
+        else:
+            return giftee_of
+    return None
+
+
+def assignment_digest(names: list[str], giftee_of: list[int]) -> str:
+    """
+    Gets a SHA-256 digest of an assignment so a replayed run can be checked
+    against a past run without storing who has who.
+    """
+    digest = hashlib.sha256()
+    for gifter, giftee in enumerate(giftee_of):
+        digest.update(f"{names[gifter]}\0{names[giftee]}\n".encode())
+    return digest.hexdigest()
@@ -0,0 +1,164 @@
+# standard library
+from pathlib import Path
+import datetime as dt
+import heapq, math, sqlite3, threading
+
+QUOTA = Path("quota.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sent INTEGER NOT NULL,
+    PRIMARY KEY (account, day)
+);
+"""
+
+
+class QuotaStore:
+    """
+    How many emails each sender account has sent each day, kept in a SQLite
+    database on disk so daily limits hold across runs.
+
+    Safe to use from many threads.
+    """
+
+    def __init__(self, path: str | Path = QUOTA) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def add(self, account: str, count: int = 1, day: dt.date | None = None) -> None:
+        """
+        Adds `count` sends by `account` on `day`, which defaults to today.
+        """
+        day = (day or dt.date.today()).isoformat()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO usage (account, day, sent) VALUES (?, ?, ?) "
+                "ON CONFLICT (account, day) DO UPDATE SET sent = sent + excluded.sent",
+                (account, day, count),
+            )
+
+    def usage(self, day: dt.date | None = None) -> dict[str, int]:
+        """
+        Gets how many emails each account sent on `day`, which defaults to today.
+        """
+        day = (day or dt.date.today()).isoformat()
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT account, sent FROM usage WHERE day = ?", (day,)
+            )
+            return dict(rows)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "QuotaStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SendWindow:
+    """
+    How many emails each sender account sends on `day`, in account order.
+    """
+
+    def __init__(self, day: dt.date, counts: list[int]) -> None:
+        self.day = day
+        self.counts = counts
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def __repr__(self) -> str:
+        return f"SendWindow(day={self.day}, counts={self.counts})"
+
+
+def allocate(count: int, capacities: list[float], weights: list[float]) -> list[int]:
+    """
+    Splits `count` sends between accounts in proportion to their `weights`
+    without going over their `capacities`, which may be `math.inf`.
+
+    Accounts that would go over their capacity are filled and the rest is
+    split again between the others, so every account finishes at about the
+    same time. Returns the whole number of sends for each account.
+    """
+    shares = [0.0] * len(capacities)
+    active = [i for i, capacity in enumerate(capacities) if capacity > 0]
+    left = count
+    while active and left > 0:
+        total = sum(weights[i] for i in active)
+        capped = [i for i in active if left * weights[i] / total >= capacities[i]]
+        if not capped:
+            for i in active:
+                shares[i] = left * weights[i] / total
+            break
+        for i in capped:
+            shares[i] = capacities[i]
+            left -= capacities[i]
+        active = [i for i in active if i not in capped]
+
+    counts = [math.floor(share) for share in shares]
+    target = min(count, sum(capacities))
+    # the sends lost to rounding down go to the largest remainders
+    for i in sorted(range(len(counts)), key=lambda i: counts[i] - shares[i]):
+        if sum(counts) >= target:
+            break
+        if counts[i] < capacities[i]:
+            counts[i] += 1
+    return counts
+
+
+def plan_windows(
+    count: int,
+    limits: list[int | None],
+    used: list[int],
+    weights: list[float],
+    day: dt.date | None = None,
+) -> list[SendWindow]:
+    """
+    Plans which day each of `count` sends goes out on and from which account.
+
+    Each account can send up to its daily limit in `limits`, or any number
+    if it is None. Today's window only has what is left after the sends in
+    `used`. Sends that do not fit are pushed to the following days.
+    Raises `ValueError` when no account can ever send.
+    """
+    day = day or dt.date.today()
+    if count and all(limit is not None and limit <= 0 for limit in limits):
+        raise ValueError("Every sender account has a daily limit of 0")
+    windows = []
+    while count > 0:
+        capacities = [
+            math.inf if limit is None else max(limit - sent, 0)
+            for limit, sent in zip(limits, used)
+        ]
+        window = SendWindow(day, allocate(count, capacities, weights))
+        windows.append(window)
+        count -= window.total
+        day += dt.timedelta(days=1)
+        used = [0] * len(limits)
+    return windows
+
+
+def interleave(counts: list[int]) -> list[int]:
+    """
+    Gets the account of each send so every account's sends are spread
+    evenly through the run instead of one account going after another.
+    """
+    heap = [(1 / count, i) for i, count in enumerate(counts) if count]
+    heapq.heapify(heap)
+    taken = [0] * len(counts)
+    order = []
+    while heap:
+        _, i = heapq.heappop(heap)
+        order.append(i)
+        taken[i] += 1
+        if taken[i] < counts[i]:
+            heapq.heappush(heap, ((taken[i] + 1) / counts[i], i))
+    return order
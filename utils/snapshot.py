@@ -0,0 +1,211 @@
+# standard library
+from collections import defaultdict, deque
+from hashlib import blake2b
+from pathlib import Path
+import json, os, shutil
+
+# third-party imports
+import numpy as np
+
+# local imports
+from utils.compatibility import CompatibilityIndex
+from utils.metrics import METRICS
+from utils.roster import Roster
+
+SNAPSHOTS = Path(".snapshots")
+# bumped whenever the rules or the files change so old snapshots are not used
+VERSION = 1
+# snapshots kept, oldest removed first
+KEEP = 8
+# kept rows in more runs than this are copied with one gather instead of
+# a slice copy for each pair of runs
+MAX_RUNS = 32
+_LATEST = "latest"
+
+
+def row_signatures(roster: Roster, exclusions: dict | None = None) -> np.ndarray:
+    """
+    Hashes everything the pairing rules look at for each person in `roster`:
+    their full name, last name, previous giftee and the names in
+    `exclusions` for them. Two people with the same signature are allowed
+    the same giftees, so rows that keep their signature between rosters can
+    be copied instead of checked again.
+    """
+    exclusions = exclusions or {}
+    signatures = np.empty(len(roster), dtype="S16")
+    columns = zip(roster.full_names, roster.last_names, roster.prev_giftees)
+    for row, (full_name, last_name, prev_giftee) in enumerate(columns):
+        excluded = sorted(exclusions.get(full_name, ()))
+        fields = json.dumps([full_name, last_name, prev_giftee, excluded])
+        signatures[row] = blake2b(fields.encode(), digest_size=16).digest()
+    return signatures
+
+
+def snapshot_key(signatures: np.ndarray) -> str:
+    """
+    Gets the content hash of a roster and its rules from its `signatures`.
+    """
+    digest = blake2b(f"v{VERSION}:".encode(), digest_size=16)
+    digest.update(signatures.tobytes())
+    return digest.hexdigest()
+
+
+def match_rows(previous: np.ndarray, signatures: np.ndarray):
+    """
+    Pairs up the rows of `signatures` with the rows of `previous` that have
+    the same signature, in order when a signature repeats.
+    Returns the (new rows, previous rows) arrays of the matches.
+    """
+    rows = defaultdict(deque)
+    for row, signature in enumerate(previous.tolist()):
+        rows[signature].append(row)
+    new, old = [], []
+    for row, signature in enumerate(signatures.tolist()):
+        if rows[signature]:
+            new.append(row)
+            old.append(rows[signature].popleft())
+    return np.array(new, dtype=np.intp), np.array(old, dtype=np.intp)
+
+
+def row_runs(new: np.ndarray, old: np.ndarray) -> list[tuple[slice, slice]]:
+    """
+    Splits matched rows into runs that are consecutive in both the `new`
+    and `old` rows, as (new slice, old slice).
+    """
+    breaks = np.flatnonzero((np.diff(new) != 1) | (np.diff(old) != 1)) + 1
+    starts = np.concatenate(([0], breaks)).astype(int)
+    stops = np.concatenate((breaks, [len(new)])).astype(int)
+    return [
+        (
+            slice(new[start], new[start] + stop - start),
+            slice(old[start], old[start] + stop - start),
+        )
+        for start, stop in zip(starts, stops)
+        if stop > start
+    ]
+
+
+def rebuild_matrix(
+    index: CompatibilityIndex,
+    exclusions: dict | None,
+    signatures: np.ndarray,
+    previous: np.ndarray,
+    previous_matrix: np.ndarray,
+) -> int:
+    """
+    Fills in the matrix of `index` from the `previous_matrix` of an earlier
+    roster with the row signatures `previous`, only checking the rules for
+    the rows and columns of people that were added or changed.
+    Returns how many rows were kept.
+    """
+    new, old = match_rows(previous, signatures)
+    everyone = np.arange(len(signatures))
+    changed = np.setdiff1d(everyone, new)
+    matrix = index.matrix
+    runs = row_runs(new, old)
+    if len(runs) <= MAX_RUNS:
+        # an edit leaves a few long runs, which copy far faster as slices
+        for new_rows, old_rows in runs:
+            for new_columns, old_columns in runs:
+                matrix[new_rows, new_columns] = previous_matrix[old_rows, old_columns]
+    else:
+        kept = previous_matrix.take(old, axis=0).take(old, axis=1)
+        matrix[np.ix_(new, new)] = kept
+    if len(changed):
+        matrix[changed, :] = index.allowed(changed, everyone, exclusions)
+        matrix[:, changed] = index.allowed(everyone, changed, exclusions)
+    return len(new)
+
+
+class SnapshotCache:
+    """
+    Keeps the compatibility matrix of each roster on disk, keyed by a hash of
+    the roster and its rules, so the pairwise checks are only done once.
+
+    Each snapshot is a folder of `.npy` files that is loaded memory mapped:
+    the matrix, one byte per pair, and the row signatures. A roster that is
+    not in the cache is built from the last snapshot saved, checking only the
+    people who were added or changed.
+    """
+
+    def __init__(self, folder: str | Path = SNAPSHOTS, keep: int = KEEP) -> None:
+        self.folder = Path(folder)
+        self.keep = keep
+
+    def index(
+        self,
+        people,
+        exclusions: dict | None = None,
+    ) -> CompatibilityIndex:
+        """
+        Gets the `CompatibilityIndex` of `people` with `exclusions`, from its
+        snapshot if there is one and built and saved otherwise.
+        """
+        roster = people if isinstance(people, Roster) else Roster.from_people(people)
+        signatures = row_signatures(roster, exclusions)
+        key = snapshot_key(signatures)
+        path = self.folder / key
+        if (path / "matrix.npy").exists():
+            METRICS.count("snapshot.hits")
+            matrix = np.load(path / "matrix.npy", mmap_mode="r")
+            # recently used snapshots are the last to be pruned
+            os.utime(path)
+            return CompatibilityIndex(roster, exclusions, matrix=matrix)
+
+        METRICS.count("snapshot.misses")
+        previous = self.latest()
+        if previous is None:
+            index = CompatibilityIndex(roster, exclusions)
+        else:
+            size = len(roster)
+            matrix = np.empty((size, size), dtype=bool)
+            index = CompatibilityIndex(roster, exclusions, matrix=matrix)
+            kept = rebuild_matrix(index, exclusions, signatures, *previous)
+            METRICS.count("snapshot.kept_rows", kept)
+        self.save(key, signatures, index.matrix)
+        return index
+
+    def latest(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Gets the (signatures, matrix) of the last snapshot saved.
+        """
+        try:
+            key = (self.folder / _LATEST).read_text().strip()
+            signatures = np.load(self.folder / key / "signatures.npy")
+            matrix = np.load(self.folder / key / "matrix.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return signatures, matrix
+
+    def save(self, key: str, signatures: np.ndarray, matrix: np.ndarray) -> None:
+        """
+        Writes a snapshot to a temporary folder and renames it into place so
+        a snapshot is never seen half written.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        temporary = self.folder / f".{key}.{os.getpid()}.tmp"
+        temporary.mkdir(exist_ok=True)
+        np.save(temporary / "signatures.npy", signatures)
+        np.save(temporary / "matrix.npy", matrix)
+        try:
+            os.replace(temporary, self.folder / key)
+        except OSError:
+            # another run saved the same snapshot first
+            shutil.rmtree(temporary, ignore_errors=True)
+        latest = self.folder / f".{_LATEST}.{os.getpid()}.tmp"
+        latest.write_text(key)
+        os.replace(latest, self.folder / _LATEST)
+        self.prune()
+
+    def prune(self) -> None:
+        """
+        Removes the oldest snapshots past the `keep` newest.
+        """
+        snapshots = [
+            path
+            for path in self.folder.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        ]
+        snapshots.sort(key=lambda path: path.stat().st_mtime_ns, reverse=True)
+        for path in snapshots[self.keep :]:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,313 @@
+# standard library
+from email.parser import BytesHeaderParser
+from pathlib import Path
+import hashlib, os, re, shutil, socket, threading, time
+
+MAILDIR = "maildir"
+MBOX = "mbox"
+# messages held in memory before they are written out together
+BATCH = 256
+# mboxrd quoting, where a line starting with any number of ">" then "From "
+# gets one more ">" so it cannot be read as the start of a message
+_QUOTE = re.compile(rb"^(>*From )", re.MULTILINE)
+_UNQUOTE = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+
+def spool_kind(path: str | Path) -> str:
+    """
+    Gets the spool format for `path`, an mbox file if it ends in `.mbox`
+    and a Maildir folder otherwise.
+    """
+    return MBOX if Path(path).suffix == ".mbox" else MAILDIR
+
+
+class Spool:
+    """
+    Writes every message into a Maildir folder or an mbox file instead of
+    sending it, so a whole run can be looked at offline and sent later with
+    `read_spool`.
+
+    Stands in for `Email` in `dispatch`: `session` gives sessions with the same
+    `sendmail` and `close` and `gmail_username` is the sender of the run.
+    Messages are held in batches of `batch` and written out together. Each
+    Maildir message is written to `tmp` and renamed into `new`. An mbox is
+    written to a temporary file that is renamed over `path` when the spool
+    is closed.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        sender: str = "",
+        kind: str | None = None,
+        batch: int = BATCH,
+    ) -> None:
+        self.path = Path(path)
+        self.gmail_username = sender
+        self.kind = kind or spool_kind(path)
+        self.batch = batch
+        self.count = 0
+        self.lock = threading.Lock()
+        self._pending = []
+        self._mbox = None
+        self._prefix = f"{time.time_ns()}.P{os.getpid()}"
+        self._host = socket.gethostname().replace("/", "_").replace(":", "_")
+        if self.kind == MAILDIR:
+            for folder in ("tmp", "new", "cur"):
+                (self.path / folder).mkdir(parents=True, exist_ok=True)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # messages left in the mbox from earlier runs are kept
+            if self.path.exists():
+                shutil.copyfile(self.path, self._temporary)
+                self._mbox = open(self._temporary, "ab")
+            else:
+                self._mbox = open(self._temporary, "wb")
+
+    @property
+    def _temporary(self) -> Path:
+        return self.path.with_name(f".{self.path.name}.tmp")
+
+    def session(self) -> "SpoolSession":
+        return SpoolSession(self)
+
+    def add(self, to_email: str, message: str | bytes) -> None:
+        """
+        Adds `message` to the spool and writes the batch out once it is full.
+        """
+        if isinstance(message, str):
+            message = message.encode()
+        with self.lock:
+            self._pending.append((to_email, message))
+            if len(self._pending) >= self.batch:
+                self._write()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._write()
+
+    def _write(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if self.kind == MBOX:
+            self._mbox.write(b"".join(mbox_entry(message) for _, message in pending))
+            self._mbox.flush()
+            self.count += len(pending)
+            return
+        names = []
+        for _, message in pending:
+            name = f"{self._prefix}Q{self.count:08d}.{self._host}"
+            self.count += 1
+            with open(self.path / "tmp" / name, "wb") as file:
+                file.write(message)
+            names.append(name)
+        # every file is whole before any of them shows up in new
+        for name in names:
+            os.rename(self.path / "tmp" / name, self.path / "new" / name)
+
+    def close(self) -> None:
+        """
+        Writes out what is left and, for an mbox, puts it in place.
+        """
+        self.flush()
+        if self._mbox is not None:
+            self._mbox.close()
+            self._mbox = None
+            os.replace(self._temporary, self.path)
+
+    def __enter__(self) -> "Spool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SpoolSession:
+    """
+    A session of a `Spool`, which adds each message to the shared spool.
+    """
+
+    def __init__(self, spool: Spool) -> None:
+        self.spool = spool
+
+    def __enter__(self) -> "SpoolSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.spool.flush()
+
+    def sendmail(self, to_email: str, message: str | bytes) -> None:
+        self.spool.add(to_email, message)
+
+
+def mbox_entry(message: bytes) -> bytes:
+    """
+    Formats `message` as one entry of an mboxrd file.
+    """
+    stamp = time.strftime("%a %b %d %H:%M:%S %Y").encode()
+    body = _QUOTE.sub(rb">\1", message.replace(b"\r\n", b"\n"))
+    if not body.endswith(b"\n"):
+        body += b"\n"
+    return b"From MAILER-DAEMON " + stamp + b"\n" + body + b"\n"
+
+
+def _recipient(message: bytes) -> str:
+    headers = BytesHeaderParser().parsebytes(message)
+    return headers.get("To", "")
+
+
+def _sent_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.sent")
+
+
+def _sent_keys(path: Path) -> set[str]:
+    try:
+        return set(_sent_path(path).read_text(encoding="utf-8").split())
+    except FileNotFoundError:
+        return set()
+
+
+def read_spool(path: str | Path):
+    """
+    Yields (key, to_email, message) for every message in the spool at `path`
+    that has not been sent, in the order they were written.
+    Messages are given CRLF line endings for SMTP.
+
+    Maildir keys are file names. Mbox keys are digests of each message, and
+    the number of earlier copies of it, so they still match after the mbox
+    is written again without the messages that were sent.
+    """
+    path = Path(path)
+    if spool_kind(path) == MAILDIR:
+        folder = path / "new"
+        if not folder.exists():
+            return
+        for name in sorted(os.listdir(folder)):
+            message = (folder / name).read_bytes()
+            yield name, _recipient(message), message
+        return
+    if not path.exists():
+        return
+    sent = _sent_keys(path)
+    copies = {}
+    # with a separator added at each end every entry sits between two
+    # separators, which also take the newline that ends each message
+    data = b"\n\n" + path.read_bytes() + b"From "
+    for entry in data.split(b"\n\nFrom ")[1:-1]:
+        _, _, message = entry.partition(b"\n")
+        digest = hashlib.sha256(message).hexdigest()
+        copies[digest] = copies.get(digest, -1) + 1
+        key = f"{digest}-{copies[digest]}"
+        if key in sent:
+            continue
+        message = _UNQUOTE.sub(rb"\1", message + b"\n").replace(b"\n", b"\r\n")
+        yield key, _recipient(message), message
+
+
+def spool_size(path: str | Path) -> int:
+    """
+    Counts the messages in the spool at `path` that have not been sent.
+    """
+    path = Path(path)
+    if spool_kind(path) == MAILDIR:
+        folder = path / "new"
+        return len(os.listdir(folder)) if folder.exists() else 0
+    if not path.exists():
+        return 0
+    if _sent_path(path).exists():
+        return sum(1 for _ in read_spool(path))
+    return (b"\n\n" + path.read_bytes()).count(b"\n\nFrom ")
+
+
+def _move_to_cur(path: Path, name: str) -> None:
+    os.rename(path / "new" / name, path / "cur" / f"{name}:2,S")
+
+
+def mark_sent(path: str | Path, sent: set[str]) -> int:
+    """
+    Marks the messages with the keys in `sent`, from `read_spool`, as sent so
+    they are not sent again, and returns how many are left to send.
+
+    Maildir messages move from `new` to `cur`. An mbox is written again with
+    only the messages left and renamed over the old one, and the keys kept
+    by `SentLog` are dropped.
+    """
+    path = Path(path)
+    if spool_kind(path) == MAILDIR:
+        for name in sent:
+            _move_to_cur(path, name)
+        return len(os.listdir(path / "new"))
+    left = [message for key, _, message in read_spool(path) if key not in sent]
+    temporary = path.with_name(f".{path.name}.tmp")
+    with open(temporary, "wb") as file:
+        file.write(b"".join(mbox_entry(message) for message in left))
+    os.replace(temporary, path)
+    # a log left behind by a crash here only names messages that are gone
+    _sent_path(path).unlink(missing_ok=True)
+    return len(left)
+
+
+class SentLog:
+    """
+    Marks each message of the spool at `path` as sent as soon as it is
+    delivered, so a crash partway through a flush does not send it again.
+
+    Maildir messages move from `new` to `cur` one at a time. An mbox cannot be
+    changed in place, so its keys are appended to a file next to it that
+    `read_spool` skips. Each key is written at once and synced to disk in
+    batches of `batch` keys. `close` syncs what is left and writes the mbox
+    again without the sent messages.
+    Safe to use from many threads.
+    """
+
+    def __init__(self, path: str | Path, batch: int = BATCH) -> None:
+        self.path = Path(path)
+        self.kind = spool_kind(path)
+        self.batch = batch
+        self.lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+
+    def mark(self, key: str) -> None:
+        if self.kind == MAILDIR:
+            _move_to_cur(self.path, key)
+            return
+        with self.lock:
+            if self._file is None:
+                self._file = open(_sent_path(self.path), "ab")
+                # a key cut short by a crash must not swallow the next one
+                if self._file.tell():
+                    self._file.write(b"\n")
+            self._file.write(key.encode() + b"\n")
+            # written through at once so it outlives a crash of this process
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.batch:
+                self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is None:
+                return
+            self._sync()
+            self._file.close()
+            self._file = None
+        mark_sent(self.path, set())
+
+    def __enter__(self) -> "SentLog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,466 @@
+# standard library
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+import asyncio, json, os, ssl, time
+
+WISHLIST_CACHE = Path("wishlists.json")
+# a day, in seconds
+TTL = 24 * 60 * 60
+# broken links are checked again sooner in case the site was only down
+FAILURE_TTL = 60 * 60
+# connections open at once, overall and to one host
+LIMIT = 8
+PER_HOST = 2
+# seconds for each request of a link once it has a connection slot, so
+# links queued behind others to the same host are not cut short
+TIMEOUT = 10.0
+REDIRECTS = 5
+# only the start of a page is read since the metadata is in its head
+MAX_BYTES = 256 * 1024
+USER_AGENT = "secret-santa-wishlist-check"
+
+
+class WishlistLink:
+    """
+    The result of checking a wishlist link: the HTTP `status` of the page it
+    ends up at, the `final_url` after redirects and the title, description
+    and preview image from the page's metadata, or the `error` that stopped
+    it from loading. `checked` is the time it was checked, in seconds.
+    """
+
+    FIELDS = ("status", "final_url", "title", "description", "image", "error")
+
+    def __init__(
+        self,
+        url: str,
+        status: int | None = None,
+        final_url: str | None = None,
+        title: str | None = None,
+        description: str | None = None,
+        image: str | None = None,
+        error: str | None = None,
+        checked: float | None = None,
+    ) -> None:
+        self.url = url
+        self.status = status
+        self.final_url = final_url
+        self.title = title
+        self.description = description
+        self.image = image
+        self.error = error
+        self.checked = time.time() if checked is None else checked
+
+    def __repr__(self) -> str:
+        return (
+            f"WishlistLink(url={self.url!r}, status={self.status}, "
+            f"error={self.error!r})"
+        )
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
+
+    @property
+    def problem(self) -> str | None:
+        """
+        Gets why the link is broken, or None if it works.
+        """
+        if self.error:
+            return self.error
+        if not self.ok:
+            return f"HTTP {self.status}"
+        return None
+
+    def context(self) -> dict:
+        """
+        Gets the card template data for the link.
+        """
+        return {
+            "wishlist_ok": self.ok,
+            "wishlist_title": self.title,
+            "wishlist_description": self.description,
+            "wishlist_image": self.image,
+        }
+
+    def to_dict(self) -> dict:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data["checked"] = self.checked
+        return data
+
+    @classmethod
+    def from_dict(cls, url: str, data: dict) -> "WishlistLink":
+        return cls(url, **{key: data.get(key) for key in (*cls.FIELDS, "checked")})
+
+
+class MetadataParser(HTMLParser):
+    """
+    Finds the title, description and preview image in the head of a page,
+    preferring the Open Graph tags that sites give for link previews.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = ""
+        self.in_title = False
+        self.done = False
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if self.done:
+            return
+        if tag == "title":
+            self.in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key and attrs.get("content") and key not in self.meta:
+                self.meta[key] = attrs["content"].strip()
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self.in_title = False
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if self.in_title and not self.done:
+            self.title += data
+
+    def metadata(self, base: str) -> dict:
+        meta = self.meta
+        title = meta.get("og:title") or meta.get("twitter:title") or self.title
+        description = meta.get("og:description") or meta.get("description")
+        image = meta.get("og:image") or meta.get("twitter:image")
+        return {
+            "title": " ".join(title.split()) or None,
+            "description": description,
+            "image": urljoin(base, image) if image else None,
+        }
+
+
+def parse_metadata(html: str, base: str) -> dict:
+    """
+    Gets the title, description and preview image of the page `html` that was
+    loaded from `base`.
+    """
+    parser = MetadataParser()
+    parser.feed(html)
+    return parser.metadata(base)
+
+
+def check_url(url: str) -> str | None:
+    """
+    Gets why `url` can not be a wishlist link, or None if it can.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        # raises for ports that are not numbers or out of range
+        parts.port
+    except ValueError as error:
+        return f"Malformed link: {error}"
+    if parts.scheme not in ("http", "https"):
+        return "Malformed link: only http and https links can be opened"
+    if not parts.hostname:
+        return "Malformed link: no website in the link"
+    return None
+
+
+class ConnectionPool:
+    """
+    Keeps HTTP connections open between requests and caps how many are in
+    use at once, both overall and to each host.
+    """
+
+    def __init__(self, limit: int = LIMIT, per_host: int = PER_HOST) -> None:
+        self.total = asyncio.Semaphore(limit)
+        self.per_host = per_host
+        self.hosts = {}
+        self.idle = {}
+        self.opened = 0
+        self.ssl = ssl.create_default_context()
+
+    @asynccontextmanager
+    async def connection(
+        self,
+        host: str,
+        port: int,
+        secure: bool,
+        timeout: float | None = None,
+    ):
+        """
+        Gives a [reader, writer, keep] list for an open connection to the
+        host, reusing an idle one if there is one. The connection is kept
+        for the next request if `keep` is set to True and closed otherwise.
+        Opening a new connection is limited to `timeout` seconds, which only
+        start once a slot is free.
+        """
+        key = (host, port, secure)
+        limit = self.hosts.setdefault(key, asyncio.Semaphore(self.per_host))
+        async with limit, self.total:
+            idle = self.idle.setdefault(key, [])
+            if idle:
+                reader, writer = idle.pop()
+            else:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        host, port, ssl=self.ssl if secure else None
+                    ),
+                    timeout,
+                )
+                self.opened += 1
+            connection = [reader, writer, False]
+            try:
+                yield connection
+            finally:
+                if connection[2] and not reader.at_eof():
+                    idle.append((reader, writer))
+                else:
+                    await close_writer(writer)
+
+    async def close(self) -> None:
+        for connections in self.idle.values():
+            for _, writer in connections:
+                await close_writer(writer)
+        self.idle = {}
+
+
+async def close_writer(writer) -> None:
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        pass
+
+
+async def read_body(reader, headers: dict) -> tuple[bytes, bool]:
+    """
+    Reads up to `MAX_BYTES` of a response body. Returns the body and whether
+    all of it was read, so the connection can be used again.
+    """
+    if "chunked" in headers.get("transfer-encoding", ""):
+        body = b""
+        while len(body) < MAX_BYTES:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                # trailers end with an empty line
+                while (await reader.readline()).strip():
+                    pass
+                return body, True
+            body += await reader.readexactly(size)
+            await reader.readline()
+        return body, False
+    if "content-length" in headers:
+        length = int(headers["content-length"])
+        body = await reader.readexactly(min(length, MAX_BYTES))
+        return body, length <= MAX_BYTES
+    body = b""
+    while len(body) < MAX_BYTES:
+        data = await reader.read(MAX_BYTES - len(body))
+        if not data:
+            break
+        body += data
+    return body, False
+
+
+async def get(
+    pool: ConnectionPool,
+    url: str,
+    timeout: float | None = None,
+) -> tuple[int, dict, bytes]:
+    """
+    Sends a GET request for `url` over `pool`.
+    Returns the status, the lower cased headers and the start of the body.
+
+    Opening the connection and then the request itself are each limited to
+    `timeout` seconds, not counting the wait for a free connection slot.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    request = (
+        f"GET {target} HTTP/1.1\r\n"
+        f"Host: {parts.netloc.rpartition('@')[2]}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n"
+        "Accept: text/html,*/*;q=0.5\r\n"
+        "Accept-Encoding: identity\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    ).encode("ascii", "ignore")
+    # a kept connection may have been closed by the server while idle
+    for _ in range(2):
+        host = parts.hostname
+        async with pool.connection(host, port, secure, timeout) as connection:
+            reply = await asyncio.wait_for(exchange(connection, request), timeout)
+            if reply is not None:
+                return reply
+    raise ConnectionError("The connection was closed")
+
+
+async def exchange(
+    connection: list,
+    request: bytes,
+) -> tuple[int, dict, bytes] | None:
+    """
+    Sends `request` over a `ConnectionPool` connection and reads the reply,
+    see `get`. Returns None if the connection was already closed.
+    """
+    reader, writer, _ = connection
+    writer.write(request)
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        return None
+    status = int(line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if status in (204, 304) or status < 200:
+        # these replies never have a body
+        body, whole = b"", True
+    else:
+        body, whole = await read_body(reader, headers)
+    connection[2] = whole and headers.get("connection") != "close"
+    return status, headers, body
+
+
+async def resolve(pool: ConnectionPool, url: str, timeout: float) -> WishlistLink:
+    """
+    Checks the wishlist link `url`, following redirects, and reads the
+    metadata of the page it ends up at. Each request is limited to `timeout`
+    seconds, see `get`.
+    """
+    problem = check_url(url)
+    if problem:
+        return WishlistLink(url, error=problem)
+
+    async def follow() -> WishlistLink:
+        current = url.strip()
+        for _ in range(REDIRECTS + 1):
+            status, headers, body = await get(pool, current, timeout)
+            if status in (301, 302, 303, 307, 308) and headers.get("location"):
+                current = urljoin(current, headers["location"])
+                problem = check_url(current)
+                if problem:
+                    return WishlistLink(url, status, current, error=problem)
+                continue
+            link = WishlistLink(url, status, current)
+            if "html" in headers.get("content-type", "text/html"):
+                html = body.decode("utf-8", "replace")
+                for key, value in parse_metadata(html, current).items():
+                    setattr(link, key, value)
+            return link
+        return WishlistLink(url, error="Too many redirects")
+
+    try:
+        return await follow()
+    except asyncio.TimeoutError:
+        return WishlistLink(url, error=f"Timed out after {timeout:g} seconds")
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as error:
+        return WishlistLink(url, error=str(error) or type(error).__name__)
+
+
+async def resolve_all(
+    urls,
+    limit: int = LIMIT,
+    per_host: int = PER_HOST,
+    timeout: float = TIMEOUT,
+) -> dict[str, WishlistLink]:
+    """
+    Checks every link in `urls` at once over one shared `ConnectionPool`.
+    """
+    pool = ConnectionPool(limit, per_host)
+    urls = list(dict.fromkeys(urls))
+    try:
+        links = await asyncio.gather(*(resolve(pool, url, timeout) for url in urls))
+    finally:
+        await pool.close()
+    return dict(zip(urls, links))
+
+
+class WishlistCache:
+    """
+    Checked wishlist links kept in a JSON file so repeated runs do not load
+    the same pages again. Links are checked again once they are older than
+    `ttl` seconds, or `FAILURE_TTL` seconds if they were broken.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = WISHLIST_CACHE,
+        ttl: float = TTL,
+        clock=time.time,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.clock = clock
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, url: str) -> WishlistLink | None:
+        """
+        Gets the cached result for `url` if it has not expired.
+        """
+        data = self.entries.get(url)
+        if data is None:
+            return None
+        link = WishlistLink.from_dict(url, data)
+        ttl = self.ttl if link.ok else min(self.ttl, FAILURE_TTL)
+        return link if self.clock() - link.checked < ttl else None
+
+    def put(self, link: WishlistLink) -> None:
+        """
+        Adds `link`, checked just now by the cache's clock.
+        """
+        link.checked = self.clock()
+        self.entries[link.url] = link.to_dict()
+
+    def save(self) -> None:
+        """
+        Writes the results that have not expired to the cache file.
+        """
+        self.entries = {
+            url: data for url, data in self.entries.items() if self.get(url)
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f".{self.path.name}.tmp")
+        temporary.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+
+def resolve_wishlists(
+    urls,
+    cache: WishlistCache | None = None,
+    limit: int = LIMIT,
+    per_host: int = PER_HOST,
+    timeout: float = TIMEOUT,
+) -> dict[str, WishlistLink]:
+    """
+    Checks every wishlist link in `urls`, see `resolve_all`, using the results
+    in `cache` that have not expired and saving the new ones to it.
+    """
+    urls = [url for url in dict.fromkeys(urls) if url]
+    links = {}
+    missing = []
+    for url in urls:
+        link = cache.get(url) if cache else None
+        if link:
+            links[url] = link
+        else:
+            missing.append(url)
+    if missing:
+        links.update(asyncio.run(resolve_all(missing, limit, per_host, timeout)))
+        if cache:
+            for url in missing:
+                cache.put(links[url])
+            cache.save()
+    return {url: links[url] for url in urls}